@@ -1,18 +1,76 @@
 # app.py
-import os
-from flask import Flask, jsonify, send_from_directory, request
+import hmac
+import threading
+import click
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
-from models import User
+from models import Book, User
+from utils.database import db
+from utils import http_cache, log, metrics, passwords
+from utils.json_provider import BookNestJSONProvider
+from utils.pagination import parse_limit
 from routes.auth import auth_bp
 from routes.books import books_bp
 from routes.borrows import borrows_bp
+from routes.batch import batch_bp
+
+logger = log.get_logger(__name__)
+
+
+def _register_gauges():
+    """Point-in-time values read on every /api/metrics scrape"""
+    metrics.register_gauges(
+        "booknest_db_pool", "Connection pool counters (utils.pool stats)", ("stat",),
+        lambda: {(k,): v for k, v in db.pool_stats().items()})
+    metrics.register_gauges(
+        "booknest_db_replica", "Read replica health and usage (DB_REPLICA_DSNS)", ("replica", "stat"),
+        lambda: {(name, k): v for name, stats in db.replica_stats().items() for k, v in stats.items()})
+    metrics.register_gauges(
+        "booknest_cache", "Read-through cache counters (book rows, JWT identities)", ("cache", "stat"),
+        lambda: {**{("book", k): v for k, v in Book.cache_stats().items()},
+                 **{("identity", k): v for k, v in User.identity_cache_stats().items()}})
+    metrics.register_gauges(
+        "booknest_password_hash", "Password hashing pool", ("stat",),
+        lambda: {("workers",): passwords.pool.workers, ("rejected",): passwords.pool.rejected})
+    metrics.register_gauges(
+        "booknest_db_statement_calls", "Executions per registered statement", ("statement",),
+        lambda: {(row["name"],): row["calls"] for row in db.statement_stats()})
+
+
+def warm_up():
+    """
+    Connect and build the user typeahead index ahead of the first request. Called
+    per worker (gunicorn post_fork, ASGI lifespan startup), never by create_app(),
+    so building or importing the app needs no database. Returns False if the
+    database is unreachable; everything is then built on first use instead.
+    """
+    if not db.warm():
+        return False
+    # 预热用户前缀索引；数据库不可用时首次查询再建
+    if Config.USER_INDEX_WARM_ON_START:
+        User.warm_typeahead()
+    return True
 
 
 def create_app() -> Flask:
     app = Flask(__name__, static_folder='assets')
     app.config.from_object(Config)
+    # Decimal/datetime 一次编码完成，装有 orjson 时自动使用
+    app.json = BookNestJSONProvider(app)
+
+    # 结构化日志与请求 ID
+    log.init_app(app)
+
+    # 每个请求复用同一个池化连接，请求结束时归还
+    db.init_app(app)
+
+    # 按路由模板统计请求耗时与响应大小（/api/metrics）
+    metrics.init_app(app)
+
+    # gzip / brotli 压缩与静态文件缓存策略；注册在 metrics 之后，统计的是压缩后的大小
+    http_cache.init_app(app)
 
     # 初始化 JWT 管理器
     jwt = JWTManager(app)
@@ -42,6 +100,19 @@ def create_app() -> Flask:
             'error_type': 'missing_token'
         }), 401
 
+    # current_user：按 JWT sub 加载用户身份（带缓存，见 User.find_identity）
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_payload):
+        return User.find_identity(jwt_payload["sub"])
+
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'success': False,
+            'message': 'User not found',
+            'error_type': 'user_not_found'
+        }), 401
+
     # 允许所有域名跨域访问
     cors_origins = getattr(Config, "CORS_ORIGINS", "*")
     CORS(app, 
@@ -53,11 +124,38 @@ def create_app() -> Flask:
     app.register_blueprint(auth_bp)
     app.register_blueprint(books_bp)
     app.register_blueprint(borrows_bp)
+    app.register_blueprint(batch_bp)
 
     @app.get("/api/health")
     def health():
         return jsonify(success=True, service="booknest-api")
 
+    if Config.METRICS_ENABLED:
+        _register_gauges()
+
+    # 指标里有连接池状态、逐条语句的 SQL 与耗时：未配置 METRICS_TOKEN 时不注册该路由
+    if Config.METRICS_ENABLED and Config.METRICS_TOKEN:
+        @app.get("/api/metrics")
+        def prometheus_metrics():
+            # Prometheus 文本格式；必须携带 Authorization: Bearer <METRICS_TOKEN>
+            expected = f"Bearer {Config.METRICS_TOKEN}".encode()
+            if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+                return jsonify(success=False, message="Metrics token required"), 401
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+    elif Config.METRICS_ENABLED:
+        logger.info("METRICS_TOKEN is not set: /api/metrics is disabled")
+
+    @app.cli.command("reconcile-availability")
+    @click.option("--fix", is_flag=True, help="Recount drifted books in place")
+    def reconcile_availability(fix):
+        """Check the books availability counters against the borrows table (exit 1 on drift)"""
+        drift = Book.reconcile_counters(fix=fix)
+        if drift is None:
+            raise click.ClickException("Database unavailable")
+        click.echo(f"{len(drift)} book(s) with drifted availability counters" + (", recounted" if drift and fix else ""))
+        if drift and not fix:
+            raise click.exceptions.Exit(1)
+
     @app.get("/")
     def root():
         # 访问根路径时给一个友好的 404 JSON
@@ -65,6 +163,18 @@ def create_app() -> Flask:
 
     @app.route('/api/users', methods=['GET'])
     def search_users():
+        # ?prefix= 走内存前缀索引（输入联想），?query= 为原有的子串搜索
+        prefix = request.args.get('prefix', '').strip()
+        if prefix:
+            try:
+                limit = parse_limit(request.args.get('limit'),
+                                    Config.USER_TYPEAHEAD_LIMIT, Config.USER_TYPEAHEAD_MAX_LIMIT)
+            except ValueError as e:
+                return jsonify(success=False, message=str(e)), 400
+            users = [{"id": r['id'], "username": r['username'], "email": r['email']}
+                     for r in User.typeahead(prefix, limit=limit)]
+            return jsonify(success=True, data=users)
+
         query = request.args.get('query', '').strip()
         if not query:
             return jsonify(success=False, message="Query parameter required"), 400
@@ -73,7 +183,7 @@ def create_app() -> Flask:
             users = [{"id": r['id'], "username": r['username'], "email": r['email']} for r in results]
             return jsonify(success=True, data=users)
         except Exception as e:
-            print("User search error:", e) 
+            logger.exception("User search error: %s", e)
             return jsonify(success=False, message=str(e)), 500
 
     # 捕获所有静态文件请求
@@ -81,37 +191,37 @@ def create_app() -> Flask:
     def serve_static(filename):
         """
         访问 /book-detail.html?id=3
-        Flask 返回静态文件，并保留 query string
+        Flask 返回静态文件，并保留 query string；
+        有 .br / .gz 预压缩文件时按 Accept-Encoding 直接发送，带内容哈希的文件名长期缓存
         """
-        return send_from_directory(app.static_folder, filename)
+        return http_cache.send_static(app.static_folder, filename)
     return app
 
-app = create_app()
-
-print("== ROUTES ==")
-for rule in app.url_map.iter_rules():
-    print(f"{sorted(rule.methods)}  {rule.rule}")
-print("== END ROUTES ==")
-
-if __name__ == "__main__":
-    port = int(os.getenv("PORT", "8080"))
-    app.run(host="0.0.0.0", port=port, debug=False)
-
-
-
-
-
-
-
-
-
-
-
-
 
+# 进程内唯一的应用实例。导入本模块不构建应用（不连数据库、不打印）：
+# CLI、基准测试按需调用 create_app()，run.py / asgi.py / gunicorn 共用 get_app()
+_app = None
+_app_lock = threading.Lock()
 
 
+def get_app() -> Flask:
+    """The process-wide app, built by create_app() on first use"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
 
 
+def __getattr__(name):
+    # `from app import app`、`gunicorn app:app`、`flask --app app`：首次访问时才构建
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+if __name__ == "__main__":
+    # 与 python run.py 相同；经 run 导入的 app 模块只构建一次应用
+    import run
+    run.main()
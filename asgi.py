@@ -0,0 +1,52 @@
+# ASGI entrypoint (async serving mode)
+#
+#   uvicorn asgi:app --workers 4
+#
+# Book list/detail and the borrow lifecycle run as async handlers on one event loop
+# per process (routes/async_routes.py); every other route is served by the Flask app.
+# Importing this module does not build the app or touch the database: `app` is built
+# on first access and the connections are opened at lifespan startup.
+
+import threading
+
+from app import get_app, warm_up
+from config import Config
+from routes.async_routes import routes
+from utils import metrics
+from utils.asgi import ASGIApp
+from utils.async_database import adb
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+metrics.register_gauges(
+    "booknest_async_db_pool", "Async connection pool (ASGI mode)", ("stat",),
+    lambda: {(k,): v for k, v in adb.pool_stats().items()})
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def _startup():
+    # 与 gunicorn post_fork 相同：接受请求前先连库并建好用户前缀索引
+    if Config.DB_WARM_ON_FORK and not warm_up():
+        logger.warning("Database unreachable at startup; connecting on first request")
+
+
+def get_asgi_app() -> ASGIApp:
+    """The process-wide ASGI app, built on first use"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = ASGIApp(get_app(), routes, database=adb, startup=_startup)
+    return _app
+
+
+def __getattr__(name):
+    # `uvicorn asgi:app`：首次访问时才构建
+    if name == "app":
+        return get_asgi_app()
+    if name == "flask_app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
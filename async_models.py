@@ -0,0 +1,174 @@
+# Async model methods for the ASGI serving mode (asgi.py, routes/async_routes.py)
+#
+# SQL statements, caches and query builders are the ones declared in models.py;
+# only the database round trips are awaited (utils.async_database.adb).
+
+from models import Book, BorrowRecord, TransitionOutcome, User, _TransitionAborted, _fulltext_terms
+from utils.async_database import adb
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncUser:
+    """User model (async)"""
+
+    @staticmethod
+    async def find_identity(user_id):
+        """See User.find_identity; shares its cache"""
+        try:
+            key = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        async def load():
+            rows = await adb.execute_query(User.SQL_FIND_IDENTITY, (key,))
+            return rows[0] if rows else None
+
+        user = await User.identity_cache.get_or_load_async(key, load)
+        return dict(user) if user else None
+
+
+class AsyncBook:
+    """Book model (async)"""
+
+    @staticmethod
+    async def get_all(search_title=None, search_author=None, limit=None, cursor=None):
+        statement, params = Book._get_all_query(search_title, search_author, limit, cursor)
+        return await adb.execute_query(statement, params) or []
+
+    @staticmethod
+    async def search(query, limit=50, offset=0):
+        """See Book.search"""
+        terms = _fulltext_terms(query)
+        if not terms:
+            return []
+        rows = None
+        fulltext = adb.sync.supports_fulltext
+        if fulltext and Book.fulltext_index is None:
+            fulltext = Book._fulltext_probed(await adb.execute_query(Book.SQL_FULLTEXT_INDEX))
+        if fulltext and Book.fulltext_index:
+            boolean_query = " ".join(f"+{t}*" for t in terms)
+            rows = await adb.execute_query(Book.SQL_SEARCH_FULLTEXT,
+                                           (boolean_query, boolean_query, int(limit), int(offset)))
+        if rows is None:
+            pattern = f"%{query.strip()}%"
+            rows = await adb.execute_query(Book.SQL_SEARCH_LIKE, (pattern, pattern, int(limit), int(offset))) or []
+        return rows
+
+    @staticmethod
+    async def version():
+        """See Book.version; shares its books_version probe"""
+        if Book.version_table is not False:
+            rows = await adb.execute_query(Book.SQL_VERSION)
+            if rows:
+                Book.version_table = True
+                return Book._version_of(rows[0])
+            if Book.version_table:
+                return None
+        rows = await adb.execute_query(Book.SQL_VERSION_SCAN)
+        if rows and Book.version_table is None:
+            Book._version_probed()
+        return Book._version_of(rows[0]) if rows else None
+
+    @staticmethod
+    async def find_by_id(book_id):
+        """See Book.find_by_id; shares its cache"""
+        try:
+            key = int(book_id)
+        except (TypeError, ValueError):
+            return None
+
+        async def load():
+            rows = await adb.execute_query(Book.SQL_FIND_BY_ID, (key,))
+            return rows[0] if rows else None
+
+        book = await Book.cache.get_or_load_async(key, load)
+        return dict(book) if book else None
+
+    @staticmethod
+    async def find_many(book_ids):
+        """See Book.find_many; shares its cache"""
+        found = await Book.cache.get_many_async(book_ids)
+        misses = [book_id for book_id in book_ids if book_id not in found]
+        if misses:
+            statement, params = Book._find_many_query(misses)
+            rows = await adb.execute_query(statement, params)
+            if rows is None:
+                return None
+            loaded = {row['id']: row for row in rows}
+            await Book.cache.set_many_async(loaded)
+            found.update(loaded)
+        return Book._in_order(book_ids, found)
+
+    @staticmethod
+    async def apply_borrow_change(book_id, from_status, to_status, stock_delta=0):
+        """See Book.apply_borrow_change; the caller invalidates the cached row after commit"""
+        statement, params = Book._borrow_change_query(book_id, from_status, to_status, stock_delta)
+        if statement is None:
+            return True
+        result = await adb.execute_update(statement, params)
+        await Book.cache.invalidate_async(int(book_id))
+        return result
+
+
+class AsyncBorrowRecord:
+    """Borrow record model (async)"""
+
+    @staticmethod
+    async def create(user_id, book_id, borrow_status="requested", borrow_date=None, notes=None):
+        params = BorrowRecord._create_params(user_id, book_id, borrow_status, borrow_date, notes)
+        try:
+            async with adb.transaction():
+                result = await adb.execute_update(BorrowRecord.SQL_CREATE, params)
+                await AsyncBook.apply_borrow_change(book_id, None, borrow_status)
+        except Exception:
+            logger.error("BorrowRecord.create failed", exc_info=True,
+                         extra={"user_id": user_id, "book_id": book_id})
+            raise
+        # 提交后再删一次缓存，避免并发读在提交前把旧数据写回
+        await Book.cache.invalidate_async(int(book_id))
+        return result
+
+    @staticmethod
+    async def history(user_id, borrow_statuses=(), cursor=None, limit=50):
+        """See BorrowRecord.history"""
+        statement, params = BorrowRecord._history_query(user_id, borrow_statuses, cursor, limit)
+        rows = await adb.execute_query(statement, params)
+        return BorrowRecord._history_of(rows) if rows is not None else None
+
+    @staticmethod
+    async def find_by_id(record_id):
+        rows = await adb.execute_query(BorrowRecord.SQL_FIND_BY_ID, (record_id,))
+        return rows[0] if rows else None
+
+    @staticmethod
+    async def find_active_borrow(user_id, book_id):
+        rows = await adb.execute_query(BorrowRecord.SQL_FIND_ACTIVE, (user_id, book_id))
+        return rows[0] if rows else None
+
+    @staticmethod
+    async def transition(record_id, from_status, to_status, book_id=None, stock_delta=0, return_date=None):
+        """See BorrowRecord.transition; returns a TransitionOutcome value"""
+        if from_status == to_status:
+            return TransitionOutcome.OK
+
+        statement, params = BorrowRecord._transition_query(record_id, from_status, to_status, return_date)
+        try:
+            async with adb.transaction():
+                if not await adb.execute_update(statement, params):
+                    exists = await adb.execute_query(BorrowRecord.SQL_EXISTS, (record_id,))
+                    raise _TransitionAborted(
+                        TransitionOutcome.LOST_RACE if exists else TransitionOutcome.NOT_FOUND
+                    )
+                if book_id is not None and \
+                        not await AsyncBook.apply_borrow_change(book_id, from_status, to_status, stock_delta):
+                    exists = await adb.execute_query(Book.SQL_EXISTS, (book_id,))
+                    raise _TransitionAborted(
+                        TransitionOutcome.SOLD_OUT if exists else TransitionOutcome.BOOK_NOT_FOUND
+                    )
+        except _TransitionAborted as e:
+            return e.outcome
+        if book_id is not None:
+            await Book.cache.invalidate_async(int(book_id))
+        return TransitionOutcome.OK
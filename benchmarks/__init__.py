@@ -0,0 +1 @@
+# BookNest benchmarks (run from the repository root: python -m benchmarks.<name>)
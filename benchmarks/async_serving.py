@@ -0,0 +1,199 @@
+"""
+Concurrency per process: sync Flask (WSGI) workers vs the ASGI serving mode.
+
+Replays GET --path from --concurrency closed-loop clients against one process,
+first through the Flask app with --sync-threads request threads (1 = a gunicorn
+sync worker, N = gthread), then through asgi.app on a single event loop. Database
+round trips are slowed by --db-latency-ms to stand in for the WAN hop to MySQL;
+with a local database and no added latency both modes are CPU bound and close.
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/async.sqlite3 \\
+        python -m benchmarks.async_serving --db-latency-ms 5 --concurrency 1,8,32,128
+
+--db-latency-ms applies to the threaded async driver and the sync pool; against a
+real remote MySQL with aiomysql installed, leave it at 0 and let the network add it.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgi import app as asgi_app, flask_app
+from utils.async_database import adb
+from utils.database import db
+
+
+# -------------------------
+# Simulated database latency
+# -------------------------
+class _SlowCursor:
+    def __init__(self, cursor, delay):
+        self._cursor = cursor
+        self._delay = delay
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, query, params=None):
+        time.sleep(self._delay)
+        return self._cursor.execute(query, params)
+
+
+class _SlowConnection:
+    def __init__(self, connection, delay):
+        self._connection = connection
+        self._delay = delay
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args):
+        return _SlowCursor(self._connection.cursor(*args), self._delay)
+
+
+def add_db_latency(delay):
+    connect = db.backend.connect
+    db.backend.connect = lambda: _SlowConnection(connect(), delay)
+    db.pool.reset()
+
+
+# -------------------------
+# Runs
+# -------------------------
+def _summary(mode, concurrency, latencies, elapsed, errors):
+    latencies.sort()
+
+    def pick(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    return {"mode": mode, "concurrency": concurrency, "requests": len(latencies), "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1), "p50_ms": round(pick(0.50), 2),
+            "p99_ms": round(pick(0.99), 2), "mean_ms": round(statistics.fmean(latencies) * 1000, 2)}
+
+
+def run_sync(path, concurrency, requests, threads):
+    """--concurrency client threads sharing a server pool of --sync-threads request threads"""
+    local = threading.local()
+
+    def handle():
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = flask_app.test_client()
+        return client.get(path).status_code
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    per_client = max(1, requests // concurrency)
+
+    def client_loop(server):
+        nonlocal errors
+        for _ in range(per_client):
+            started = time.perf_counter()
+            status = server.submit(handle).result()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += status >= 400
+
+    with ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+        started = time.perf_counter()
+        for future in [clients.submit(client_loop, server) for _ in range(concurrency)]:
+            future.result()
+        elapsed = time.perf_counter() - started
+    return _summary(f"sync x{threads}", concurrency, latencies, elapsed, errors)
+
+
+async def _asgi_get(path):
+    raw_path, _, query = path.partition("?")
+    scope = {"type": "http", "method": "GET", "path": raw_path, "query_string": query.encode(),
+             "headers": [], "http_version": "1.1", "scheme": "http",
+             "server": ("bench", 80), "client": ("127.0.0.1", 0)}
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await asgi_app(scope, receive, send)
+    return status[0]
+
+
+async def run_async(path, concurrency, requests):
+    latencies, errors = [], 0
+    per_client = max(1, requests // concurrency)
+
+    async def client_loop():
+        nonlocal errors
+        for _ in range(per_client):
+            started = time.perf_counter()
+            status = await _asgi_get(path)
+            latencies.append(time.perf_counter() - started)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return _summary(f"asgi ({adb.driver})", concurrency, latencies, time.perf_counter() - started, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/books?limit=20")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma separated client counts")
+    parser.add_argument("--requests", type=int, default=512, help="requests per concurrency level and mode")
+    parser.add_argument("--sync-threads", default="1,8", help="request threads per sync process (comma separated)")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+    sync_threads = [int(t) for t in args.sync_threads.split(",")]
+
+    if args.db_latency_ms:
+        add_db_latency(args.db_latency_ms / 1000)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(adb.start())
+    if args.db_latency_ms and adb.driver != "threaded":
+        raise SystemExit("--db-latency-ms needs the threaded async driver (ASYNC_DB_DRIVER=threaded)")
+    print(f"{db.backend.describe()} async driver={adb.driver} db latency={args.db_latency_ms} ms "
+          f"path={args.path}")
+
+    # 预热：建立连接、填充语句缓存
+    run_sync(args.path, 1, 8, 1)
+    loop.run_until_complete(run_async(args.path, 1, 8))
+
+    results = []
+    print(f"{'mode':<20}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for concurrency in levels:
+        rows = [run_sync(args.path, concurrency, args.requests, threads) for threads in sync_threads]
+        rows.append(loop.run_until_complete(run_async(args.path, concurrency, args.requests)))
+        for row in rows:
+            print(f"{row['mode']:<20}{row['concurrency']:>8}{row['rps']:>10}{row['p50_ms']:>10}"
+                  f"{row['p99_ms']:>10}{row['errors']:>8}")
+        results.extend(rows)
+
+    loop.run_until_complete(adb.close())
+    loop.close()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput benchmark: Book.create one row at a time vs Book.bulk_create in batches.
+
+Inserts --rows synthetic books with each strategy and reports rows/sec. The rows are
+tagged with a random author and deleted afterwards.
+
+    python -m benchmarks.bulk_import --rows 5000 --batch-size 500
+"""
+
+import argparse
+import sys
+import time
+import uuid
+
+from models import Book
+from utils.database import db
+
+
+def _rows(count, author):
+    return [(f"Bulk benchmark book {i}", author, "bulk import benchmark", i % 10, None, 9.9)
+            for i in range(count)]
+
+
+def _single(rows):
+    for row in rows:
+        if not Book.create(*row):
+            sys.exit("Book.create failed - is the database reachable?")
+
+
+def _batched(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        if Book.bulk_create(rows[start:start + batch_size]) is False:
+            sys.exit("Book.bulk_create failed - is the database reachable?")
+
+
+def _timed(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {count:>7} rows  {elapsed:8.3f}s  {rate:10.0f} rows/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--single-rows", type=int, default=None,
+                        help="rows for the single-insert run (defaults to --rows)")
+    args = parser.parse_args()
+
+    author = f"bench-{uuid.uuid4().hex[:8]}"
+    single_rows = args.single_rows or args.rows
+    try:
+        single = _timed("single Book.create", lambda: _single(_rows(single_rows, author)), single_rows)
+        batched = _timed(f"bulk_create (batch {args.batch_size})",
+                         lambda: _batched(_rows(args.rows, author), args.batch_size), args.rows)
+        print(f"speed-up: {batched / single:.1f}x")
+    finally:
+        db.execute_update("DELETE FROM books WHERE author = %s", (author,))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
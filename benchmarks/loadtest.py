@@ -0,0 +1,440 @@
+"""
+Load test for the BookNest API: seed data, replay a request mix, report latency.
+
+Boots app.create_app() in-process (or targets a running server with --url), seeds
+--books / --users / --borrows rows tagged with a run id, then replays a weighted
+mix of browse, search, detail, borrow, approve and return calls from --workers
+threads for --duration seconds. Prints throughput and p50/p95/p99 per endpoint and
+writes the same numbers as JSON (--output) so runs can be diffed against a
+baseline (--baseline, --max-regression). Seeded rows are deleted afterwards
+unless --keep is given.
+
+Point it at a local database, never at the shared one -- a local MySQL, or the
+embedded SQLite backend:
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/loadtest.sqlite3 \\
+        python -m benchmarks.loadtest --books 5000 --users 200 --borrows 2000 \\
+            --workers 16 --duration 30 --output results.json
+    python -m benchmarks.loadtest --baseline results.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from config import Config
+from models import Book
+from utils.database import db
+
+# 各操作的默认权重（约等于线上的读多写少）
+DEFAULT_MIX = {
+    "browse": 40,
+    "search": 20,
+    "detail": 25,
+    "borrow": 7,
+    "approve": 4,
+    "return": 4,
+}
+
+_WORDS = ["python", "history", "garden", "ocean", "music", "kitchen", "winter",
+          "network", "river", "atlas", "mystery", "planet", "design", "harbor"]
+
+
+# -------------------------
+# Transports
+# -------------------------
+class InProcessClient:
+    """Calls the WSGI app directly through Flask's test client (one per thread)"""
+
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True), len(response.data)
+
+
+class HttpClient:
+    """Calls a running server over HTTP, e.g. gunicorn started separately"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                payload, status = response.read(), response.status
+        except urllib.error.HTTPError as e:
+            payload, status = e.read(), e.code
+        try:
+            parsed = json.loads(payload) if payload else None
+        except ValueError:
+            parsed = None
+        return status, parsed, len(payload)
+
+
+# -------------------------
+# Fixtures
+# -------------------------
+class Fixtures:
+    """Rows seeded for one run, plus the work queues the write operations draw from"""
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.book_ids = []
+        self.user_ids = []
+        self.admin_id = None
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.requested = []  # [(record_id, user_id)] 待审批
+        self.borrowed = []   # [(record_id, user_id)] 待归还
+
+    def push(self, queue, item):
+        with self.lock:
+            queue.append(item)
+
+    def pop(self, queue):
+        with self.lock:
+            if not queue:
+                return None
+            return queue.pop(random.randrange(len(queue)))
+
+
+def _require(result, what):
+    if result is False or result is None:
+        sys.exit(f"Seeding {what} failed - is the database reachable?")
+    return result
+
+
+def seed(tag, books, users, borrows, stock, rng):
+    fixtures = Fixtures(tag)
+    author = f"loadtest-{tag}"
+
+    rows = [(f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {i}", author, "load test fixture",
+             stock, None, round(rng.uniform(5, 80), 2)) for i in range(books)]
+    for start in range(0, len(rows), Config.BULK_IMPORT_BATCH_SIZE):
+        _require(db.execute_many(
+            "INSERT INTO books (title, author, description, stock, cover_image_url, price) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", rows[start:start + Config.BULK_IMPORT_BATCH_SIZE]), "books")
+    fixtures.book_ids = [r["id"] for r in _require(
+        db.execute_query("SELECT id FROM books WHERE author = %s", (author,)), "books")]
+
+    now = datetime.now()
+    accounts = [(f"{author}-u{i}", f"{author}-u{i}@example.com", "!", "user", now) for i in range(users)]
+    accounts.append((f"{author}-admin", f"{author}-admin@example.com", "!", "admin", now))
+    _require(db.execute_many(
+        "INSERT INTO users (username, email, password_hash, role, create_at) "
+        "VALUES (%s, %s, %s, %s, %s)", accounts), "users")
+    for row in _require(db.execute_query(
+            "SELECT id, role FROM users WHERE email LIKE %s", (f"{author}-%@example.com",)), "users"):
+        if row["role"] == "admin":
+            fixtures.admin_id = row["id"]
+        else:
+            fixtures.user_ids.append(row["id"])
+
+    # 历史借阅：按 requested / borrowed / returned 大致 2:3:5 分布
+    history = []
+    for _ in range(borrows):
+        status = rng.choices(["requested", "borrowed", "returned"], [2, 3, 5])[0]
+        borrow_date = now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86400))
+        return_date = borrow_date + timedelta(days=rng.randint(1, 30)) if status == "returned" else None
+        history.append((rng.choice(fixtures.user_ids), rng.choice(fixtures.book_ids),
+                        status, borrow_date, return_date))
+    for start in range(0, len(history), Config.BULK_IMPORT_BATCH_SIZE):
+        _require(db.execute_many(
+            "INSERT INTO borrows (user_id, book_id, borrow_status, borrow_date, return_date) "
+            "VALUES (%s, %s, %s, %s, %s)", history[start:start + Config.BULK_IMPORT_BATCH_SIZE]), "borrows")
+    if borrows:
+        # 历史借阅是直接插入的，补齐图书上的借阅计数列
+        _require(Book.reconcile_counters(fix=True), "availability counters")
+        for row in _require(db.execute_query(
+                "SELECT b.id, b.user_id, b.borrow_status FROM borrows b "
+                "JOIN books k ON k.id = b.book_id WHERE k.author = %s", (author,)), "borrows"):
+            if row["borrow_status"] == "requested":
+                fixtures.requested.append((row["id"], row["user_id"]))
+            elif row["borrow_status"] == "borrowed":
+                fixtures.borrowed.append((row["id"], row["user_id"]))
+    return fixtures
+
+
+def teardown(tag):
+    author = f"loadtest-{tag}"
+    db.execute_update("DELETE FROM borrows WHERE book_id IN (SELECT id FROM books WHERE author = %s)", (author,))
+    db.execute_update("DELETE FROM borrows WHERE user_id IN (SELECT id FROM users WHERE email LIKE %s)",
+                      (f"{author}-%@example.com",))
+    db.execute_update("DELETE FROM books WHERE author = %s", (author,))
+    db.execute_update("DELETE FROM users WHERE email LIKE %s", (f"{author}-%@example.com",))
+
+
+def issue_tokens(app, fixtures):
+    # 直接签发 token，避免把密码哈希的开销算进每个操作
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        for user_id in fixtures.user_ids + [fixtures.admin_id]:
+            fixtures.tokens[user_id] = create_access_token(identity=str(user_id))
+
+
+# -------------------------
+# Operations
+# -------------------------
+# 每个操作返回 (endpoint 名, HTTP 状态码, 响应字节数)；没有可用数据时返回 None
+def op_browse(client, fx, rng, state):
+    path = "/api/books?limit=20"
+    cursor = state.get("cursor")
+    if cursor and rng.random() < 0.5:
+        path += f"&cursor={cursor}"
+    status, body, size = client.request("GET", path)
+    state["cursor"] = (body or {}).get("next_cursor")
+    return "GET /api/books", status, size
+
+
+def op_search(client, fx, rng, state):
+    status, _, size = client.request("GET", f"/api/books?q={rng.choice(_WORDS)}&limit=20")
+    return "GET /api/books?q=", status, size
+
+
+def op_detail(client, fx, rng, state):
+    status, _, size = client.request("GET", f"/api/books/{rng.choice(fx.book_ids)}")
+    return "GET /api/books/<id>", status, size
+
+
+def op_borrow(client, fx, rng, state):
+    user_id = rng.choice(fx.user_ids)
+    status, body, size = client.request("POST", "/api/borrows", {"book_id": rng.choice(fx.book_ids)},
+                                        fx.tokens[user_id])
+    if status == 201:
+        fx.push(fx.requested, (body["data"]["borrow_id"], user_id))
+    return "POST /api/borrows", status, size
+
+
+def op_approve(client, fx, rng, state):
+    item = fx.pop(fx.requested)
+    if item is None:
+        return None
+    status, _, size = client.request("PUT", f"/api/borrows/{item[0]}/borrow_status",
+                                     {"borrow_status": "borrowed"}, fx.tokens[fx.admin_id])
+    if status == 200:
+        fx.push(fx.borrowed, item)
+    return "PUT /api/borrows/<id>/borrow_status", status, size
+
+
+def op_return(client, fx, rng, state):
+    item = fx.pop(fx.borrowed)
+    if item is None:
+        return None
+    status, _, size = client.request("PUT", f"/api/borrows/{item[0]}/return", {}, fx.tokens[item[1]])
+    return "PUT /api/borrows/<id>/return", status, size
+
+
+OPERATIONS = {
+    "browse": op_browse,
+    "search": op_search,
+    "detail": op_detail,
+    "borrow": op_borrow,
+    "approve": op_approve,
+    "return": op_return,
+}
+
+
+# -------------------------
+# Runner
+# -------------------------
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.bytes = Counter()
+
+    def record(self, endpoint, status, size, elapsed):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+            self.bytes[endpoint] += size
+
+
+def _worker(client, fixtures, mix, seed_value, deadline, recorder):
+    rng = random.Random(seed_value)
+    names, weights = zip(*mix.items())
+    state = {}
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            result = OPERATIONS[name](client, fixtures, rng, state)
+        except Exception:
+            result = (name, "exception", 0)
+        if result is not None:
+            recorder.record(*result, time.perf_counter() - started)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarise(recorder, elapsed):
+    endpoints, total = {}, 0
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values.sort()
+        statuses = recorder.statuses[endpoint]
+        errors = sum(n for status, n in statuses.items() if status == "exception" or status >= 500)
+        total += len(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": errors,
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+            "mean_bytes": round(recorder.bytes[endpoint] / len(values)),
+            "status": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        }
+    return {"total_requests": total, "total_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+def print_report(results, baseline=None):
+    header = f"{'endpoint':<38} {'reqs':>7} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in results["endpoints"].items():
+        line = (f"{endpoint:<38} {row['requests']:>7} {row['rps']:>9.1f} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>5}")
+        base = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if base and base["p95_ms"]:
+            line += f"   p95 {(row['p95_ms'] / base['p95_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+    print(f"total {results['total_requests']} requests, {results['total_rps']:.1f} req/s")
+    if results.get("statements"):
+        print(f"\n{'statement':<38} {'calls':>7} {'avg ms':>8} {'max ms':>8} {'total ms':>10}")
+        for row in results["statements"][:10]:
+            print(f"{row['name']:<38} {row['calls']:>7} {row['avg_ms']:>8.2f} {row['max_ms']:>8.2f} "
+                  f"{row['total_ms']:>10.1f}")
+
+
+def regressions(results, baseline, threshold):
+    """Endpoints whose p95 got worse than the baseline by more than threshold (0.2 = 20%)"""
+    found = []
+    for endpoint, row in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if base and base["p95_ms"] and row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            found.append(endpoint)
+    return found
+
+
+def _parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or "").split(",")):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--borrows", type=int, default=1000)
+    parser.add_argument("--stock", type=int, default=50, help="copies per seeded book")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", type=_parse_mix, default=dict(DEFAULT_MIX),
+                        help="weights, e.g. browse=50,search=10,borrow=0")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="target a running server instead of an in-process app")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit 1 if any endpoint's p95 exceeds the baseline by this fraction")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in place")
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    client = HttpClient(args.url) if args.url else InProcessClient(app)
+    print(f"target {args.url or 'in-process app'}, database {db.backend.describe()}")
+
+    rng = random.Random(args.seed)
+    tag = uuid.uuid4().hex[:8]
+    started = time.perf_counter()
+    fixtures = seed(tag, args.books, args.users, args.borrows, args.stock, rng)
+    print(f"seeded {len(fixtures.book_ids)} books, {len(fixtures.user_ids)} users, "
+          f"{args.borrows} borrows in {time.perf_counter() - started:.1f}s (tag {tag})")
+    try:
+        issue_tokens(app, fixtures)
+        for phase, seconds in (("warmup", args.warmup), ("measure", args.duration)):
+            if seconds <= 0:
+                continue
+            recorder = Recorder()
+            deadline = time.perf_counter() + seconds
+            threads = [threading.Thread(target=_worker,
+                                        args=(client, fixtures, args.mix, args.seed * 1000 + i,
+                                              deadline, recorder))
+                       for i in range(args.workers)]
+            phase_started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - phase_started
+    finally:
+        if not args.keep:
+            teardown(tag)
+
+    results = summarise(recorder, elapsed)
+    results["meta"] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "books": args.books, "users": args.users, "borrows": args.borrows,
+        "workers": args.workers, "duration_s": round(elapsed, 2), "mix": args.mix, "seed": args.seed,
+    }
+
+    if not args.url:
+        # 同一进程内运行时附带各条登记语句的统计（见 utils.database.Statement）
+        results["statements"] = [row for row in db.statement_stats() if row["calls"]]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"results written to {args.output}")
+
+    if baseline is not None and args.max_regression is not None:
+        worse = regressions(results, baseline, args.max_regression)
+        if worse:
+            print(f"p95 regression over {args.max_regression:.0%}: {', '.join(worse)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
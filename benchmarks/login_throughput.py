@@ -0,0 +1,74 @@
+"""
+Login-burst benchmark for the password hashing pool.
+
+Simulates --logins concurrent password checks from --threads request threads, first
+inline on the request threads (the old check_password_hash path), then through
+utils.passwords' process pool. While each burst runs, a probe thread repeatedly
+serialises a book-list sized payload, standing in for a cheap GET /api/books, and
+records how long it stalls behind the hashing work.
+
+    python -m benchmarks.login_throughput --logins 64 --threads 16
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import passwords
+
+_PAYLOAD = [{"id": i, "title": f"Book {i}", "author": "Author", "stock": i % 7, "price": 9.9}
+            for i in range(200)]
+
+
+def _probe(stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        json.dumps(_PAYLOAD)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.005)
+
+
+def _burst(label, check, pwhash, logins, threads):
+    stop = threading.Event()
+    probe_latencies = []
+    probe = threading.Thread(target=_probe, args=(stop, probe_latencies), daemon=True)
+    probe.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: check(pwhash, "correct horse"), range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    probe.join()
+    probe_latencies.sort()
+    p99 = probe_latencies[int(len(probe_latencies) * 0.99)] if probe_latencies else 0.0
+    assert all(results), "password check failed"
+    print(f"{label:<8} {logins / elapsed:8.1f} logins/s   burst {elapsed:6.2f}s   "
+          f"cheap-request p99 {p99 * 1000:7.2f} ms ({len(probe_latencies)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    pwhash = passwords.hash_password("correct horse")
+    print(f"policy {pwhash.split('$', 1)[0]}, pool workers {passwords.pool.workers}, "
+          f"max pending {passwords.pool.max_pending}")
+
+    _burst("inline", passwords.verify_password, pwhash, args.logins, args.threads)
+    if passwords.pool.workers:
+        passwords.check_password(pwhash, "warm-up")  # 启动工作进程，不计入结果
+        _burst("pool", passwords.check_password, pwhash, args.logins, args.threads)
+        print(f"rejected (503) during pool burst: {passwords.pool.rejected}")
+        passwords.pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
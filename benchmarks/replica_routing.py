@@ -0,0 +1,123 @@
+"""
+Read/write splitting with two local SQLite files standing in for MySQL replicas.
+
+Snapshots the SQLite primary into two replica files, then runs four phases against a
+Database(primary, replicas=[replica1, replica2]):
+
+  spread     --reads reads from --threads threads: how they split across replicas / primary
+  outage     the same load while replica2's file disappears: every read must still succeed
+  recovered  replica2 is back: after its next health check it rejoins the rotation
+  ryw        write-then-read loops: a read after a write must never see replica (stale) data
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/rw.sqlite3 python -m benchmarks.replica_routing --reads 20000 --threads 8
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from models import Book
+from utils import backends
+from utils.database import Database, db
+
+
+def _snapshot(path, replica_path):
+    # backup() 连同 WAL 中尚未检查点的数据一起复制
+    source, target = sqlite3.connect(path), sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def _run(routed, reads, threads, during=None):
+    errors = 0
+    lock = threading.Lock()
+    per_thread = max(1, reads // threads)
+
+    def loop(index):
+        nonlocal errors
+        for i in range(per_thread):
+            if during is not None and index == 0 and i == per_thread // 2:
+                during()
+            if routed.execute_query(Book.SQL_FIND_BY_ID, (1,)) is None:
+                with lock:
+                    errors += 1
+
+    before = {name: stats["checkouts"] for name, stats in routed.replica_stats().items()}
+    before["primary"] = routed.pool_stats()["checkouts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(loop, range(threads)))
+    elapsed = time.perf_counter() - started
+    after = {name: stats["checkouts"] for name, stats in routed.replica_stats().items()}
+    after["primary"] = routed.pool_stats()["checkouts"]
+    spread = {name: after[name] - before[name] for name in after}
+    return {"reads": per_thread * threads, "errors": errors, "rps": round(per_thread * threads / elapsed, 1),
+            "checkouts": spread}
+
+
+def _read_your_writes(routed, rounds):
+    """Update the primary, read straight back; replicas still hold the snapshot value"""
+    stale = 0
+    original = routed.execute_query(Book.SQL_FIND_BY_ID, (1,))[0]["description"]
+    for i in range(rounds):
+        marker = f"ryw-{i}"
+        routed.execute_update("UPDATE books SET description = %s WHERE id = 1", (marker,))
+        rows = routed.execute_query(Book.SQL_FIND_BY_ID, (1,))
+        stale += not rows or rows[0]["description"] != marker
+    routed.execute_update("UPDATE books SET description = %s WHERE id = 1", (original,))
+    return {"rounds": rounds, "stale_reads": stale}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ryw-rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if db.backend.name != "sqlite":
+        sys.exit("Run with DB_BACKEND=sqlite: the replicas are snapshots of the SQLite primary")
+    if not db.execute_query(Book.SQL_FIND_BY_ID, (1,)):
+        sys.exit("Book 1 not found - is the database seeded?")
+    # 故障副本在下一次检查前不参与轮询；缩短间隔让恢复也能在一次运行中看到
+    Config.DB_REPLICA_CHECK_INTERVAL = 0.5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"replica{i}.sqlite3") for i in (1, 2)]
+        for path in paths:
+            _snapshot(db.backend.path, path)
+        routed = Database(backends.create("sqlite"),
+                          replicas=[backends.from_dsn(f"sqlite:///{path}", read_only=True) for path in paths])
+
+        def outage():
+            os.rename(paths[1], paths[1] + ".down")
+            # 丢弃已打开的连接，模拟副本宕机后新建连接失败
+            routed.replicas[1].pool.reset()
+
+        results = {
+            "spread": _run(routed, args.reads, args.threads),
+            "outage": _run(routed, args.reads, args.threads, during=outage),
+        }
+        os.rename(paths[1] + ".down", paths[1])
+        time.sleep(Config.DB_REPLICA_CHECK_INTERVAL)
+        results["recovered"] = _run(routed, args.reads, args.threads)
+        results["ryw"] = _read_your_writes(routed, args.ryw_rounds)
+
+    for phase, row in results.items():
+        print(f"{phase:<10} {row}")
+    print("replicas  ", routed.replica_stats())
+    if results["outage"]["errors"] or results["ryw"]["stale_reads"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cold-start cost of one API process: import, app construction and first request.
+
+Each of --runs fresh interpreters imports the app module, builds the app with
+get_app(), then sends GET --path twice through the Flask test client: the first
+request pays for the first database connection and the lazily built caches, the
+second one is the steady state. --warm calls db.warm() (what gunicorn's post_fork
+hook does) before the first request. Medians over the runs are reported.
+
+--gunicorn additionally starts `gunicorn -c gunicorn.conf.py` with one worker and
+measures the time from spawning it until /api/health answers, and then the
+first GET --path over HTTP.
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/startup.sqlite3 python -m benchmarks.startup --runs 10 --gunicorn
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MARKER = "STARTUP "
+
+
+def _child(path, warm):
+    """Runs in a fresh interpreter: time each startup step and print them as one JSON line"""
+    timings = {}
+    started = time.perf_counter()
+    import app as app_module
+    timings["import_ms"] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    flask_app = app_module.get_app()
+    timings["create_app_ms"] = time.perf_counter() - mark
+
+    if warm:
+        from utils.database import db
+        mark = time.perf_counter()
+        db.warm()
+        timings["warm_ms"] = time.perf_counter() - mark
+
+    client = flask_app.test_client()
+    statuses = []
+    for key in ("first_request_ms", "second_request_ms"):
+        mark = time.perf_counter()
+        statuses.append(client.get(path).status_code)
+        timings[key] = time.perf_counter() - mark
+    timings["total_ms"] = time.perf_counter() - started
+    timings = {key: round(value * 1000, 2) for key, value in timings.items()}
+    print(_MARKER + json.dumps({**timings, "status": statuses}), flush=True)
+
+
+def _run_child(path, warm):
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--path", path]
+    if warm:
+        command.append("--warm")
+    started = time.perf_counter()
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    process_ms = round((time.perf_counter() - started) * 1000, 2)
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            return {**json.loads(line[len(_MARKER):]), "process_ms": process_ms}
+    raise RuntimeError(f"No timings in child output:\n{output}")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _run_gunicorn(path, timeout=30):
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY="1")
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"gunicorn not ready after {timeout}s")
+            try:
+                if _get(base + "/api/health", timeout=1) == 200:
+                    break
+            except OSError:
+                time.sleep(0.01)
+        ready_ms = (time.perf_counter() - started) * 1000
+        mark = time.perf_counter()
+        status = _get(base + path)
+        first_ms = (time.perf_counter() - mark) * 1000
+        return {"ready_ms": round(ready_ms, 2), "first_request_ms": round(first_ms, 2), "status": [status]}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=timeout)
+
+
+def _report(label, rows):
+    keys = [key for key in rows[0] if key != "status"]
+    medians = {key: round(statistics.median(row[key] for row in rows), 2) for key in keys}
+    statuses = sorted({status for row in rows for status in row["status"]})
+    print(f"{label:<10} " + "  ".join(f"{key}={value}" for key, value in medians.items()) + f"  status={statuses}")
+    return {"mode": label, "runs": len(rows), **medians, "status": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/api/books?limit=20")
+    parser.add_argument("--warm", action="store_true", help="call db.warm() before the first request")
+    parser.add_argument("--gunicorn", action="store_true", help="also time a real gunicorn start")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.path, args.warm)
+        return
+
+    # 先跑一次：生成字节码、（SQLite）建库，不计入结果
+    _run_child(args.path, args.warm)
+    results = [_report("process", [_run_child(args.path, args.warm) for _ in range(args.runs)])]
+    if args.gunicorn:
+        results.append(_report("gunicorn", [_run_gunicorn(args.path) for _ in range(args.runs)]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Concurrency benchmark for BorrowRecord.transition (stock reservation).
+
+Creates one book with --stock copies and --requests pending borrow requests, then
+moves all of them at once from --workers processes x --threads threads, the way
+several gunicorn workers would. Two scenarios (--scenario, default both):
+
+  borrow   requested -> borrowed for every request (direct lending)
+  approve  requested -> approved for every request, then approved -> borrowed for
+           the approved ones, again all at once
+
+Exactly min(stock, requests) approvals or loans must succeed and the book's stock
+must end at max(0, stock - requests). In the approve scenario the second phase must
+convert every reservation without touching stock again.
+
+    python -m benchmarks.stock_reservation --stock 20 --requests 500 --workers 4 --threads 8
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from models import Book, BorrowRecord, User, TransitionOutcome
+from utils.database import db
+
+
+def _worker(args):
+    """Move a slice of the records from one process using a thread pool"""
+    book_id, record_ids, from_status, to_status, threads = args
+    stock_delta = BorrowRecord.stock_change(from_status, to_status)
+
+    def move(record_id):
+        started = time.perf_counter()
+        outcome = BorrowRecord.transition(record_id, from_status, to_status,
+                                          book_id=book_id, stock_delta=stock_delta)
+        return record_id, outcome, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(move, record_ids))
+
+
+def _setup(stock, requests):
+    tag = uuid.uuid4().hex[:8]
+    user_id = User.create(f"bench-{tag}", f"bench-{tag}@example.com", "!", "user")
+    book_id = Book.create(f"bench-{tag}", "benchmark", "stock reservation benchmark", stock)
+    if not user_id or not book_id:
+        sys.exit("Could not create benchmark fixtures - is the database reachable?")
+    record_ids = [BorrowRecord.create(user_id, book_id, "requested") for _ in range(requests)]
+    return user_id, book_id, record_ids
+
+
+def _teardown(user_id, book_id):
+    db.execute_update("DELETE FROM borrows WHERE book_id = %s", (book_id,))
+    db.execute_update("DELETE FROM books WHERE id = %s", (book_id,))
+    db.execute_update("DELETE FROM users WHERE id = %s", (user_id,))
+
+
+def _hammer(book_id, record_ids, from_status, to_status, workers, threads):
+    """Run one transition for every record at once; prints and returns (ok record ids, outcomes)"""
+    # 释放父进程中的连接，子进程会各自建立连接池
+    db.pool.close()
+    db.pool.reset()
+
+    chunks = [(book_id, record_ids[i::workers], from_status, to_status, threads) for i in range(workers)]
+    started = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        results = [r for chunk in pool.map(_worker, chunks) for r in chunk]
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter(outcome for _, outcome, _ in results)
+    latencies = sorted(latency for _, _, latency in results)
+    print(f"{from_status} -> {to_status}")
+    print(f"  attempted         : {len(results)}")
+    if results:
+        print(f"  elapsed           : {elapsed:.3f}s ({len(results) / elapsed:.0f} transitions/s)")
+        print(f"  p50 / p99 latency : {latencies[len(latencies) // 2] * 1000:.2f} ms / "
+              f"{latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"    {outcome:<10}: {count}")
+    return [record_id for record_id, outcome, _ in results if outcome == TransitionOutcome.OK], outcomes
+
+
+def _book_state(book_id):
+    Book.cache.clear()
+    book = Book.find_by_id(book_id)
+    return book["stock"], book["reserved_count"], book["on_loan_count"]
+
+
+def _check(label, actual, expected):
+    print(f"  {label:<18}: {actual} (expected {expected})")
+    return actual == expected
+
+
+def _run(scenario, args):
+    user_id, book_id, record_ids = _setup(args.stock, args.requests)
+    expected_ok = min(args.stock, args.requests)
+    final_stock = args.stock - expected_ok
+    try:
+        print(f"== {scenario}")
+        first = "borrowed" if scenario == "borrow" else "approved"
+        ok_ids, outcomes = _hammer(book_id, record_ids, "requested", first, args.workers, args.threads)
+        stock, reserved, on_loan = _book_state(book_id)
+        passed = all([
+            _check("succeeded", outcomes[TransitionOutcome.OK], expected_ok),
+            _check("stock", stock, final_stock),
+            _check("reserved_count", reserved, expected_ok if first == "approved" else 0),
+            _check("on_loan_count", on_loan, expected_ok if first == "borrowed" else 0),
+        ])
+        if scenario == "approve":
+            # 预留转为借出：不再扣减库存，全部成功
+            _, outcomes = _hammer(book_id, ok_ids, "approved", "borrowed", args.workers, args.threads)
+            stock, reserved, on_loan = _book_state(book_id)
+            passed = all([
+                passed,
+                _check("succeeded", outcomes[TransitionOutcome.OK], expected_ok),
+                _check("stock", stock, final_stock),
+                _check("reserved_count", reserved, 0),
+                _check("on_loan_count", on_loan, expected_ok),
+            ])
+        return passed
+    finally:
+        _teardown(user_id, book_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="processes (gunicorn workers)")
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--scenario", choices=("borrow", "approve", "both"), default="both")
+    args = parser.parse_args()
+
+    scenarios = ("borrow", "approve") if args.scenario == "both" else (args.scenario,)
+    ok = all([_run(scenario, args) for scenario in scenarios])
+    print("RESULT: PASS" if ok else "RESULT: FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
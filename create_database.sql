@@ -40,14 +40,27 @@ CREATE TABLE `books` (
     `stock` int UNSIGNED NOT NULL DEFAULT 0 COMMENT '库存数量',
     `cover_image_url` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL COMMENT '封面图片URL',
     `price` decimal(10,2) NOT NULL DEFAULT 0.00 COMMENT '价格',
+    `pending_count` int UNSIGNED NOT NULL DEFAULT 0 COMMENT '待审批借阅数',
+    `reserved_count` int UNSIGNED NOT NULL DEFAULT 0 COMMENT '已批准未借出数',
+    `on_loan_count` int UNSIGNED NOT NULL DEFAULT 0 COMMENT '借出中数量',
     `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     PRIMARY KEY (`id`) USING BTREE,
     INDEX `idx_title` (`title`) USING BTREE,
     INDEX `idx_author` (`author`) USING BTREE,
-    INDEX `idx_created_at` (`created_at`) USING BTREE
+    INDEX `idx_created_at` (`created_at`) USING BTREE,
+    INDEX `idx_updated_at` (`updated_at`) USING BTREE,
+    FULLTEXT INDEX `ft_title_author` (`title`, `author`) WITH PARSER ngram
 ) ENGINE=InnoDB AUTO_INCREMENT=1 CHARACTER SET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='图书表';
 
+-- 单行表：删除图书的次数。GET /api/books 的版本探测 = MAX(updated_at) + 此计数，不再 COUNT(*) 全表
+DROP TABLE IF EXISTS `books_version`;
+CREATE TABLE `books_version` (
+    `id` tinyint UNSIGNED NOT NULL COMMENT '固定为 1',
+    `deletions` bigint UNSIGNED NOT NULL DEFAULT 0 COMMENT '已删除图书的累计次数',
+    PRIMARY KEY (`id`) USING BTREE
+) ENGINE=InnoDB CHARACTER SET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='图书列表版本';
+
 -- ===================================================================
 -- 4. 创建借阅记录表 (borrows)
 -- ===================================================================
@@ -63,7 +76,7 @@ CREATE TABLE `borrows` (
     `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     PRIMARY KEY (`id`) USING BTREE,
-    INDEX `idx_user_id` (`user_id`) USING BTREE,
+    INDEX `idx_user_borrow_date` (`user_id`, `borrow_date`) USING BTREE,
     INDEX `idx_book_id` (`book_id`) USING BTREE,
     INDEX `idx_borrow_status` (`borrow_status`) USING BTREE,
     INDEX `idx_borrow_date` (`borrow_date`) USING BTREE,
@@ -86,11 +99,19 @@ INSERT INTO `books` (`title`, `author`, `description`, `stock`, `cover_image_url
 ('深入理解计算机系统', 'Randal E. Bryant', '系统程序员必读，深入理解计算机系统原理', 4, 'https://picsum.photos/300/400?random=4', 139.00),
 ('设计模式', 'Erich Gamma', '面向对象设计经典，23种设计模式详解', 6, 'https://picsum.photos/300/400?random=5', 79.00);
 
+INSERT INTO `books_version` (`id`, `deletions`) VALUES (1, 0);
+
 -- 插入示例借阅记录
 INSERT INTO `borrows` (`user_id`, `book_id`, `borrow_status`, `notes`) VALUES 
 (2, 1, 'borrowed', '学习Python编程'),
 (2, 2, 'requested', '想学习JavaScript');
 
+-- 借阅计数列（待审批 / 已批准 / 借出中），之后由借阅流程维护
+UPDATE books
+   SET pending_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'requested'),
+       reserved_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'approved'),
+       on_loan_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'borrowed');
+
 -- ===================================================================
 -- 6. 重新开启外键检查
 -- ===================================================================
@@ -0,0 +1,6 @@
+-- 为已有数据库添加书名/作者全文索引（GET /api/books?q= 使用）
+-- ngram 分词器用于中文书名，默认 ngram_token_size = 2
+SET NAMES utf8mb4;
+
+ALTER TABLE books
+  ADD FULLTEXT INDEX ft_title_author (title, author) WITH PARSER ngram;
@@ -0,0 +1,10 @@
+-- 条件 GET（GET /api/books 的 ETag / Last-Modified）每次先探测一次表版本：
+--   SELECT (SELECT MAX(updated_at) FROM books), (SELECT deletions FROM books_version WHERE id = 1)
+-- 有索引时 MAX(updated_at) 只读一个叶子节点；删除由 books_version.deletions 计数（005_books_version.sql），
+-- 不再需要 COUNT(*) 扫全表。未执行 005 的库退回 COUNT(*), MAX(updated_at)
+--
+-- 按旧版 db/seed_current_schema.sql 建的库还没有 updated_at 列（Book.update / update_stock 会写入该列），需先执行：
+--   ALTER TABLE books ADD COLUMN updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+ALTER TABLE books
+  ADD INDEX idx_updated_at (updated_at);
@@ -0,0 +1,15 @@
+-- 图书可借状态计数列：GET /api/books 直接读取，不再按 borrows 统计
+--   可借 = stock，预留 = reserved_count（approved），借出 = on_loan_count（borrowed），待审批 = pending_count（requested）
+-- 由借阅流程（BorrowRecord.create / transition）在同一事务中维护；
+-- 漂移用 `flask --app app reconcile-availability [--fix]` 检查与修正
+
+ALTER TABLE books
+  ADD COLUMN pending_count INT UNSIGNED NOT NULL DEFAULT 0,
+  ADD COLUMN reserved_count INT UNSIGNED NOT NULL DEFAULT 0,
+  ADD COLUMN on_loan_count INT UNSIGNED NOT NULL DEFAULT 0;
+
+-- 借阅计数列（待审批 / 已批准 / 借出中），之后由借阅流程维护
+UPDATE books
+   SET pending_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'requested'),
+       reserved_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'approved'),
+       on_loan_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'borrowed');
@@ -0,0 +1,10 @@
+-- 个人借阅历史（GET /api/borrows/user/<id>，BorrowRecord.history）：
+--   WHERE user_id = ? [AND borrow_status IN (...)] ORDER BY borrow_date DESC, id DESC LIMIT ?
+-- 复合索引按用户定位后直接倒序读取一页，不再把该用户的全部记录取出排序（InnoDB 二级索引自带主键 id）
+
+ALTER TABLE borrows
+  ADD INDEX idx_user_borrow_date (user_id, borrow_date);
+
+-- 原单列 user_id 索引已是新索引的最左前缀（外键也可使用新索引），确认无其他依赖后可删除：
+--   create_database.sql 建的库：   ALTER TABLE borrows DROP INDEX idx_user_id;
+--   db/seed_current_schema.sql 建的库：ALTER TABLE borrows DROP INDEX user_id;
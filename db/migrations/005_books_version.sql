@@ -0,0 +1,12 @@
+-- GET /api/books 的条件 GET 版本探测（Book.version）：
+--   新增与修改由 MAX(updated_at) 反映（走 idx_updated_at），删除由 books_version.deletions 反映，
+--   不再每次请求 COUNT(*) 扫描全表。Book.delete 在同一事务中删除图书并累加计数。
+-- 未执行本迁移时服务退回 COUNT(*) 探测，并在日志中提示一次
+
+CREATE TABLE books_version (
+  id TINYINT UNSIGNED NOT NULL,
+  deletions BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO books_version (id, deletions) VALUES (1, 0);
@@ -0,0 +1,8 @@
+-- 批准借阅即预留库存（BorrowRecord.stock_change）：requested -> approved 条件扣减 stock，
+-- approved -> borrowed 不再扣减，approved -> denied 退还。
+-- 旧代码批准时不扣库存：部署新代码时执行一次，为已批准（reserved_count）的记录补扣；
+-- 库存不足以覆盖时记为 0（说明此前已超额批准，需人工核对这些记录）
+
+UPDATE books
+   SET stock = CASE WHEN stock > reserved_count THEN stock - reserved_count ELSE 0 END
+ WHERE reserved_count > 0;
@@ -0,0 +1,9 @@
+-- 图书列表（GET /api/books，Book.get_all）的 keyset 分页：
+--   WHERE created_at <= ? AND (created_at < ? OR id < ?) ORDER BY created_at DESC, id DESC LIMIT ?
+-- 没有 created_at 上的索引时每一页都要对全部图书排序（filesort）；
+-- 有了 (created_at, id) 索引即按索引倒序读取 limit 行，翻到多深都一样
+
+ALTER TABLE books
+  ADD INDEX idx_created_at (created_at, id);
+
+-- create_database.sql 建的库已有单列 idx_created_at（InnoDB 二级索引自带主键 id，效果相同），无需执行本迁移
@@ -27,7 +27,21 @@ CREATE TABLE books (
   cover_image_url VARCHAR(255) NULL,
   stock INT UNSIGNED NOT NULL DEFAULT 0,
   price DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+  pending_count INT UNSIGNED NOT NULL DEFAULT 0,
+  reserved_count INT UNSIGNED NOT NULL DEFAULT 0,
+  on_loan_count INT UNSIGNED NOT NULL DEFAULT 0,
   created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (id),
+  KEY idx_created_at (created_at, id),
+  KEY idx_updated_at (updated_at),
+  FULLTEXT KEY ft_title_author (title, author) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 创建 books_version 表（单行：删除图书的计数，GET /api/books 的版本探测用）
+CREATE TABLE books_version (
+  id TINYINT UNSIGNED NOT NULL,
+  deletions BIGINT UNSIGNED NOT NULL DEFAULT 0,
   PRIMARY KEY (id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -41,7 +55,7 @@ CREATE TABLE borrows (
   borrow_status ENUM('borrowed','returned','requested','denied','approved') NOT NULL DEFAULT 'requested',
   notes TEXT NULL,
   PRIMARY KEY (id),
-  KEY user_id (user_id),
+  KEY idx_user_borrow_date (user_id, borrow_date),
   KEY book_id (book_id),
   CONSTRAINT borrows_ibfk_1 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE RESTRICT ON UPDATE RESTRICT,
   CONSTRAINT borrows_ibfk_2 FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE RESTRICT ON UPDATE RESTRICT
@@ -58,6 +72,9 @@ INSERT INTO books (id, title, author, description, stock, cover_image_url, price
   (1, 'Python 编程', '张三', 'Python 入门教程', 13, 'https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTGuZ0mDCP3I9AftJmiC5t8A3xxCoMGZRicNQ&s', 0.00, '2025-07-25 09:00:53'),
   (3, '挺好听任何', '3434', '规划法规和', 343, 'https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTGuZ0mDCP3I9AftJmiC5t8A3xxCoMGZRicNQ&s', 0.00, '2025-07-26 10:28:55');
 
+-- 插入 books_version
+INSERT INTO books_version (id, deletions) VALUES (1, 0);
+
 -- 插入 borrows
 INSERT INTO borrows (id, user_id, book_id, borrow_date, return_date, borrow_status, notes) VALUES
   (1, 3, 1, '2025-07-25 09:02:12', NULL, 'denied', NULL),
@@ -65,4 +82,10 @@ INSERT INTO borrows (id, user_id, book_id, borrow_date, return_date, borrow_stat
   (3, 3, 3, '2025-07-26 11:00:10', NULL, 'requested', NULL),
   (4, 3, 3, '2025-07-31 00:00:00', NULL, 'requested', NULL);
 
+-- 借阅计数列（待审批 / 已批准 / 借出中），之后由借阅流程维护
+UPDATE books
+   SET pending_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'requested'),
+       reserved_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'approved'),
+       on_loan_count = (SELECT COUNT(*) FROM borrows WHERE borrows.book_id = books.id AND borrow_status = 'borrowed');
+
 SET FOREIGN_KEY_CHECKS = 1;
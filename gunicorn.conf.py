@@ -0,0 +1,80 @@
+# gunicorn configuration: the production entrypoint
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is built once in the master (preload_app) and forked into the workers.
+# Each worker drops the connections it inherited (utils.pool fork handler) and
+# connects again before accepting requests (post_fork -> app.warm_up()).
+#
+#   kill -HUP <master>     replace the workers gracefully; with preload_app the code is
+#                          not re-imported, so deploy new code with USR2 instead:
+#   kill -USR2 <master>    start a new master on the new code next to the old one,
+#   kill -QUIT <old>       then stop the old master once the new workers are serving
+#   kill -TERM <master>    graceful stop: in-flight requests get graceful_timeout seconds
+
+import math
+import os
+
+from config import Config
+
+
+def _cpu_count():
+    """CPUs this container may use: its cgroup CPU quota, else the scheduler affinity"""
+    for path in ("/sys/fs/cgroup/cpu.max", "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"):
+        try:
+            with open(path) as f:
+                fields = f.read().split()
+            if len(fields) == 1:  # cgroup v1：配额与周期在两个文件里
+                with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                    fields.append(f.read().strip())
+            quota, period = fields[:2]
+            if quota not in ("max", "-1"):
+                return max(1, math.ceil(int(quota) / int(period)))
+        except (OSError, ValueError):
+            continue
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpus = _cpu_count()
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{Config.PORT}"
+
+# 2 × CPU + 1：请求大多在等数据库，一个 worker 等待时由其他 worker 用满 CPU
+workers = Config.WEB_CONCURRENCY or min(2 * cpus + 1, Config.GUNICORN_MAX_WORKERS)
+# CPU 少时 worker 也少，用线程补足并发；每个线程占一个池化连接，不超过 DB_POOL_MAX_SIZE
+threads = Config.GUNICORN_THREADS or max(1, min(max(2, 8 // cpus), Config.DB_POOL_MAX_SIZE))
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = Config.GUNICORN_PRELOAD
+timeout = Config.GUNICORN_TIMEOUT
+graceful_timeout = Config.GUNICORN_GRACEFUL_TIMEOUT
+keepalive = 5
+# 定期替换 worker（内存增长保护）；随机抖动避免所有 worker 同时重启
+max_requests = Config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    server.log.info("BookNest: %d worker(s) x %d thread(s) on %d CPU(s), preload=%s",
+                    workers, threads, cpus, preload_app)
+    if preload_app:
+        # 主进程不处理请求：create_app() 不连数据库，这里只是确保不把连接带进 worker
+        from utils.database import db
+        db.close()
+
+
+def post_fork(server, worker):
+    if not Config.DB_WARM_ON_FORK:
+        return
+    from app import warm_up
+    if not warm_up():
+        worker.log.warning("Database unreachable at worker start; connecting on first request")
+
+
+def worker_exit(server, worker):
+    from utils.database import db
+    db.close()
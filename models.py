@@ -1,17 +1,38 @@
 from utils.database import db
-import decimal
+from utils.pagination import encode_cursor, decode_cursor, InvalidCursor
+from utils.cache import ReadThroughCache, create_backend
+from utils.log import get_logger
+from utils.prefix_index import PrefixIndex
+from config import Config
+import functools
+import logging
+import time
 from datetime import datetime
 
-def convert_decimal_to_float(data):
-    """Convert Decimal objects to float for JSON serialization"""
-    if isinstance(data, dict):
-        return {k: convert_decimal_to_float(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [convert_decimal_to_float(item) for item in data]
-    elif isinstance(data, decimal.Decimal):
-        return float(data)
-    else:
-        return data
+logger = get_logger(__name__)
+
+# BOOLEAN MODE 中有特殊含义的字符，用户输入里一律当作分隔符
+_FULLTEXT_OPERATORS = str.maketrans({c: " " for c in '+-<>()~*"@'})
+
+
+def _fulltext_terms(query):
+    """Split user input into plain search terms safe for MATCH ... AGAINST"""
+    return [t for t in (query or "").translate(_FULLTEXT_OPERATORS).split() if t]
+
+def _user_index_keys(user):
+    """Typeahead keys for a user: username and the local part of the email"""
+    yield "username", user.get("username")
+    yield "email", (user.get("email") or "").split("@", 1)[0]
+
+
+_USER_FIELD_RANK = {"username": 0, "email": 1}
+
+
+def _as_datetime(value):
+    """Aggregates such as MAX(updated_at) lose the column type on SQLite and come back as text"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
 
 # -------------------------
 # Users
@@ -19,42 +40,128 @@ def convert_decimal_to_float(data):
 class User:
     """User model"""
 
+    # 语句在导入时登记一次；执行次数、行数与耗时按名称统计（db.statement_stats()）
+    SQL_CREATE = db.statement("user.create", """
+        INSERT INTO users (username, email, password_hash, role, create_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """)
+    SQL_FIND_BY_EMAIL = db.statement("user.find_by_email", """
+        SELECT id, username, email, password_hash AS password, role, create_at
+        FROM users
+        WHERE email = %s
+    """)
+    SQL_UPDATE_PASSWORD_HASH = db.statement(
+        "user.update_password_hash", "UPDATE users SET password_hash = %s WHERE id = %s")
+    SQL_FIND_BY_ID = db.statement("user.find_by_id", "SELECT * FROM users WHERE id = %s")
+    SQL_FIND_IDENTITY = db.statement(
+        "user.find_identity", "SELECT id, username, email, role FROM users WHERE id = %s")
+    SQL_SEARCH = db.statement(
+        "user.search", "SELECT id, username, email FROM users WHERE username LIKE %s OR email LIKE %s")
+    SQL_ALL_FOR_INDEX = db.statement("user.all_for_index", "SELECT id, username, email FROM users")
+
     @staticmethod
     def create(username, email, password_hash, role="user"):
         """
         创建新用户
         """
-        sql = """
-        INSERT INTO users (username, email, password_hash, role, create_at)
-        VALUES (%s, %s, %s, %s, %s)
-        """
         params = (username, email, password_hash, role, datetime.now())
-        return db.execute_update(sql, params)
+        user_id = db.execute_update(User.SQL_CREATE, params)
+        if user_id and User.typeahead_index.built_at is not None:
+            # 回滚后的用户会留在索引里直到下次重建，影响仅是多一条候选
+            User.typeahead_index.add({"id": user_id, "username": username, "email": email},
+                                     _user_index_keys)
+        return user_id
 
     @staticmethod
     def find_by_email(email):
         """
         根据邮箱查找用户
         """
-        sql = """
-        SELECT id, username, email, password_hash AS password, role, create_at
-        FROM users
-        WHERE email = %s
-        """
-        rows = db.execute_query(sql, (email,))
+        rows = db.execute_query(User.SQL_FIND_BY_EMAIL, (email,))
         return rows[0] if rows else None
 
+    @staticmethod
+    def update_password_hash(user_id, password_hash):
+        """
+        更新密码哈希（登录时升级旧哈希）
+        """
+        result = db.execute_update(User.SQL_UPDATE_PASSWORD_HASH, (password_hash, user_id))
+        # 用户行有变更即丢弃缓存的身份（未命中的查询不缓存，新建用户无需处理）
+        User.invalidate_identity(user_id)
+        return result
+
     @staticmethod
     def find_by_id(user_id):
-        sql = "SELECT * FROM users WHERE id = %s"
-        rows = db.execute_query(sql, (user_id,))
+        rows = db.execute_query(User.SQL_FIND_BY_ID, (user_id,))
         return rows[0] if rows else None
 
+    # JWT 身份缓存：sub -> {id, username, email, role}，不含密码哈希
+    identity_cache = ReadThroughCache(
+        create_backend(ttl=Config.USER_CACHE_TTL, max_size=Config.USER_CACHE_MAX_SIZE), "identity")
+
+    @staticmethod
+    def find_identity(user_id):
+        """
+        供 @jwt_required 请求加载当前用户（current_user）。
+        缓存命中即省掉一次数据库查询；角色等变更后需调用 invalidate_identity。
+        """
+        try:
+            key = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        def load():
+            rows = db.execute_query(User.SQL_FIND_IDENTITY, (key,))
+            return rows[0] if rows else None
+
+        user = User.identity_cache.get_or_load(key, load)
+        return dict(user) if user else None
+
+    @staticmethod
+    def invalidate_identity(user_id):
+        """Drop a cached identity, e.g. after a role change or account deletion"""
+        User.identity_cache.invalidate(int(user_id))
+        if db.in_transaction():
+            db.after_commit(lambda: User.identity_cache.invalidate(int(user_id)))
+
+    @staticmethod
+    def identity_cache_stats():
+        stats = User.identity_cache.stats()
+        # 每个 JWT 请求都要确认用户仍存在（current_user），命中即省掉这一次查询
+        stats["db_lookups_saved"] = stats["hits"]
+        stats["db_lookups_saved_per_request"] = stats["hit_ratio"]
+        return stats
+
     @staticmethod
     def search(query):
-        sql = "SELECT * FROM users WHERE username LIKE %s OR email LIKE %s"
         pattern = f"%{query}%"
-        return db.execute_query(sql, (pattern, pattern))
+        return db.execute_query(User.SQL_SEARCH, (pattern, pattern))
+
+    # 用户名 / 邮箱前缀的内存索引，供管理端选择用户时逐键查询
+    typeahead_index = PrefixIndex()
+
+    @staticmethod
+    def warm_typeahead():
+        """(Re)build the typeahead index from the users table; returns False if the DB is unavailable"""
+        rows = db.execute_query(User.SQL_ALL_FOR_INDEX)
+        if rows is None:
+            return False
+        User.typeahead_index.rebuild(rows, _user_index_keys)
+        logger.info("User typeahead index built", extra={"users": len(rows)})
+        return True
+
+    @staticmethod
+    def typeahead(prefix, limit=10):
+        """按用户名 / 邮箱本地部分前缀匹配，完全匹配优先、用户名优先、短者优先"""
+        index = User.typeahead_index
+        if index.built_at is None:
+            # 索引从未建成：在请求线程中建；数据库不可用时退回 LIKE 查询
+            if not User.warm_typeahead():
+                return (User.search(prefix) or [])[:limit]
+        elif time.monotonic() - index.built_at > Config.USER_INDEX_REFRESH_SECONDS:
+            # 过期：本次仍用旧索引作答，同一时间至多一个后台线程重建
+            index.rebuild_in_background(User.warm_typeahead)
+        return index.search(prefix, limit=limit, field_rank=_USER_FIELD_RANK)
 
 
 # -------------------------
@@ -63,182 +170,784 @@ class User:
 class Book:
     """Book model"""
 
+    SQL_SEARCH_FULLTEXT = db.statement("book.search_fulltext", """
+        SELECT *, MATCH(title, author) AGAINST (%s IN BOOLEAN MODE) AS relevance
+          FROM books
+         WHERE MATCH(title, author) AGAINST (%s IN BOOLEAN MODE)
+         ORDER BY relevance DESC, id DESC
+         LIMIT %s OFFSET %s
+    """)
+    SQL_SEARCH_LIKE = db.statement("book.search_like", """
+        SELECT * FROM books
+         WHERE title LIKE %s OR author LIKE %s
+         ORDER BY created_at DESC, id DESC
+         LIMIT %s OFFSET %s
+    """)
+    SQL_FULLTEXT_INDEX = db.statement(
+        "book.fulltext_index", "SHOW INDEX FROM books WHERE Index_type = 'FULLTEXT'")
+    SQL_FIND_BY_ID = db.statement("book.find_by_id", "SELECT * FROM books WHERE id = %s")
+    SQL_EXISTS = db.statement("book.exists", "SELECT id FROM books WHERE id = %s")
+    SQL_CREATE = db.statement("book.create", """
+        INSERT INTO books (title, author, description, stock, cover_image_url, price)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """)
+    SQL_UPDATE = db.statement("book.update", """
+        UPDATE books
+        SET title=%s, author=%s, description=%s, stock=%s,
+            cover_image_url=%s, price=%s, updated_at=CURRENT_TIMESTAMP
+        WHERE id=%s
+    """)
+    SQL_DELETE = db.statement("book.delete", "DELETE FROM books WHERE id = %s")
+    # 条件更新：库存不足时不改动（影响行数为 0），不会把 UNSIGNED 列减成负数
+    SQL_TAKE_STOCK = db.statement("book.take_stock", """
+        UPDATE books SET stock = stock + %s, updated_at = CURRENT_TIMESTAMP
+         WHERE id = %s AND stock >= %s
+    """)
+    SQL_ADD_STOCK = db.statement(
+        "book.add_stock", "UPDATE books SET stock = stock + %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s")
+    # 条件 GET 的版本探测：MAX(updated_at) 覆盖新增与修改（走 idx_updated_at），
+    # books_version.deletions 覆盖删除（主键读一行），两者都不扫描 books
+    SQL_VERSION = db.statement("book.version", """
+        SELECT (SELECT MAX(updated_at) FROM books) AS last_modified,
+               (SELECT deletions FROM books_version WHERE id = 1) AS deletions,
+               CURRENT_TIMESTAMP AS checked_at
+    """)
+    # 旧库尚未执行 db/migrations/005_books_version.sql 时的退路：COUNT(*) 覆盖删除
+    SQL_VERSION_SCAN = db.statement("book.version_scan", """
+        SELECT COUNT(*) AS row_count, MAX(updated_at) AS last_modified, CURRENT_TIMESTAMP AS checked_at
+          FROM books
+    """)
+    SQL_COUNT_DELETION = db.statement(
+        "book.count_deletion", "UPDATE books_version SET deletions = deletions + 1 WHERE id = 1")
+
+    # 借阅状态 -> books 上由借阅流程维护的计数列（可借数量即 stock）
+    COUNTER_COLUMNS = {
+        "requested": "pending_count",
+        "approved": "reserved_count",
+        "borrowed": "on_loan_count",
+    }
+    # 对账：计数列与 borrows 实际分布不一致的图书
+    SQL_COUNTER_DRIFT = db.statement("book.counter_drift", """
+        SELECT b.id, b.pending_count, b.reserved_count, b.on_loan_count,
+               COALESCE(c.pending, 0) AS actual_pending_count,
+               COALESCE(c.reserved, 0) AS actual_reserved_count,
+               COALESCE(c.on_loan, 0) AS actual_on_loan_count
+          FROM books b
+          LEFT JOIN (SELECT book_id,
+                            SUM(CASE WHEN borrow_status = 'requested' THEN 1 ELSE 0 END) AS pending,
+                            SUM(CASE WHEN borrow_status = 'approved' THEN 1 ELSE 0 END) AS reserved,
+                            SUM(CASE WHEN borrow_status = 'borrowed' THEN 1 ELSE 0 END) AS on_loan
+                       FROM borrows
+                      WHERE borrow_status IN ('requested', 'approved', 'borrowed')
+                      GROUP BY book_id) c ON c.book_id = b.id
+         WHERE b.pending_count <> COALESCE(c.pending, 0)
+            OR b.reserved_count <> COALESCE(c.reserved, 0)
+            OR b.on_loan_count <> COALESCE(c.on_loan, 0)
+    """)
+    # 单条语句内重新计数，避免“先读后写”之间被借阅流程改动
+    SQL_RECOUNT = db.statement("book.recount", """
+        UPDATE books
+           SET pending_count = (SELECT COUNT(*) FROM borrows WHERE book_id = %s AND borrow_status = 'requested'),
+               reserved_count = (SELECT COUNT(*) FROM borrows WHERE book_id = %s AND borrow_status = 'approved'),
+               on_loan_count = (SELECT COUNT(*) FROM borrows WHERE book_id = %s AND borrow_status = 'borrowed'),
+               updated_at = CURRENT_TIMESTAMP
+         WHERE id = %s
+    """)
+
     @staticmethod
-    def get_all(search_title=None, search_author=None):
+    @functools.lru_cache(maxsize=None)
+    def _get_all_statement(by_title, by_author, after_cursor, limited):
+        """One registered statement per filter combination (at most 16), built once"""
         sql = "SELECT * FROM books WHERE 1=1"
+        if by_title:
+            sql += " AND title LIKE %s"
+        if by_author:
+            sql += " AND author LIKE %s"
+        if after_cursor:
+            # 等价于 (created_at, id) < (?, ?)；前导的 created_at <= ? 让优化器按索引范围倒序读取
+            sql += " AND created_at <= %s AND (created_at < %s OR id < %s)"
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limited:
+            sql += " LIMIT %s"
+        flags = "".join(flag for flag, on in (("t", by_title), ("a", by_author),
+                                              ("c", after_cursor), ("l", limited)) if on)
+        return db.statement(f"book.get_all[{flags}]", sql)
+
+    @staticmethod
+    def _get_all_query(search_title=None, search_author=None, limit=None, cursor=None):
         params = []
         if search_title:
-            sql += " AND title LIKE %s"
             params.append(f"%{search_title}%")
         if search_author:
-            sql += " AND author LIKE %s"
             params.append(f"%{search_author}%")
-        sql += " ORDER BY created_at DESC"
-        result = db.execute_query(sql, params if params else None) or []
-        return convert_decimal_to_float(result)
+        if cursor:
+            last_created_at, last_id = cursor
+            params.extend([last_created_at, last_created_at, last_id])
+        if limit:
+            params.append(int(limit))
+        statement = Book._get_all_statement(bool(search_title), bool(search_author),
+                                            bool(cursor), bool(limit))
+        return statement, params if params else None
+
+    @staticmethod
+    def get_all(search_title=None, search_author=None, limit=None, cursor=None):
+        """
+        按 (created_at, id) 倒序返回图书。
+        cursor 为上一页最后一行的 (created_at, id)，使用 keyset 条件而不是 OFFSET，
+        翻到多深都只扫描 limit 行（走 idx_created_at (created_at, id)，见 db/migrations/007）。
+        """
+        statement, params = Book._get_all_query(search_title, search_author, limit, cursor)
+        # Decimal/datetime 由 utils.json_provider 在序列化时直接编码，这里不再复制结果集
+        return db.execute_query(statement, params) or []
+
+    # books 上是否有 FULLTEXT 索引：None = 本进程尚未探测（见 _fulltext_probed）
+    fulltext_index = None
+
+    @staticmethod
+    def _fulltext_probed(rows):
+        """Record the result of SQL_FULLTEXT_INDEX; warns once when the index is missing"""
+        if rows is None:
+            return False  # 数据库不可用：本次走 LIKE，下次再探测
+        Book.fulltext_index = bool(rows)
+        if not rows:
+            logger.warning("books has no FULLTEXT index: ?q= searches use LIKE until "
+                           "db/migrations/001_books_fulltext.sql is applied and the service restarted")
+        return Book.fulltext_index
+
+    @staticmethod
+    def search(query, limit=50, offset=0):
+        """
+        全文检索书名/作者，按相关度排序，offset 为 search_cursor 中的位置。
+        依赖 books 上的 FULLTEXT(title, author) WITH PARSER ngram 索引（中文书名需要 ngram 分词），
+        每个词都按前缀匹配；索引不存在（或后端不支持全文检索）时退回 LIKE 扫描。
+        """
+        terms = _fulltext_terms(query)
+        if not terms:
+            return []
+        rows = None
+        if db.supports_fulltext and (Book.fulltext_index if Book.fulltext_index is not None
+                                     else Book._fulltext_probed(db.execute_query(Book.SQL_FULLTEXT_INDEX))):
+            boolean_query = " ".join(f"+{t}*" for t in terms)
+            rows = db.execute_query(Book.SQL_SEARCH_FULLTEXT,
+                                    (boolean_query, boolean_query, int(limit), int(offset)))
+        if rows is None:
+            # SQLite 后端，或旧库尚未执行 db/migrations/001_books_fulltext.sql
+            pattern = f"%{query.strip()}%"
+            rows = db.execute_query(Book.SQL_SEARCH_LIKE, (pattern, pattern, int(limit), int(offset))) or []
+        return rows
+
+    @staticmethod
+    def search_cursor(offset):
+        """Cursor for the search results from position offset on (relevance order has no stable key)"""
+        return encode_cursor(offset)
+
+    @staticmethod
+    def parse_search_cursor(token):
+        offset, = decode_cursor(token, (int,))
+        if offset < 0:
+            raise InvalidCursor(f"Invalid cursor: {token}")
+        return offset
+
+    # books_version 表是否存在：None = 本进程尚未探测（见 _version_probed）
+    version_table = None
+
+    @staticmethod
+    def version():
+        """
+        Cheap change marker for the whole books table: {marker, last_modified, settled}.
+        ``marker`` changes whenever a book is deleted (books_version.deletions, or the row
+        count on databases without that table); additions and edits move last_modified.
+        updated_at has one-second resolution, so while the newest change is still in the
+        current second another write could land without moving MAX(updated_at);
+        ``settled`` is False then and callers should not hand out validators.
+        Returns None if the database is unavailable.
+        """
+        if Book.version_table is not False:
+            rows = db.execute_query(Book.SQL_VERSION)
+            if rows:
+                Book.version_table = True
+                return Book._version_of(rows[0])
+            if Book.version_table:
+                return None
+        # 表不存在（或数据库不可用）：退回 COUNT(*)，能查通则说明是缺表
+        rows = db.execute_query(Book.SQL_VERSION_SCAN)
+        if rows and Book.version_table is None:
+            Book._version_probed()
+        return Book._version_of(rows[0]) if rows else None
+
+    @staticmethod
+    def _version_probed():
+        """SQL_VERSION failed but the scan works: the table is missing; warns once"""
+        Book.version_table = False
+        logger.warning("books_version table missing: GET /api/books counts every book per request until "
+                       "db/migrations/005_books_version.sql is applied and the service restarted")
+
+    @staticmethod
+    def _version_of(row):
+        last_modified, checked_at = _as_datetime(row['last_modified']), _as_datetime(row['checked_at'])
+        return {
+            "marker": f"d{row['deletions']}" if 'deletions' in row else f"n{row['row_count']}",
+            "last_modified": last_modified,
+            "settled": last_modified is None or (checked_at is not None and last_modified < checked_at),
+        }
+
+    @staticmethod
+    def page_cursor(book):
+        """Cursor pointing just past the given book row"""
+        return encode_cursor(book.get('created_at'), book.get('id'))
+
+    @staticmethod
+    def parse_cursor(token):
+        return decode_cursor(token, (datetime, int))
+
+    # 按 id 缓存的图书行；写操作通过 invalidate() 失效
+    cache = ReadThroughCache(create_backend(), "book")
 
     @staticmethod
     def find_by_id(book_id):
-        sql = "SELECT * FROM books WHERE id = %s"
-        rows = db.execute_query(sql, (book_id,))
-        result = rows[0] if rows else None
-        return convert_decimal_to_float(result) if result else None
+        def load():
+            rows = db.execute_query(Book.SQL_FIND_BY_ID, (book_id,))
+            return rows[0] if rows else None
+
+        try:
+            key = int(book_id)
+        except (TypeError, ValueError):
+            return None  # id 非整数，不可能存在
+        book = Book.cache.get_or_load(key, load)
+        # 返回副本，调用方修改不会污染缓存
+        return dict(book) if book else None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _find_many_statement(size):
+        """WHERE id IN (...) with ``size`` placeholders; sizes are powers of two, so only a handful exist"""
+        placeholders = ", ".join(["%s"] * size)
+        return db.statement(f"book.find_many[{size}]", f"SELECT * FROM books WHERE id IN ({placeholders})")
+
+    @staticmethod
+    def _find_many_query(book_ids):
+        # 补齐到 2 的幂（重复最后一个 id）：语句种类有限，服务器端的执行计划 / 语句缓存可复用
+        size = 1 << (len(book_ids) - 1).bit_length()
+        return Book._find_many_statement(size), tuple(book_ids) + (book_ids[-1],) * (size - len(book_ids))
+
+    @staticmethod
+    def _in_order(book_ids, found):
+        books = [dict(found[book_id]) for book_id in book_ids if book_id in found]
+        return books, [book_id for book_id in book_ids if book_id not in found]
+
+    @staticmethod
+    def find_many(book_ids):
+        """
+        按给定顺序批量读取图书，返回 (books, missing_ids)。
+        缓存命中的直接返回，其余用一条 WHERE id IN (...) 查询（而不是逐本 find_by_id）。
+        book_ids 为去重后的整数 id（见 utils.pagination.parse_ids）；数据库不可用时返回 None。
+        """
+        found = Book.cache.get_many(book_ids)
+        misses = [book_id for book_id in book_ids if book_id not in found]
+        if misses:
+            statement, params = Book._find_many_query(misses)
+            rows = db.execute_query(statement, params)
+            if rows is None:
+                return None
+            loaded = {row['id']: row for row in rows}
+            Book.cache.set_many(loaded)
+            found.update(loaded)
+        return Book._in_order(book_ids, found)
+
+    @staticmethod
+    def invalidate(book_id):
+        """
+        删除缓存中的图书。事务中会在提交后再删一次，
+        避免并发读在提交前把旧数据重新写回缓存。
+        """
+        Book.cache.invalidate(int(book_id))
+        if db.in_transaction():
+            db.after_commit(lambda: Book.cache.invalidate(int(book_id)))
+
+    @staticmethod
+    def cache_stats():
+        return Book.cache.stats()
 
     @staticmethod
     def create(title, author, description, stock, cover_image_url=None, price=0.0):
         """
         创建新图书
         """
-        sql = """
-        INSERT INTO books (title, author, description, stock, cover_image_url, price)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
         params = (title, author, description, stock, cover_image_url, price)
-        return db.execute_update(sql, params)
+        return db.execute_update(Book.SQL_CREATE, params)
+
+    @staticmethod
+    def bulk_create(books):
+        """
+        批量插入图书，books 为 (title, author, description, stock, cover_image_url, price) 元组列表。
+        返回插入行数，失败返回 False（整批回滚，不会插入其中任何一行）。
+        """
+        try:
+            # PyMySQL 会把超过 max_stmt_length 的批次拆成多条 INSERT：放在同一事务中，
+            # 后面的分片失败时前面的分片一起回滚，调用方逐行重试不会重复插入
+            with db.transaction():
+                return db.execute_many(Book.SQL_CREATE, books)
+        except Exception:
+            return False
+
+    @staticmethod
+    def iter_all(batch_size=1000):
+        """
+        按 get_all 的顺序逐页遍历全部图书，内存占用只与 batch_size 有关。
+        某一页查询失败时抛出 OperationalError，而不是静默结束（导出不会被截断成“完整”的结果）
+        """
+        cursor, exported = None, 0
+        while True:
+            statement, params = Book._get_all_query(limit=batch_size, cursor=cursor)
+            rows = db.execute_query(statement, params)
+            if rows is None:
+                logger.error("Book export aborted: page query failed", extra={"exported": exported})
+                raise db.backend.OperationalError("Book export query failed")
+            yield from rows
+            exported += len(rows)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            cursor = (last['created_at'], last['id'])
 
     @staticmethod
     def update(book_id, title, author, description, stock, cover_image_url=None, price=0.0):
         """
         更新图书信息
         """
-        sql = """
-        UPDATE books
-        SET title=%s, author=%s, description=%s, stock=%s,
-            cover_image_url=%s, price=%s, updated_at=CURRENT_TIMESTAMP
-        WHERE id=%s
-        """
         params = (title, author, description, stock, cover_image_url, price, book_id)
-        return db.execute_update(sql, params)
+        result = db.execute_update(Book.SQL_UPDATE, params)
+        Book.invalidate(book_id)
+        return result
 
     @staticmethod
     def delete(book_id):
-        sql = "DELETE FROM books WHERE id = %s"
-        return db.execute_update(sql, (book_id,))
+        """
+        删除图书；books_version 存在时在同一事务中累加删除计数（列表 ETag 随之变化）
+        """
+        if Book.version_table is None:
+            Book.version()
+        if not Book.version_table:
+            result = db.execute_update(Book.SQL_DELETE, (book_id,))
+            Book.invalidate(book_id)
+            return result
+        try:
+            with db.transaction():
+                result = db.execute_update(Book.SQL_DELETE, (book_id,))
+                if result:
+                    db.execute_update(Book.SQL_COUNT_DELETION)
+        except Exception:
+            return False
+        finally:
+            Book.invalidate(book_id)
+        return result
 
     @staticmethod
     def update_stock(book_id, delta):
         """
         更新图书库存
         """
-        sql = "UPDATE books SET stock = stock + %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
-        return db.execute_update(sql, (delta, book_id))
+        if delta < 0:
+            result = db.execute_update(Book.SQL_TAKE_STOCK, (delta, book_id, -delta))
+        else:
+            result = db.execute_update(Book.SQL_ADD_STOCK, (delta, book_id))
+        Book.invalidate(book_id)
+        return result
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _borrow_change_statement(from_column, to_column, stock_change):
+        """
+        One UPDATE moving a borrow between counter columns and adjusting stock
+        (stock_change: -1 take, 0 none, 1 add); None when nothing changes.
+        """
+        assignments = []
+        if stock_change:
+            assignments.append("stock = stock + %s")
+        if from_column:
+            # 计数列为 UNSIGNED：已漂移为 0 时不再减（由对账修正），避免 UPDATE 报错回滚整个借阅操作
+            assignments.append(f"{from_column} = CASE WHEN {from_column} > 0 THEN {from_column} - 1 ELSE 0 END")
+        if to_column:
+            assignments.append(f"{to_column} = {to_column} + 1")
+        if not assignments:
+            return None
+        sql = f"UPDATE books SET {', '.join(assignments)}, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
+        if stock_change < 0:
+            sql += " AND stock >= %s"
+        return db.statement(f"book.borrow_change[{from_column or '-'}>{to_column or '-'},{stock_change:+d}]", sql)
+
+    @staticmethod
+    def _borrow_change_query(book_id, from_status, to_status, stock_delta):
+        statement = Book._borrow_change_statement(
+            Book.COUNTER_COLUMNS.get(from_status), Book.COUNTER_COLUMNS.get(to_status),
+            (stock_delta > 0) - (stock_delta < 0))
+        if statement is None:
+            return None, None
+        params = [book_id]
+        if stock_delta:
+            params.insert(0, stock_delta)
+        if stock_delta < 0:
+            params.append(-stock_delta)
+        return statement, params
+
+    @staticmethod
+    def apply_borrow_change(book_id, from_status, to_status, stock_delta=0):
+        """
+        Keep the availability counters (and stock) in step with one borrow changing
+        from from_status to to_status (from_status None for a new borrow), in a single
+        UPDATE of the book row. Call it inside the transaction that changes the borrow.
+        Taking stock is conditional: returns 0 when the book is out of stock (or gone;
+        the row count is of matched rows, see MySQLBackend.connect).
+        """
+        statement, params = Book._borrow_change_query(book_id, from_status, to_status, stock_delta)
+        if statement is None:
+            return True
+        result = db.execute_update(statement, params)
+        Book.invalidate(book_id)
+        return result
+
+    @staticmethod
+    def availability(book):
+        """
+        Availability summary of a book row (no extra query). ``stock`` already excludes
+        reserved and on-loan copies: approving a request takes the copy from stock
+        (BorrowRecord.stock_change), so ``available`` is stock itself. Pending requests
+        hold nothing and are not subtracted.
+        """
+        return {
+            "available": book.get('stock', 0),
+            "reserved": book.get('reserved_count', 0),
+            "on_loan": book.get('on_loan_count', 0),
+            "pending": book.get('pending_count', 0),
+        }
+
+    @staticmethod
+    def reconcile_counters(fix=False):
+        """
+        Compare the counter columns with the actual borrows and return the drifted
+        books; with fix=True each one is recounted in place. Returns None if the
+        database is unavailable.
+        """
+        drift = db.execute_query(Book.SQL_COUNTER_DRIFT)
+        if drift is None:
+            return None
+        for row in drift:
+            logger.warning("Book availability counters drifted", extra={
+                "book_id": row['id'],
+                "stored": [row['pending_count'], row['reserved_count'], row['on_loan_count']],
+                "actual": [row['actual_pending_count'], row['actual_reserved_count'],
+                           row['actual_on_loan_count']],
+                "fixed": fix,
+            })
+            if fix:
+                db.execute_update(Book.SQL_RECOUNT, (row['id'],) * 4)
+                Book.invalidate(row['id'])
+        return drift
 
 
 # -------------------------
 # Borrows
 # -------------------------
+class TransitionOutcome:
+    """Result of BorrowRecord.transition"""
+    OK = "ok"                # 状态与库存均已更新
+    NOT_FOUND = "not_found"  # 记录不存在
+    LOST_RACE = "lost_race"  # 记录状态已被其他请求改变（compare-and-set 失败）
+    SOLD_OUT = "sold_out"    # 库存为 0，无法借出
+    BOOK_NOT_FOUND = "book_not_found"  # 图书已被删除
+
+
+class _TransitionAborted(Exception):
+    def __init__(self, outcome):
+        super().__init__(outcome)
+        self.outcome = outcome
+
+
 class BorrowRecord:
     """
     借阅记录模型 - 对应数据库表 `borrows`
     """
 
+    SQL_CREATE = db.statement("borrow.create", """
+        INSERT INTO borrows (user_id, book_id, borrow_date, borrow_status, notes)
+        VALUES (%s, %s, %s, %s, %s)
+    """)
+    SQL_SET_STATUS = db.statement("borrow.set_status", "UPDATE borrows SET borrow_status=%s WHERE id=%s")
+    SQL_SET_STATUS_RETURNED = db.statement(
+        "borrow.set_status_return_date", "UPDATE borrows SET borrow_status=%s, return_date=%s WHERE id=%s")
+    SQL_SET_STATUS_NOTES = db.statement(
+        "borrow.set_status_notes", "UPDATE borrows SET borrow_status=%s, notes=%s WHERE id=%s")
+    SQL_SET_STATUS_RETURNED_NOTES = db.statement(
+        "borrow.set_status_return_date_notes",
+        "UPDATE borrows SET borrow_status=%s, return_date=%s, notes=%s WHERE id=%s")
+    # compare-and-set：只有状态仍为 from_status 时才更新
+    SQL_TRANSITION = db.statement(
+        "borrow.transition", "UPDATE borrows SET borrow_status=%s WHERE id=%s AND borrow_status=%s")
+    SQL_TRANSITION_RETURNED = db.statement("borrow.transition_return_date", """
+        UPDATE borrows SET borrow_status=%s, return_date=%s
+         WHERE id=%s AND borrow_status=%s
+    """)
+    SQL_EXISTS = db.statement("borrow.exists", "SELECT id FROM borrows WHERE id = %s")
+    SQL_FIND_BY_ID = db.statement("borrow.find_by_id", "SELECT * FROM borrows WHERE id = %s")
+    SQL_FIND_ACTIVE = db.statement("borrow.find_active", """
+        SELECT * FROM borrows
+        WHERE user_id = %s AND book_id = %s
+        AND borrow_status IN ('requested', 'borrowed')
+    """)
+
     @staticmethod
-    def create(user_id, book_id, borrow_status="requested", borrow_date=None, notes=None):
-        print(f"\n--- BorrowRecord.create 调试日志 ---")
-        print(f"输入参数:")
-        print(f"  user_id: {user_id} (类型: {type(user_id)})")
-        print(f"  book_id: {book_id} (类型: {type(book_id)})")
-        print(f"  borrow_status: {borrow_status} (类型: {type(borrow_status)})")
-        print(f"  borrow_date: {borrow_date} (类型: {type(borrow_date)})")
-        print(f"  notes: {notes} (类型: {type(notes)})")
-        
+    def _create_params(user_id, book_id, borrow_status, borrow_date, notes):
         # 处理日期
         if borrow_date:
             # 如果传入的是字符串格式的日期，尝试转换为datetime对象
             if isinstance(borrow_date, str):
                 try:
-                    from datetime import datetime as dt
-                    actual_borrow_date = dt.strptime(borrow_date, '%Y-%m-%d')
-                    print(f"字符串日期 '{borrow_date}' 转换为datetime: {actual_borrow_date}")
+                    actual_borrow_date = datetime.strptime(borrow_date, '%Y-%m-%d')
                 except ValueError as e:
-                    print(f"日期格式转换失败: {e}, 使用当前时间")
+                    logger.warning("Invalid borrow_date %r (%s), using current time", borrow_date, e)
                     actual_borrow_date = datetime.now()
             else:
                 actual_borrow_date = borrow_date
         else:
             actual_borrow_date = datetime.now()
-        print(f"实际使用的借阅日期: {actual_borrow_date} (类型: {type(actual_borrow_date)})")
-        
-        sql = """
-        INSERT INTO borrows (user_id, book_id, borrow_date, borrow_status, notes)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        params = (user_id, book_id, actual_borrow_date, borrow_status, notes)
-        
-        print(f"准备执行的SQL: {sql}")
-        print(f"SQL参数: {params}")
+        return (user_id, book_id, actual_borrow_date, borrow_status, notes)
+
+    @staticmethod
+    def create(user_id, book_id, borrow_status="requested", borrow_date=None, notes=None):
+        params = BorrowRecord._create_params(user_id, book_id, borrow_status, borrow_date, notes)
         
         try:
-            result = db.execute_update(sql, params)
-            print(f"数据库执行结果: {result}")
-            print(f"结果类型: {type(result)}")
-            return result
-        except Exception as e:
-            print(f"❌ 数据库执行出错: {str(e)}")
-            print(f"错误类型: {type(e).__name__}")
-            import traceback
-            print("错误堆栈:")
-            traceback.print_exc()
-            raise e
-
-    @staticmethod
-    def get_by_user(user_id):
-        sql = """
-        SELECT br.id, br.user_id, br.book_id, br.borrow_date, br.return_date, br.borrow_status, br.notes,
-               b.title, b.author
-          FROM borrows br
-          JOIN books b ON br.book_id = b.id
-         WHERE br.user_id = %s
-         ORDER BY br.borrow_date DESC
+            # 借阅记录与图书计数列在同一事务中写入
+            with db.transaction():
+                result = db.execute_update(BorrowRecord.SQL_CREATE, params)
+                Book.apply_borrow_change(book_id, None, borrow_status)
+        except Exception:
+            logger.error("BorrowRecord.create failed", exc_info=True,
+                         extra={"user_id": user_id, "book_id": book_id})
+            raise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("BorrowRecord.create", extra={
+                "user_id": user_id, "book_id": book_id, "borrow_status": borrow_status, "result": result})
+        return result
+
+    BORROW_STATUSES = ('requested', 'approved', 'borrowed', 'returned', 'denied')
+    # 个人借阅汇总：active 为已批准待取 + 借出中
+    HISTORY_SUMMARY = ('total', 'active', 'requested', 'returned')
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _history_statement(status_count, after_cursor):
+        """
+        One round trip for a user's history page: the users row (existence), the summary
+        counts over all of the user's borrows, and one keyset page of records, newest first.
+        No rows means the user does not exist; a single row with a NULL id means no records.
+        """
+        status_filter = f" AND br.borrow_status IN ({', '.join(['%s'] * status_count)})" if status_count else ""
+        cursor_filter = " AND (br.borrow_date < %s OR (br.borrow_date = %s AND br.id < %s))" if after_cursor else ""
+        # 分页与汇总都走 idx_user_borrow_date (user_id, borrow_date)：按用户定位后倒序读取，无需排序
+        sql = f"""
+        SELECT u.id AS user_id, s.total_count, s.active_count, s.requested_count, s.returned_count,
+               p.id, p.book_id, p.borrow_date, p.return_date, p.borrow_status, p.notes, p.title, p.author
+          FROM users u
+          CROSS JOIN (SELECT COUNT(*) AS total_count,
+                             SUM(CASE WHEN borrow_status IN ('approved', 'borrowed') THEN 1 ELSE 0 END) AS active_count,
+                             SUM(CASE WHEN borrow_status = 'requested' THEN 1 ELSE 0 END) AS requested_count,
+                             SUM(CASE WHEN borrow_status = 'returned' THEN 1 ELSE 0 END) AS returned_count
+                        FROM borrows
+                       WHERE user_id = %s) s
+          LEFT JOIN (SELECT br.id, br.book_id, br.borrow_date, br.return_date, br.borrow_status, br.notes,
+                            b.title, b.author
+                       FROM borrows br
+                       JOIN books b ON br.book_id = b.id
+                      WHERE br.user_id = %s{status_filter}{cursor_filter}
+                      ORDER BY br.borrow_date DESC, br.id DESC
+                      LIMIT %s) p ON 1 = 1
+         WHERE u.id = %s
+         ORDER BY p.borrow_date DESC, p.id DESC
+        """
+        flags = f"s{status_count}" if status_count else ""
+        return db.statement(f"borrow.history[{flags}{'c' if after_cursor else ''}]", sql)
+
+    @staticmethod
+    def _history_query(user_id, borrow_statuses=(), cursor=None, limit=50):
+        params = [user_id, user_id, *borrow_statuses]
+        if cursor:
+            last_borrow_date, last_id = cursor
+            params.extend([last_borrow_date, last_borrow_date, last_id])
+        params.extend([int(limit), user_id])
+        return BorrowRecord._history_statement(len(borrow_statuses), bool(cursor)), params
+
+    @staticmethod
+    def _history_of(rows):
+        if not rows:
+            return [], None
+        # SUM() 在 MySQL 中为 DECIMAL、没有记录时为 NULL
+        summary = {key: int(rows[0][f"{key}_count"] or 0) for key in BorrowRecord.HISTORY_SUMMARY}
+        records = [{k: v for k, v in row.items() if not k.endswith('_count')}
+                   for row in rows if row['id'] is not None]
+        return records, summary
+
+    @staticmethod
+    def history(user_id, borrow_statuses=(), cursor=None, limit=50):
+        """
+        用户借阅历史（单条语句）：返回 (records, summary)。
+        records 为一页记录，按 (borrow_date, id) 倒序，可按状态筛选；cursor 为上一页最后一行的 (borrow_date, id)。
+        summary 为该用户全部记录的 total / active / requested / returned 计数（不受筛选影响）。
+        用户不存在时 summary 为 None；数据库不可用时返回 None。
         """
-        return db.execute_query(sql, (user_id,)) or []
+        statement, params = BorrowRecord._history_query(user_id, borrow_statuses, cursor, limit)
+        rows = db.execute_query(statement, params)
+        return BorrowRecord._history_of(rows) if rows is not None else None
+
+    # 管理端列表的列投影（不再 SELECT br.*）
+    LIST_COLUMNS = """
+        br.id, br.user_id, br.book_id, br.borrow_date, br.return_date, br.borrow_status, br.notes,
+        b.title, b.author, u.username, u.email
+    """
+
+    # 筛选条件依次为 borrow_status / user_id / date_from / date_to / cursor
+    _LIST_FILTERS = (
+        ("s", " AND br.borrow_status = %s"),
+        ("u", " AND br.user_id = %s"),
+        ("f", " AND br.borrow_date >= %s"),
+        ("t", " AND br.borrow_date < %s"),
+        ("c", " AND (br.borrow_date < %s OR (br.borrow_date = %s AND br.id < %s))"),
+    )
 
     @staticmethod
-    def get_all(borrow_status=None):
-        sql = """
-        SELECT br.*, b.title, b.author, u.username, u.email
+    @functools.lru_cache(maxsize=None)
+    def _list_statement(enabled, limited):
+        """Registered statement for one combination of filters (enabled: tuple of bools)"""
+        sql = f"""
+        SELECT {BorrowRecord.LIST_COLUMNS}
           FROM borrows br
           JOIN books b ON br.book_id = b.id
           JOIN users u ON br.user_id = u.id
+         WHERE 1=1
         """
-        params = []
-        if borrow_status:
-            sql += " WHERE br.borrow_status = %s"
-            params.append(borrow_status)
-        sql += " ORDER BY br.borrow_date DESC"
-        return db.execute_query(sql, params if params else None) or []
+        flags = ""
+        for (flag, condition), on in zip(BorrowRecord._LIST_FILTERS, enabled):
+            if on:
+                sql += condition
+                flags += flag
+        sql += " ORDER BY br.borrow_date DESC, br.id DESC"
+        if limited:
+            sql += " LIMIT %s"
+            flags += "l"
+        return db.statement(f"borrow.list[{flags}]", sql)
+
+    @staticmethod
+    def _list_query(borrow_status=None, user_id=None, date_from=None, date_to=None, cursor=None,
+                    limit=None):
+        params = [value for value in (borrow_status, user_id, date_from, date_to) if value]
+        if cursor:
+            last_borrow_date, last_id = cursor
+            params.extend([last_borrow_date, last_borrow_date, last_id])
+        if limit:
+            params.append(int(limit))
+        enabled = tuple(bool(v) for v in (borrow_status, user_id, date_from, date_to, cursor))
+        return BorrowRecord._list_statement(enabled, bool(limit)), params
+
+    @staticmethod
+    def get_all(borrow_status=None, user_id=None, date_from=None, date_to=None, limit=None, cursor=None):
+        """
+        管理端借阅列表，按 (borrow_date, id) 倒序。
+        date_from 含、date_to 不含；cursor 为上一页最后一行的 (borrow_date, id)。
+        """
+        statement, params = BorrowRecord._list_query(borrow_status, user_id, date_from, date_to,
+                                                     cursor, limit)
+        return db.execute_query(statement, params if params else None) or []
+
+    @staticmethod
+    def stream_all(borrow_status=None, user_id=None, date_from=None, date_to=None):
+        """与 get_all 相同的筛选，用无缓冲游标逐行返回（用于导出）"""
+        statement, params = BorrowRecord._list_query(borrow_status, user_id, date_from, date_to)
+        return db.stream_query(statement, params if params else None)
+
+    @staticmethod
+    def page_cursor(record):
+        return encode_cursor(record.get('borrow_date'), record.get('id'))
+
+    @staticmethod
+    def parse_cursor(token):
+        return decode_cursor(token, (datetime, int))
 
     @staticmethod
     def update_status(record_id, borrow_status, return_date=None, notes=None):
         if return_date is not None and notes is not None:
-            sql = "UPDATE borrows SET borrow_status=%s, return_date=%s, notes=%s WHERE id=%s"
+            statement = BorrowRecord.SQL_SET_STATUS_RETURNED_NOTES
             params = (borrow_status, return_date, notes, record_id)
         elif return_date is not None:
-            sql = "UPDATE borrows SET borrow_status=%s, return_date=%s WHERE id=%s"
+            statement = BorrowRecord.SQL_SET_STATUS_RETURNED
             params = (borrow_status, return_date, record_id)
         elif notes is not None:
-            sql = "UPDATE borrows SET borrow_status=%s, notes=%s WHERE id=%s"
+            statement = BorrowRecord.SQL_SET_STATUS_NOTES
             params = (borrow_status, notes, record_id)
         else:
-            sql = "UPDATE borrows SET borrow_status=%s WHERE id=%s"
+            statement = BorrowRecord.SQL_SET_STATUS
             params = (borrow_status, record_id)
-        return db.execute_update(sql, params)
+        return db.execute_update(statement, params)
+
+    # 占用库存的状态：批准时即预留一本（条件扣减），借出沿用这份预留，离开这些状态时退还
+    HOLDS_STOCK = ('approved', 'borrowed')
+
+    @staticmethod
+    def stock_change(from_status, to_status):
+        """
+        Stock delta for moving a borrow from from_status to to_status: -1 when it starts
+        holding a copy (requested -> approved / borrowed), 1 when it gives one back
+        (approved -> denied, borrowed -> returned), 0 otherwise (approved -> borrowed).
+        """
+        return (from_status in BorrowRecord.HOLDS_STOCK) - (to_status in BorrowRecord.HOLDS_STOCK)
+
+    @staticmethod
+    def _transition_query(record_id, from_status, to_status, return_date=None):
+        if return_date is not None:
+            return BorrowRecord.SQL_TRANSITION_RETURNED, (to_status, return_date, record_id, from_status)
+        return BorrowRecord.SQL_TRANSITION, (to_status, record_id, from_status)
+
+    @staticmethod
+    def transition(record_id, from_status, to_status, book_id=None, stock_delta=0, return_date=None):
+        """
+        原子地把借阅记录从 from_status 改为 to_status，并同步调整库存。
+
+        1. UPDATE borrows ... WHERE id = ? AND borrow_status = from_status（compare-and-set）
+        2. UPDATE books ... WHERE id = ?（stock_delta < 0 时附加 AND stock >= 1，条件扣减）
+        stock_delta 一般取 BorrowRecord.stock_change(from_status, to_status)：批准即扣减库存。
+        两步在同一事务中执行，任何一步失败都整体回滚；热点图书行的锁只在第二步到提交之间持有。
+        第二步同时维护 books 上的借阅计数列（见 Book.apply_borrow_change）。
+        返回 TransitionOutcome 中的一个值。
+        """
+        if from_status == to_status:
+            return TransitionOutcome.OK
+
+        statement, params = BorrowRecord._transition_query(record_id, from_status, to_status, return_date)
+        try:
+            with db.transaction():
+                if not db.execute_update(statement, params):
+                    exists = db.execute_query(BorrowRecord.SQL_EXISTS, (record_id,))
+                    raise _TransitionAborted(
+                        TransitionOutcome.LOST_RACE if exists else TransitionOutcome.NOT_FOUND
+                    )
+                if book_id is not None and \
+                        not Book.apply_borrow_change(book_id, from_status, to_status, stock_delta):
+                    exists = db.execute_query(Book.SQL_EXISTS, (book_id,))
+                    raise _TransitionAborted(
+                        TransitionOutcome.SOLD_OUT if exists else TransitionOutcome.BOOK_NOT_FOUND
+                    )
+        except _TransitionAborted as e:
+            return e.outcome
+        return TransitionOutcome.OK
 
     @staticmethod
     def find_by_id(record_id):
-        sql = "SELECT * FROM borrows WHERE id = %s"
-        rows = db.execute_query(sql, (record_id,))
+        rows = db.execute_query(BorrowRecord.SQL_FIND_BY_ID, (record_id,))
         return rows[0] if rows else None
 
     @staticmethod
     def find_active_borrow(user_id, book_id):
         """查找用户对特定图书的活跃借阅记录（未归还的）"""
-        sql = """
-        SELECT * FROM borrows 
-        WHERE user_id = %s AND book_id = %s 
-        AND borrow_status IN ('requested', 'borrowed')
-        """
-        rows = db.execute_query(sql, (user_id, book_id))
+        rows = db.execute_query(BorrowRecord.SQL_FIND_ACTIVE, (user_id, book_id))
         return rows[0] if rows else None
 
 
@@ -0,0 +1,220 @@
+# Async handlers for the ASGI serving mode (asgi.py)
+#
+# The read-heavy and borrow-lifecycle endpoints of routes/books.py and
+# routes/borrows.py, with the same URLs, validation and response bodies, but
+# awaiting their database round trips. Argument parsing, the checks and the
+# response bodies are the helpers of those modules; only the model calls differ.
+# Every other route is served by the Flask blueprints.
+
+from datetime import datetime
+
+from flask import request, jsonify
+from flask_jwt_extended import current_user, decode_token, verify_jwt_in_request
+from async_models import AsyncBook, AsyncBorrowRecord, AsyncUser
+from config import Config
+from routes.books import _book_list_response, _book_response, _books_by_ids_response, _list_validators, \
+    _parse_list_args
+from routes.borrows import _auth_header_error, _borrow_created, _borrow_refusal, _borrow_request_error, \
+    _borrowable, _history_response, _jwt_failed, _parse_history_args, _record_not_found, _return_refusal, \
+    _status_change, _transition_response
+from utils import http_cache
+from utils.asgi import AsyncRoutes
+from utils.pagination import parse_ids
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+routes = AsyncRoutes()
+
+
+async def _jwt_required():
+    """
+    @jwt_required() for async handlers: flask-jwt-extended's own verify_jwt_in_request,
+    so token lookup, type, expiry and the app's user_lookup_loader apply exactly as on
+    the sync routes, and current_user is set afterwards. The loader reads
+    User.identity_cache; the identity is loaded into it with AsyncUser.find_identity
+    first, so the loader does not query the database on the event loop.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            identity = decode_token(auth_header[len('Bearer '):])['sub']
+        except Exception:
+            identity = None  # 令牌无效：由 verify_jwt_in_request 给出对应的错误
+        if identity is not None:
+            await AsyncUser.find_identity(identity)
+    verify_jwt_in_request()
+
+
+# -------------------------
+# Books
+# -------------------------
+@routes.route('/api/books', methods=['GET'])
+@http_cache.public
+async def get_books():
+    """See routes.books.get_books"""
+    try:
+        if request.args.get('ids') is not None:
+            try:
+                book_ids = parse_ids(request.args['ids'], Config.BOOKS_MAX_IDS)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            return _books_by_ids_response(await AsyncBook.find_many(book_ids))
+
+        try:
+            args = _parse_list_args()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        etag, last_modified = _list_validators(await AsyncBook.version(), args)
+        if etag and http_cache.is_not_modified(etag, last_modified):
+            return http_cache.not_modified(etag, last_modified)
+
+        if args['q']:
+            books = await AsyncBook.search(args['q'], limit=args['limit'] + 1, offset=args['offset'])
+        else:
+            books = await AsyncBook.get_all(search_title=args['title'], search_author=args['author'],
+                                            limit=args['limit'] + 1, cursor=args['cursor'])
+        return _book_list_response(books, args, etag, last_modified)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve book list: {str(e)}'
+        }), 500
+
+
+@routes.route('/api/books/<int:book_id>', methods=['GET'])
+@http_cache.public
+async def get_book(book_id):
+    """See routes.books.get_book"""
+    try:
+        return _book_response(await AsyncBook.find_by_id(book_id))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve book details: {str(e)}'
+        }), 500
+
+
+# -------------------------
+# Borrows
+# -------------------------
+@routes.route('/api/borrows', methods=['POST'])
+async def create_borrow_request():
+    """See routes.borrows.create_borrow_request"""
+    error = _auth_header_error()
+    if error:
+        return error
+    try:
+        await _jwt_required()
+        current_user_id = current_user['id']
+    except Exception as jwt_error:
+        return _jwt_failed(jwt_error)
+
+    try:
+        data = request.get_json(silent=True)
+        error = _borrow_request_error(data)
+        if error:
+            return error
+        book_id = data['book_id']
+
+        book = await AsyncBook.find_by_id(book_id)
+        existing = None
+        if _borrowable(book):
+            try:
+                existing = await AsyncBorrowRecord.find_active_borrow(current_user_id, book_id)
+            except Exception as e:
+                logger.warning("Active borrow check failed: %s", e,
+                               extra={"user_id": current_user_id, "book_id": book_id})
+        error = _borrow_refusal(book, existing)
+        if error:
+            return error
+
+        borrow_id = await AsyncBorrowRecord.create(user_id=current_user_id, book_id=book_id,
+                                                   borrow_status="requested")
+        return _borrow_created(borrow_id, current_user_id, book_id)
+    except Exception as e:
+        logger.exception("Borrow request failed: %s", e)
+        return jsonify({
+            'success': False,
+            'message': '服务器内部错误'
+        }), 500
+
+
+@routes.route('/api/borrows/user/<int:user_id>', methods=['GET'])
+async def get_user_borrows(user_id):
+    """See routes.borrows.get_user_borrows"""
+    await _jwt_required()
+    try:
+        try:
+            borrow_statuses, cursor, limit = _parse_history_args()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        return _history_response(await AsyncBorrowRecord.history(user_id, borrow_statuses, cursor, limit + 1),
+                                 limit)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve borrowing history: {str(e)}'
+        }), 500
+
+
+@routes.route('/api/borrows/<int:record_id>/borrow_status', methods=['PUT'])
+async def update_borrow_status(record_id):
+    """See routes.borrows.update_borrow_status"""
+    await _jwt_required()
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'borrow_status' not in data:
+            return jsonify({
+                'success': False,
+                'message': 'Missing required field: borrow_status'
+            }), 400
+
+        record = await AsyncBorrowRecord.find_by_id(record_id)
+        if not record:
+            return _record_not_found()
+
+        borrow_status = data['borrow_status']
+        stock_delta, return_date = _status_change(record, borrow_status)
+        outcome = await AsyncBorrowRecord.transition(record_id, record['borrow_status'], borrow_status,
+                                                     book_id=record['book_id'], stock_delta=stock_delta,
+                                                     return_date=return_date)
+        return _transition_response(outcome, 'Borrow status updated successfully',
+                                    'Failed to update borrow status')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to update borrow status: {str(e)}'
+        }), 500
+
+
+@routes.route('/api/borrows/<int:record_id>/return', methods=['PUT'])
+async def return_book(record_id):
+    """See routes.borrows.return_book"""
+    await _jwt_required()
+    try:
+        record = await AsyncBorrowRecord.find_by_id(record_id)
+        error = _return_refusal(record, current_user['id'])
+        if error:
+            return error
+
+        outcome = await AsyncBorrowRecord.transition(record_id, 'borrowed', 'returned',
+                                                     book_id=record['book_id'], stock_delta=1,
+                                                     return_date=datetime.now())
+        return _transition_response(outcome, 'Book returned successfully', 'Failed to return book')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to return book: {str(e)}'
+        }), 500
@@ -1,10 +1,23 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import User
 from flask_jwt_extended import create_access_token
+from utils import passwords
+from utils.passwords import HashingBusy
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 auth_bp = Blueprint("auth", __name__)  # 路由仍走 /api/auth/...
 
+
+def _busy_response(e):
+    """503 + Retry-After when the password hashing pool is saturated"""
+    response = jsonify({"success": False, "message": "Server busy, please retry shortly",
+                        "error_type": "hashing_busy"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
 # -------------------------
 # Register
 # -------------------------
@@ -23,8 +36,8 @@ def register():
         if User.find_by_email(email):
             return jsonify({"success": False, "message": "Email already registered"}), 400
 
-        # 生成哈希并按你的表结构写入 password_hash 列
-        pwd_hash = generate_password_hash(password)
+        # 生成哈希并按你的表结构写入 password_hash 列（在哈希进程池中计算）
+        pwd_hash = passwords.make_password_hash(password)
         result = User.create(
             username=username,
             email=email,
@@ -36,6 +49,8 @@ def register():
             return jsonify({"success": True, "message": "Registration successful"}), 201
         return jsonify({"success": False, "message": "Registration failed"}), 500
 
+    except HashingBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({"success": False, "message": f"Registration failed: {str(e)}"}), 500
 
@@ -60,9 +75,19 @@ def login():
         # 兼容两种返回：find_by_email 若有 "password"（来自 password_hash AS password）优先用；
         # 否则回退用 "password_hash"
         pwd_hash = user.get("password") or user.get("password_hash")
-        if not pwd_hash or not check_password_hash(pwd_hash, password):
+        if not pwd_hash or not passwords.check_password(pwd_hash, password):
             return jsonify({"success": False, "message": "Incorrect email or password"}), 401
 
+        # 旧策略（含 $pbkdf2-sha256$ 旧格式）的哈希在后台按当前策略重新计算并写回
+        if passwords.needs_rehash(pwd_hash):
+            user_id = user["id"]
+
+            def save_rehash(new_hash):
+                User.update_password_hash(user_id, new_hash)
+                logger.info("Upgraded password hash", extra={"user_id": user_id})
+
+            passwords.rehash_in_background(password, save_rehash)
+
         user_info = {
             "id": user.get("id"),
             "username": user.get("username"),
@@ -80,6 +105,8 @@ def login():
             "message": "Login successful"
         }), 200
 
+    except HashingBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({"success": False, "message": f"Login failed: {str(e)}"}), 500
 
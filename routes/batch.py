@@ -0,0 +1,105 @@
+# Batch Routes: several read-only API calls in one HTTP round trip
+
+from flask import Blueprint, current_app, g, jsonify, request
+from werkzeug.test import EnvironBuilder
+from config import Config
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+batch_bp = Blueprint('batch', __name__)
+
+# 子请求继承外层请求的身份、语言与读写分离 cookie；请求 ID 相同，日志可串联
+_FORWARDED_HEADERS = ('Authorization', 'Cookie', 'Accept-Language')
+# 在子请求之间共享的 g 属性：同一个数据库连接（见 utils.database）
+_SHARED_G = ('db_connection', 'db_replica', 'db_wrote')
+# 原样返回给调用方的子响应头
+_RETURNED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _parse_batch(data):
+    """Validate the request body; returns (sub_requests, error message)"""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return None, 'Request body must be {"requests": [{"path": "/api/..."}, ...]}'
+    items = data['requests']
+    if not items:
+        return None, 'requests must not be empty'
+    if len(items) > Config.BATCH_MAX_REQUESTS:
+        return None, f'At most {Config.BATCH_MAX_REQUESTS} requests per batch'
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) \
+                or not item['path'].startswith('/'):
+            return None, f'requests[{index}]: path must be a string starting with /'
+        if str(item.get('method', 'GET')).upper() != 'GET':
+            return None, f'requests[{index}]: only GET requests can be batched'
+        if not isinstance(item.get('headers', {}), dict):
+            return None, f'requests[{index}]: headers must be an object'
+    return items, None
+
+
+def _environ(item):
+    headers = {name: request.headers[name] for name in _FORWARDED_HEADERS if name in request.headers}
+    headers['X-Request-ID'] = g.get('request_id') or ''
+    headers.update({str(k): str(v) for k, v in item.get('headers', {}).items()})
+    builder = EnvironBuilder(path=item['path'], method='GET', headers=headers,
+                             base_url=request.host_url.rstrip('/') + request.script_root,
+                             environ_base={'REMOTE_ADDR': request.remote_addr})
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _dispatch(item):
+    """Run one sub-request through the full Flask pipeline (hooks, auth, error handlers)"""
+    app = current_app._get_current_object()
+    outer = dict(vars(g))
+    try:
+        # 当前应用上下文仍在栈上，子请求不会新建应用上下文：g 与请求绑定的连接都是同一个
+        with app.request_context(_environ(item)):
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                logger.exception("Batch sub-request failed: %s", e, extra={"path": item['path']})
+                return {'status': 500, 'body': {'success': False, 'message': 'Internal server error'}}
+            if response.is_streamed:
+                response.close()
+                return {'status': 400, 'body': {'success': False,
+                                                'message': 'Streaming endpoints cannot be batched'}}
+            if response.status_code == 304:
+                body = None
+            elif response.is_json:
+                body = response.get_json(silent=True)
+            else:
+                body = response.get_data(as_text=True)
+            result = {'status': response.status_code, 'body': body}
+            headers = {name: response.headers[name] for name in _RETURNED_HEADERS if name in response.headers}
+            if headers:
+                result['headers'] = headers
+            return result
+    finally:
+        # 子请求的 before/after_request 钩子会改写 g（请求计时、JWT 身份等），逐个恢复
+        shared = {name: getattr(g, name) for name in _SHARED_G if name in g}
+        vars(g).clear()
+        vars(g).update(outer)
+        vars(g).update(shared)
+
+
+@batch_bp.route('/api/batch', methods=['POST'])
+def batch():
+    """
+    Run up to BATCH_MAX_REQUESTS GET sub-requests in order and return their responses.
+    Body: {"requests": [{"path": "/api/books/1"}, {"path": "/api/books?ids=2,3", "headers": {...}}]}
+    """
+    items, error = _parse_batch(request.get_json(silent=True))
+    if error:
+        return jsonify({
+            'success': False,
+            'message': error
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'responses': [_dispatch(item) for item in items],
+        'message': 'Batch completed'
+    })
@@ -1,27 +1,163 @@
 # Book Management Routing
 
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from models import Book
+from config import Config
+from utils.pagination import parse_limit, parse_ids
+from utils import http_cache
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 books_bp = Blueprint('books', __name__)
 
+
+def _books_by_ids_response(result):
+    """Response for GET /api/books?ids= from a (books, missing_ids) find_many result"""
+    if result is None:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to retrieve books: database unavailable'
+        }), 500
+    books, missing = result
+
+    # 与单本详情一样，ETag 取自返回的整行内容；缺失的 id 也计入
+    etag = http_cache.make_etag('books-ids', *(f"{k}={v}" for book in books for k, v in sorted(book.items())),
+                                'missing', *missing)
+    last_modified = max((book['updated_at'] for book in books if book.get('updated_at')), default=None)
+    if http_cache.is_not_modified(etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    for book in books:
+        book['availability'] = Book.availability(book)
+
+    response = jsonify({
+        'success': True,
+        'data': books,
+        'missing': missing,
+        'message': 'Successfully retrieved books'
+    })
+    return http_cache.set_validators(response, etag, last_modified)
+
+
+def _parse_list_args():
+    """?q=&title=&author=&limit=&cursor= of GET /api/books; raises ValueError"""
+    args = {
+        'q': (request.args.get('q') or '').strip(),
+        'title': request.args.get('title'),
+        'author': request.args.get('author'),
+        'limit': parse_limit(request.args.get('limit'), Config.BOOKS_PAGE_SIZE, Config.BOOKS_MAX_PAGE_SIZE),
+        'cursor': None,
+        'offset': 0,
+    }
+    cursor = request.args.get('cursor')
+    # 全文检索按相关度排序，用偏移量游标；列表用 (created_at, id) 键集游标
+    if args['q']:
+        args['offset'] = Book.parse_search_cursor(cursor) if cursor else 0
+    else:
+        args['cursor'] = Book.parse_cursor(cursor) if cursor else None
+    return args
+
+
+def _list_validators(version, args):
+    """(etag, last_modified) of a book list page from Book.version(); (None, None) while unsettled"""
+    if not version or not version['settled']:
+        return None, None
+    last_modified = version['last_modified']
+    etag = http_cache.make_etag('books', version['marker'], last_modified, args['q'], args['title'],
+                                args['author'], args['limit'], request.args.get('cursor'))
+    return etag, last_modified
+
+
+def _book_list_response(books, args, etag, last_modified):
+    """Response for a page of GET /api/books fetched with limit + 1 rows"""
+    limit = args['limit']
+    has_more = len(books) > limit
+    books = books[:limit]
+    if not has_more:
+        next_cursor = None
+    elif args['q']:
+        next_cursor = Book.search_cursor(args['offset'] + limit)
+    else:
+        next_cursor = Book.page_cursor(books[-1])
+    # 可借 / 预留 / 借出 / 待审批数量直接取自图书行上的计数列，不再按 borrows 统计
+    for book in books:
+        book['availability'] = Book.availability(book)
+
+    response = jsonify({
+        'success': True,
+        'data': books,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'message': 'Successfully retrieved book list'
+    })
+    return http_cache.set_validators(response, etag, last_modified) if etag else response
+
+
+def _book_response(book):
+    """Response for GET /api/books/<id> from a Book.find_by_id row"""
+    if not book:
+        return jsonify({
+            'success': False,
+            'message': 'Book not found'
+        }), 404
+
+    # 单本图书的 ETag 取自整行内容（含 updated_at），与将要返回的数据严格一致
+    etag = http_cache.make_etag('book', *(f"{k}={v}" for k, v in sorted(book.items())))
+    last_modified = book.get('updated_at')
+    if http_cache.is_not_modified(etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    book['availability'] = Book.availability(book)
+
+    response = jsonify({
+        'success': True,
+        'data': book,
+        'message': 'Successfully retrieved book details'
+    })
+    return http_cache.set_validators(response, etag, last_modified)
+
+
 @books_bp.route('/api/books', methods=['GET'])
+@http_cache.public
 def get_books():
-    """Get book list, support search"""
+    """
+    Get book list, support full-text search (?q=) and keyset pagination (?limit=&cursor=);
+    ?ids=1,2,3 returns those books in the given order plus the ids that do not exist
+    """
     try:
+        # 列表页批量取书：一条 IN 查询代替逐本 GET /api/books/<id>
+        if request.args.get('ids') is not None:
+            try:
+                book_ids = parse_ids(request.args['ids'], Config.BOOKS_MAX_IDS)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            return _books_by_ids_response(Book.find_many(book_ids))
+
         # Get query parameters
-        title = request.args.get('title')
-        author = request.args.get('author')
-        
-        # Search Books
-        books = Book.get_all(search_title=title, search_author=author)
+        try:
+            args = _parse_list_args()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        # 条件 GET：先做一次版本探测，客户端的 ETag 仍然有效时不查列表、不序列化
+        etag, last_modified = _list_validators(Book.version(), args)
+        if etag and http_cache.is_not_modified(etag, last_modified):
+            return http_cache.not_modified(etag, last_modified)
         
-        return jsonify({
-            'success': True,
-            'data': books,
-            'message': 'Successfully retrieved book list'
-        })
+        # 全文检索按相关度返回第 offset 条起的结果；否则按 keyset 游标翻页（多取一行用于判断是否还有下一页）
+        if args['q']:
+            books = Book.search(args['q'], limit=args['limit'] + 1, offset=args['offset'])
+        else:
+            books = Book.get_all(search_title=args['title'], search_author=args['author'],
+                                 limit=args['limit'] + 1, cursor=args['cursor'])
+        return _book_list_response(books, args, etag, last_modified)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -29,22 +165,11 @@ def get_books():
         }), 500
 
 @books_bp.route('/api/books/<int:book_id>', methods=['GET'])
+@http_cache.public
 def get_book(book_id):
     """Get details of a single book"""
     try:
-        book = Book.find_by_id(book_id)
-        
-        if not book:
-            return jsonify({
-                'success': False,
-                'message': 'Book not found'
-            }), 404
-        
-        return jsonify({
-            'success': True,
-            'data': book,
-            'message': 'Successfully retrieved book details'
-        })
+        return _book_response(Book.find_by_id(book_id))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -178,3 +303,167 @@ def delete_book(book_id):
             'success': False,
             'message': f'Book deletion failed: {str(e)}'
         }), 500
+
+# -------------------------
+# Bulk import / export
+# -------------------------
+BOOK_EXPORT_COLUMNS = ['id', 'title', 'author', 'description', 'stock',
+                       'cover_image_url', 'price', 'created_at']
+
+
+def _bulk_format():
+    """ndjson or csv, from ?format= or the Content-Type header"""
+    fmt = (request.args.get('format') or '').lower()
+    if fmt:
+        return fmt
+    return 'csv' if 'csv' in (request.mimetype or '') else 'ndjson'
+
+
+def _iter_bulk_rows(fmt):
+    """Yield (line_number, row_dict, error) from the streamed request body"""
+    text = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, 'Each line must be a JSON object'
+            continue
+        yield line_no, row, None
+
+
+def _book_params(row):
+    """Validate one imported row (same rules as POST /api/books) and build insert params"""
+    for field in ['title', 'author', 'description', 'stock']:
+        if row.get(field) in (None, ''):
+            raise ValueError(f'Missing required field: {field}')
+    stock = int(row['stock'])
+    if stock < 0:
+        raise ValueError('stock must not be negative')
+    price = float(row.get('price') or 0.0)
+    return (row['title'], row['author'], row['description'], stock,
+            row.get('cover_image_url') or None, price)
+
+
+@books_bp.route('/api/books/bulk', methods=['POST'])
+@jwt_required()
+def bulk_import_books():
+    """Import books from a streamed NDJSON or CSV body, inserting in batches"""
+    fmt = _bulk_format()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'message': f'Unsupported format: {fmt}'
+        }), 400
+    try:
+        batch_size = parse_limit(request.args.get('batch_size'),
+                                 Config.BULK_IMPORT_BATCH_SIZE, Config.BULK_IMPORT_MAX_BATCH_SIZE)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    received = inserted = failed = 0
+    errors = []
+    batch = []  # [(line_number, params)]
+
+    def record_error(line_no, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < Config.BULK_IMPORT_MAX_ERRORS:
+            errors.append({'line': line_no, 'message': message})
+
+    def flush():
+        nonlocal inserted
+        if not batch:
+            return
+        result = Book.bulk_create([params for _, params in batch])
+        if result is not False:
+            inserted += len(batch)
+        else:
+            # 整批失败时逐行重试，定位出错的行
+            for line_no, params in batch:
+                if Book.create(*params):
+                    inserted += 1
+                else:
+                    record_error(line_no, 'Database insert failed')
+        batch.clear()
+
+    try:
+        for line_no, row, error in _iter_bulk_rows(fmt):
+            received += 1
+            if error:
+                record_error(line_no, error)
+                continue
+            try:
+                batch.append((line_no, _book_params(row)))
+            except (TypeError, ValueError) as e:
+                record_error(line_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Bulk import failed: {str(e)}',
+            'data': {'received': received, 'inserted': inserted, 'failed': failed, 'errors': errors}
+        }), 500
+
+    errors.sort(key=lambda e: e['line'])
+    return jsonify({
+        'success': failed == 0,
+        'data': {
+            'received': received,
+            'inserted': inserted,
+            'failed': failed,
+            'errors': errors,
+            'errors_truncated': failed > len(errors)
+        },
+        'message': f'Imported {inserted} of {received} books'
+    }), 201 if inserted else 400
+
+
+@books_bp.route('/api/books/export', methods=['GET'])
+def export_books():
+    """Stream the whole catalogue as NDJSON (default) or CSV"""
+    fmt = _bulk_format()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'message': f'Unsupported format: {fmt}'
+        }), 400
+
+    def generate_ndjson():
+        for book in Book.iter_all():
+            yield current_app.json.dumps(book) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BOOK_EXPORT_COLUMNS)
+        for book in Book.iter_all():
+            writer.writerow([book.get(column) for column in BOOK_EXPORT_COLUMNS])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    if fmt == 'csv':
+        response = Response(stream_with_context(generate_csv()), mimetype='text/csv')
+    else:
+        response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=books.{fmt}'
+    return response
@@ -1,107 +1,239 @@
 # Borrow Management Routes
 
-from flask import Blueprint, request, jsonify
-from models import BorrowRecord, Book, User
-from datetime import datetime
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import csv
+import io
+
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
+from models import BorrowRecord, Book, TransitionOutcome
+from config import Config
+from utils.pagination import parse_limit
+from datetime import datetime, timedelta
+from flask_jwt_extended import jwt_required, current_user
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 borrows_bp = Blueprint('borrows', __name__)
 
-@borrows_bp.route('/api/borrows', methods=['POST', 'OPTIONS'])
-def create_borrow_request():
-    """Create a borrow request - 简化版本"""
-    # 处理CORS预检请求
-    if request.method == 'OPTIONS':
-        print("处理CORS预检请求")
-        from flask import make_response
-        response = make_response()
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        response.headers.add('Access-Control-Allow-Headers', "*")
-        response.headers.add('Access-Control-Allow-Methods', "*")
-        return response
-    
-    print("\n=== 借阅请求开始 ===")
-    print(f"请求方法: {request.method}")
-    print(f"请求头: {dict(request.headers)}")
-    
-    # 检查Authorization头
+
+def _transition_error(outcome):
+    """Map a failed BorrowRecord.transition outcome to an error response"""
+    if outcome == TransitionOutcome.NOT_FOUND:
+        return jsonify({
+            'success': False,
+            'message': 'Borrow record not found'
+        }), 404
+    if outcome == TransitionOutcome.BOOK_NOT_FOUND:
+        return jsonify({
+            'success': False,
+            'message': 'Book not found'
+        }), 404
+    if outcome == TransitionOutcome.SOLD_OUT:
+        return jsonify({
+            'success': False,
+            'message': 'Book is out of stock',
+            'error_type': 'sold_out'
+        }), 409
+    if outcome == TransitionOutcome.LOST_RACE:
+        return jsonify({
+            'success': False,
+            'message': 'Borrow record was modified by another request, please retry',
+            'error_type': 'conflict'
+        }), 409
+    return None
+
+
+def _transition_response(outcome, done_message, failed_message):
+    """Response for a BorrowRecord.transition outcome"""
+    error = _transition_error(outcome)
+    if error:
+        return error
+    if outcome == TransitionOutcome.OK:
+        return jsonify({
+            'success': True,
+            'message': done_message
+        })
+    return jsonify({
+        'success': False,
+        'message': failed_message
+    }), 500
+
+
+def _record_not_found():
+    return jsonify({
+        'success': False,
+        'message': 'Borrow record not found'
+    }), 404
+
+
+def _auth_header_error():
+    """401 for POST /api/borrows without a Bearer Authorization header, else None"""
     auth_header = request.headers.get('Authorization')
-    print(f"Authorization头: {auth_header}")
     
     if not auth_header:
-        print("ERROR: 缺少Authorization头")
+        logger.info("Borrow request rejected: missing Authorization header")
         return jsonify({
             'success': False,
             'message': 'Authorization token required'
         }), 401
     
     if not auth_header.startswith('Bearer '):
-        print("ERROR: Authorization头格式错误")
+        logger.info("Borrow request rejected: malformed Authorization header")
         return jsonify({
             'success': False,
             'message': 'Invalid authorization format'
         }), 401
+    return None
+
+
+def _jwt_failed(jwt_error):
+    logger.info("Borrow request rejected: JWT verification failed: %s", jwt_error)
+    return jsonify({
+        'success': False,
+        'message': f'JWT verification failed: {str(jwt_error)}'
+    }), 401
+
+
+def _borrow_request_error(data):
+    """400 for a POST /api/borrows body without a book_id, else None"""
+    if not data:
+        return jsonify({
+            'success': False,
+            'message': '请求数据不能为空'
+        }), 400
+    
+    if not data.get('book_id'):
+        return jsonify({
+            'success': False,
+            'message': '图书ID不能为空'
+        }), 400
+    return None
+
+
+def _borrowable(book):
+    return bool(book) and book.get('stock', 0) > 0
+
+
+def _borrow_refusal(book, existing):
+    """Response refusing a borrow request (no such book, out of stock, already borrowed), else None"""
+    # 验证图书是否存在
+    if not book:
+        return jsonify({
+            'success': False,
+            'message': '图书不存在'
+        }), 404
+    
+    # 检查库存
+    if not _borrowable(book):
+        return jsonify({
+            'success': False,
+            'message': '图书库存不足'
+        }), 400
+    
+    # 检查是否已经借阅过
+    if existing:
+        return jsonify({
+            'success': False,
+            'message': '您已经借阅过这本书'
+        }), 400
+    return None
+
+
+def _borrow_created(borrow_id, user_id, book_id):
+    if borrow_id:
+        logger.info("Borrow request created",
+                    extra={"borrow_id": borrow_id, "user_id": user_id, "book_id": book_id})
+        return jsonify({
+            'success': True,
+            'message': '借阅请求提交成功',
+            'data': {'borrow_id': borrow_id}
+        }), 201
+    return jsonify({
+        'success': False,
+        'message': '创建借阅记录失败'
+    }), 500
+
+
+def _status_change(record, borrow_status):
+    """(stock_delta, return_date) for moving a borrow record to borrow_status"""
+    # 批准（或直接借出）时预留一本，库存不足则 sold_out；已批准的借出不再扣减，拒绝 / 归还时退还
+    stock_delta = BorrowRecord.stock_change(record['borrow_status'], borrow_status)
+    
+    # If changing to 'returned', set return date
+    return_date = None
+    if borrow_status == 'returned' and record['borrow_status'] == 'borrowed':
+        return_date = datetime.now()
+    return stock_delta, return_date
+
+
+def _return_refusal(record, user_id):
+    """Response refusing PUT /api/borrows/<id>/return for this record, else None"""
+    # Check if record exists
+    if not record:
+        return _record_not_found()
+    
+    # Check if the user owns this borrow record
+    if record['user_id'] != user_id:
+        return jsonify({
+            'success': False,
+            'message': 'You can only return your own borrowed books'
+        }), 403
+    
+    # Check if the book is currently borrowed
+    if record['borrow_status'] != 'borrowed':
+        return jsonify({
+            'success': False,
+            'message': 'This book is not currently borrowed'
+        }), 400
+    return None
+
+
+@borrows_bp.route('/api/borrows', methods=['POST', 'OPTIONS'])
+def create_borrow_request():
+    """Create a borrow request - 简化版本"""
+    # 处理CORS预检请求
+    if request.method == 'OPTIONS':
+        from flask import make_response
+        response = make_response()
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add('Access-Control-Allow-Headers', "*")
+        response.headers.add('Access-Control-Allow-Methods', "*")
+        return response
+    
+    # 检查Authorization头
+    error = _auth_header_error()
+    if error:
+        return error
     
     # 现在使用JWT装饰器
-    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+    from flask_jwt_extended import verify_jwt_in_request
     try:
+        # 同时经 user_lookup_loader 加载 current_user：已删除的用户在这里被拒绝
         verify_jwt_in_request()
-        current_user_id_str = get_jwt_identity()
-        current_user_id = int(current_user_id_str)  # 转换回整数
-        print(f"JWT验证成功，当前用户ID: {current_user_id} (类型: {type(current_user_id)})")
+        current_user_id = current_user['id']
     except Exception as jwt_error:
-        print(f"JWT验证失败: {jwt_error}")
-        return jsonify({
-            'success': False,
-            'message': f'JWT verification failed: {str(jwt_error)}'
-        }), 401
+        return _jwt_failed(jwt_error)
     
     try:
         # 获取请求数据
         data = request.get_json()
-        print(f"请求数据: {data}")
+        error = _borrow_request_error(data)
+        if error:
+            return error
+        book_id = data['book_id']
         
-        if not data:
-            return jsonify({
-                'success': False,
-                'message': '请求数据不能为空'
-            }), 400
-        
-        book_id = data.get('book_id')
-        if not book_id:
-            return jsonify({
-                'success': False,
-                'message': '图书ID不能为空'
-            }), 400
-        
-        print(f"图书ID: {book_id}")
-        
-        # 验证图书是否存在
         book = Book.find_by_id(book_id)
-        if not book:
-            return jsonify({
-                'success': False,
-                'message': '图书不存在'
-            }), 404
-        
-        # 检查库存
-        if book.get('stock', 0) <= 0:
-            return jsonify({
-                'success': False,
-                'message': '图书库存不足'
-            }), 400
-        
-        # 检查是否已经借阅过
-        try:
-            existing = BorrowRecord.find_active_borrow(current_user_id, book_id)
-            if existing:
-                return jsonify({
-                    'success': False,
-                    'message': '您已经借阅过这本书'
-                }), 400
-        except Exception as e:
-            print(f"检查现有借阅记录失败: {e}")
-            # 继续执行
+        existing = None
+        if _borrowable(book):
+            try:
+                existing = BorrowRecord.find_active_borrow(current_user_id, book_id)
+            except Exception as e:
+                logger.warning("Active borrow check failed: %s", e,
+                               extra={"user_id": current_user_id, "book_id": book_id})
+                # 继续执行
+        error = _borrow_refusal(book, existing)
+        if error:
+            return error
         
         # 创建借阅记录
         borrow_id = BorrowRecord.create(
@@ -109,70 +241,132 @@ def create_borrow_request():
             book_id=book_id,
             borrow_status="requested"
         )
-        
-        if borrow_id:
-            print(f"成功创建借阅记录: {borrow_id}")
-            return jsonify({
-                'success': True,
-                'message': '借阅请求提交成功',
-                'data': {'borrow_id': borrow_id}
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'message': '创建借阅记录失败'
-            }), 500
+        return _borrow_created(borrow_id, current_user_id, book_id)
             
     except Exception as e:
-        print(f"借阅请求异常: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Borrow request failed: %s", e)
         
         return jsonify({
             'success': False,
             'message': '服务器内部错误'
         }), 500
 
+def _parse_history_args():
+    """?borrow_status=requested,borrowed&limit=&cursor= of GET /api/borrows/user/<id>"""
+    borrow_statuses = []
+    for status in (request.args.get('borrow_status') or '').split(','):
+        status = status.strip()
+        if not status:
+            continue
+        if status not in BorrowRecord.BORROW_STATUSES:
+            raise ValueError(f'Invalid borrow_status: {status}')
+        if status not in borrow_statuses:
+            borrow_statuses.append(status)
+    limit = parse_limit(request.args.get('limit'), Config.BORROWS_PAGE_SIZE, Config.BORROWS_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    cursor = BorrowRecord.parse_cursor(cursor) if cursor else None
+    return tuple(borrow_statuses), cursor, limit
+
+
+def _history_response(result, limit):
+    """Response for a BorrowRecord.history result fetched with limit + 1 rows"""
+    if result is None:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to retrieve borrowing history: database unavailable'
+        }), 500
+    borrows, summary = result
+    if summary is None:
+        return jsonify({
+            'success': False,
+            'message': 'User does not exist'
+        }), 404
+
+    has_more = len(borrows) > limit
+    borrows = borrows[:limit]
+    return jsonify({
+        'success': True,
+        'data': borrows,
+        'summary': summary,
+        'next_cursor': BorrowRecord.page_cursor(borrows[-1]) if has_more else None,
+        'has_more': has_more,
+        'message': 'Successfully retrieved borrowing history'
+    })
+
+
 @borrows_bp.route('/api/borrows/user/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user_borrows(user_id):
-    """Get borrowing history for a user"""
+    """Get borrowing history for a user: status filter (?borrow_status=), keyset pagination and summary counts"""
     try:
-        # Check if user exists
-        user = User.find_by_id(user_id)
-        if not user:
+        try:
+            borrow_statuses, cursor, limit = _parse_history_args()
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'message': 'User does not exist'
-            }), 404
-        
-        # Get borrowing records
-        borrows = BorrowRecord.get_by_user(user_id)
-        
-        return jsonify({
-            'success': True,
-            'data': borrows,
-            'message': 'Successfully retrieved borrowing history'
-        })
-        
+                'message': str(e)
+            }), 400
+
+        # 用户是否存在、汇总计数与本页记录在同一条查询中取得
+        return _history_response(BorrowRecord.history(user_id, borrow_statuses, cursor, limit + 1), limit)
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Failed to retrieve borrowing history: {str(e)}'
         }), 500
 
+def _parse_date_arg(name, end_of_day=False):
+    """Parse ?from= / ?to= (YYYY-MM-DD or ISO datetime); a bare ``to`` date includes that whole day"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name} date: {value}')
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
 @borrows_bp.route('/api/borrows', methods=['GET'])
 @jwt_required()
 def get_all_borrows():
-    """Get all borrow records (admin use)"""
+    """Get borrow records (admin use): filters, keyset pagination, or a streamed export"""
     try:
         # 从 query string 获取 borrow_status
         borrow_status = request.args.get('borrow_status')  # 前端传 ?borrow_status=requested
-        borrows = BorrowRecord.get_all(borrow_status=borrow_status)
+        try:
+            filters = {
+                'borrow_status': borrow_status,
+                'user_id': request.args.get('user_id', type=int),
+                'date_from': _parse_date_arg('from'),
+                'date_to': _parse_date_arg('to', end_of_day=True),
+            }
+            limit = parse_limit(request.args.get('limit'),
+                                Config.BORROWS_PAGE_SIZE, Config.BORROWS_MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            cursor = BorrowRecord.parse_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        # ?format=ndjson|csv：无缓冲游标逐行导出全部匹配记录
+        fmt = (request.args.get('format') or '').lower()
+        if fmt in ('ndjson', 'csv'):
+            return _stream_borrows(fmt, filters)
+
+        borrows = BorrowRecord.get_all(limit=limit + 1, cursor=cursor, **filters)
+        has_more = len(borrows) > limit
+        borrows = borrows[:limit]
         
         return jsonify({
             'success': True,
             'data': borrows,
+            'next_cursor': BorrowRecord.page_cursor(borrows[-1]) if has_more else None,
+            'has_more': has_more,
             'message': 'Successfully retrieved borrow records'
         })
         
@@ -183,6 +377,37 @@ def get_all_borrows():
         }), 500
 
 
+BORROW_EXPORT_COLUMNS = ['id', 'user_id', 'book_id', 'borrow_date', 'return_date', 'borrow_status',
+                         'notes', 'title', 'author', 'username', 'email']
+
+
+def _stream_borrows(fmt, filters):
+    rows = BorrowRecord.stream_all(**filters)
+
+    def generate_ndjson():
+        for row in rows:
+            yield current_app.json.dumps(row) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BORROW_EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([row.get(column) for column in BORROW_EXPORT_COLUMNS])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    if fmt == 'csv':
+        response = Response(stream_with_context(generate_csv()), mimetype='text/csv')
+    else:
+        response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=borrows.{fmt}'
+    return response
+
+
 @borrows_bp.route('/api/borrows/<int:record_id>/borrow_status', methods=['PUT'])
 @jwt_required()
 def update_borrow_status(record_id):
@@ -200,36 +425,17 @@ def update_borrow_status(record_id):
         # Check if record exists
         record = BorrowRecord.find_by_id(record_id)
         if not record:
-            return jsonify({
-                'success': False,
-                'message': 'Borrow record not found'
-            }), 404
+            return _record_not_found()
         
         borrow_status = data['borrow_status']  # 改成 borrow_status
-        return_date = None
-        
-        # If changing to 'borrowed', reduce stock
-        if borrow_status == 'borrowed' and record['borrow_status'] == 'requested':
-            Book.update_stock(record['book_id'], -1)
-        
-        # If changing to 'returned', increase stock and set return date
-        elif borrow_status == 'returned' and record['borrow_status'] == 'borrowed':
-            Book.update_stock(record['book_id'], 1)
-            return_date = datetime.now()
+        stock_delta, return_date = _status_change(record, borrow_status)
         
-        # Update borrow status
-        result = BorrowRecord.update_status(record_id, borrow_status, return_date)
-        
-        if result:
-            return jsonify({
-                'success': True,
-                'message': 'Borrow status updated successfully'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to update borrow status'
-            }), 500
+        # 状态 compare-and-set 与库存条件扣减在同一事务中完成
+        outcome = BorrowRecord.transition(record_id, record['borrow_status'], borrow_status,
+                                          book_id=record['book_id'], stock_delta=stock_delta,
+                                          return_date=return_date)
+        return _transition_response(outcome, 'Borrow status updated successfully',
+                                    'Failed to update borrow status')
             
     except Exception as e:
         return jsonify({
@@ -242,48 +448,16 @@ def update_borrow_status(record_id):
 def return_book(record_id):
     """User returns a borrowed book"""
     try:
-        current_user_id_str = get_jwt_identity()
-        current_user_id = int(current_user_id_str)
-        
-        # Check if record exists
         record = BorrowRecord.find_by_id(record_id)
-        if not record:
-            return jsonify({
-                'success': False,
-                'message': 'Borrow record not found'
-            }), 404
-        
-        # Check if the user owns this borrow record
-        if record['user_id'] != current_user_id:
-            return jsonify({
-                'success': False,
-                'message': 'You can only return your own borrowed books'
-            }), 403
-        
-        # Check if the book is currently borrowed
-        if record['borrow_status'] != 'borrowed':
-            return jsonify({
-                'success': False,
-                'message': 'This book is not currently borrowed'
-            }), 400
+        error = _return_refusal(record, current_user['id'])
+        if error:
+            return error
         
-        # Update the record to returned status
-        return_date = datetime.now()
-        result = BorrowRecord.update_status(record_id, 'returned', return_date)
-        
-        if result:
-            # Increase the book stock
-            Book.update_stock(record['book_id'], 1)
-            
-            return jsonify({
-                'success': True,
-                'message': 'Book returned successfully'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to return book'
-            }), 500
+        # Update the record to returned status and increase the book stock in one transaction
+        outcome = BorrowRecord.transition(record_id, 'borrowed', 'returned',
+                                          book_id=record['book_id'], stock_delta=1,
+                                          return_date=datetime.now())
+        return _transition_response(outcome, 'Book returned successfully', 'Failed to return book')
             
     except Exception as e:
         return jsonify({
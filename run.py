@@ -1,12 +1,33 @@
 # Startup Script
+#
+#   python run.py                     development server (Flask/werkzeug, DEBUG=true for the reloader)
+#   gunicorn -c gunicorn.conf.py      production (see gunicorn.conf.py)
 
-from app import create_app
+import argparse
+
+from config import Config
+from app import get_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BookNest API development server")
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    parser.add_argument("--routes", action="store_true", help="print the route table and exit")
+    args = parser.parse_args()
+
+    app = get_app()
+    if args.routes:
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            print(f"{','.join(sorted(rule.methods - {'HEAD', 'OPTIONS'})):<20} {rule.rule}")
+        return
 
-if __name__ == '__main__':
-    app = create_app()
     print("=" * 50)
     print("BookNest API service is starting...")
-    print("API endpoint: http://localhost:5000")
-    print("Health check: http://localhost:5000/api/health")
+    print(f"API endpoint: http://localhost:{args.port}")
+    print(f"Health check: http://localhost:{args.port}/api/health")
     print("=" * 50)
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=args.port, debug=Config.DEBUG)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# Tests run against the embedded SQLite backend (seeded from db/seed_current_schema.sql)
+#
+#   python -m pytest -q
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py 在导入时读取环境变量，必须先于任何项目模块设置
+_tmp = tempfile.mkdtemp(prefix="booknest-tests-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(_tmp, "booknest.sqlite3")
+os.environ["DB_REPLICA_DSNS"] = ""
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
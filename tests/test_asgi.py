@@ -0,0 +1,123 @@
+import asyncio
+import io
+import json
+import threading
+import uuid
+
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from models import User
+from utils.database import db
+
+
+def _asgi():
+    import asgi
+    return asgi
+
+
+async def _request(app, method, path, headers=(), chunks=(b"",)):
+    """Send one request through the ASGI app; returns (status, body, receive calls made before the response)"""
+    raw_path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": raw_path, "query_string": query.encode(),
+             "headers": [(k.lower().encode(), v.encode()) for k, v in headers], "http_version": "1.1",
+             "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 0)}
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    received, status, body = [], [], []
+
+    async def receive():
+        received.append(1)
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        else:
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status[0], b"".join(body)
+
+
+def _run(coroutine_fn):
+    from utils.async_database import adb
+
+    async def main():
+        await adb.start()
+        try:
+            return await coroutine_fn()
+        finally:
+            await adb.close()
+    return asyncio.run(main())
+
+
+def _tokens(flask_app, user_id):
+    with flask_app.app_context():
+        return create_access_token(identity=str(user_id)), create_refresh_token(identity=str(user_id))
+
+
+def test_async_routes_reject_refresh_tokens_and_deleted_users():
+    asgi = _asgi()
+    name = f"asgi-{uuid.uuid4().hex[:8]}"
+    user_id = User.create(name, f"{name}@example.com", "x")
+    access, refresh = _tokens(asgi.flask_app, user_id)
+    path = "/api/borrows/999999/return"
+
+    async def scenario():
+        ok = await _request(asgi.app, "PUT", path, [("Authorization", f"Bearer {access}")])
+        wrong_type = await _request(asgi.app, "PUT", path, [("Authorization", f"Bearer {refresh}")])
+        db.execute_update("DELETE FROM users WHERE id = %s", (user_id,))
+        User.invalidate_identity(user_id)
+        deleted = await _request(asgi.app, "PUT", path, [("Authorization", f"Bearer {access}")])
+        return ok, wrong_type, deleted
+
+    ok, wrong_type, deleted = _run(scenario)
+    assert ok[0] == 404
+    assert wrong_type[0] in (401, 422)
+    assert deleted[0] == 401
+    assert json.loads(deleted[1])["error_type"] == "user_not_found"
+
+
+def test_wsgi_requests_stream_the_body():
+    asgi = _asgi()
+    access, _ = _tokens(asgi.flask_app, 3)
+    rows = [json.dumps({"title": f"asgi-stream-{i}", "author": "A", "description": "d", "stock": 1}) + "\n"
+            for i in range(3)]
+    chunks = [row.encode() for row in rows]
+
+    async def scenario():
+        return await _request(asgi.app, "POST", "/api/books/bulk?format=ndjson",
+                              [("Authorization", f"Bearer {access}"), ("Content-Type", "application/x-ndjson")],
+                              chunks=chunks)
+
+    status, body = _run(scenario)
+    assert status == 201, body
+    assert json.loads(body)["data"]["inserted"] == 3
+
+
+def test_receive_stream_pulls_messages_on_demand():
+    from utils.asgi import _ReceiveStream
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    messages = [{"type": "http.request", "body": b"a\n", "more_body": True},
+                {"type": "http.request", "body": b"b\n", "more_body": False}]
+    calls = []
+
+    async def receive():
+        calls.append(1)
+        return messages.pop(0)
+
+    try:
+        stream = io.BufferedReader(_ReceiveStream(receive, loop))
+        assert stream.readline() == b"a\n"
+        assert len(calls) == 1
+        assert stream.read() == b"b\n"
+        assert len(calls) == 2
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
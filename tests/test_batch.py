@@ -0,0 +1,22 @@
+from app import create_app
+
+
+def test_batch_runs_get_sub_requests_in_order():
+    client = create_app().test_client()
+    response = client.post("/api/batch", json={"requests": [
+        {"path": "/api/books/1"},
+        {"path": "/api/books/999999"},
+        {"path": "/api/health"},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()["responses"]
+    assert [r["status"] for r in results] == [200, 404, 200]
+    assert results[0]["body"]["data"]["id"] == 1
+    assert "ETag" in results[0]["headers"]
+    assert results[2]["body"]["service"] == "booknest-api"
+
+
+def test_batch_rejects_non_get_requests():
+    client = create_app().test_client()
+    response = client.post("/api/batch", json={"requests": [{"path": "/api/books", "method": "POST"}]})
+    assert response.status_code == 400
@@ -0,0 +1,27 @@
+import uuid
+
+from models import Book
+from utils.database import db
+
+
+def test_pages_cover_books_sharing_created_at():
+    tag = f"page{uuid.uuid4().hex[:6]}"
+    Book.bulk_create([(f"{tag} {i}", "A", "d", 1, None, 1.0) for i in range(5)])
+    db.execute_update("UPDATE books SET created_at = '2001-01-01 00:00:00' WHERE title LIKE %s", (f"{tag}%",))
+
+    seen, cursor = [], None
+    for _ in range(5):
+        books = Book.get_all(search_title=tag, limit=2, cursor=cursor)
+        seen.extend(book["id"] for book in books)
+        if len(books) < 2:
+            break
+        cursor = (books[-1]["created_at"], books[-1]["id"])
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == 5
+
+
+def test_next_page_reads_the_created_at_index():
+    statement, params = Book._get_all_query(limit=20, cursor=("2030-01-01 00:00:00", 10))
+    plan = " ".join(row["detail"] for row in db.execute_query(f"EXPLAIN QUERY PLAN {statement.sql}", params))
+    assert "idx_created_at" in plan
+    assert "TEMP B-TREE" not in plan
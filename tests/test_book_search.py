@@ -0,0 +1,49 @@
+import uuid
+
+import models
+from app import create_app
+from models import Book
+from utils.database import db
+
+
+def test_search_pages_follow_next_cursor():
+    tag = f"searchpage{uuid.uuid4().hex[:6]}"
+    Book.bulk_create([(f"{tag} {i}", "A", "d", 1, None, 1.0) for i in range(5)])
+    client = create_app().test_client()
+
+    seen, cursor = [], None
+    for _ in range(5):
+        query = f"/api/books?q={tag}&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(query).get_json()
+        seen.extend(book["id"] for book in body["data"])
+        cursor = body["next_cursor"]
+        assert body["has_more"] == (cursor is not None)
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_search_rejects_list_cursor():
+    client = create_app().test_client()
+    list_cursor = client.get("/api/books?limit=1").get_json()["next_cursor"]
+    assert client.get(f"/api/books?q=x&cursor={list_cursor}").status_code == 400
+
+
+def test_missing_fulltext_index_warns_once_and_uses_like(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(db.backend, "supports_fulltext", True, raising=False)
+    # SQLite 没有 SHOW INDEX：用一条不返回行的查询代替“索引不存在”
+    monkeypatch.setattr(Book, "SQL_FULLTEXT_INDEX", "SELECT name FROM sqlite_master WHERE 0 = 1")
+    monkeypatch.setattr(Book, "fulltext_index", None)
+    monkeypatch.setattr(models.logger, "warning", lambda *args, **kwargs: warnings.append(args))
+    executed = []
+    execute_query = db.execute_query
+    monkeypatch.setattr(db, "execute_query", lambda query, params=None: executed.append(query)
+                        or execute_query(query, params))
+
+    for _ in range(3):
+        assert Book.search("Python") is not None
+    assert Book.fulltext_index is False
+    assert len(warnings) == 1
+    assert Book.SQL_SEARCH_FULLTEXT not in executed
+    assert executed.count(Book.SQL_FULLTEXT_INDEX) == 1
@@ -0,0 +1,38 @@
+from app import create_app
+from models import Book
+from utils.database import db
+
+
+def test_deleting_a_book_changes_the_version():
+    book_id = Book.create("version probe", "A", "d", 1, None, 1.0)
+    # 被删的书不是最新修改的那本：MAX(updated_at) 不变，只能靠删除计数发现
+    db.execute_update("UPDATE books SET updated_at = '2000-01-01 00:00:00' WHERE id = %s", (book_id,))
+    before = Book.version()
+
+    assert Book.delete(book_id)
+    after = Book.version()
+    assert after["last_modified"] == before["last_modified"]
+    assert after["marker"] != before["marker"]
+    assert create_app().test_client().get(f"/api/books/{book_id}").status_code == 404
+
+
+def test_version_reads_the_counter_without_counting_books(monkeypatch):
+    executed = []
+    execute_query = db.execute_query
+    monkeypatch.setattr(db, "execute_query", lambda query, params=None: executed.append(query)
+                        or execute_query(query, params))
+
+    version = Book.version()
+    assert version["marker"].startswith("d")
+    assert Book.version_table is True
+    assert Book.SQL_VERSION_SCAN not in executed
+
+
+def test_missing_version_table_falls_back_to_count(monkeypatch):
+    monkeypatch.setattr(Book, "SQL_VERSION", "SELECT deletions FROM no_such_table")
+    monkeypatch.setattr(Book, "version_table", None)
+
+    assert Book.version()["marker"].startswith("n")
+    assert Book.version_table is False
+    book_id = Book.create("version fallback", "A", "d", 1, None, 1.0)
+    assert Book.delete(book_id)
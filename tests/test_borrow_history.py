@@ -0,0 +1,63 @@
+import json
+import uuid
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import Book, BorrowRecord, User
+
+
+def _history_fixture():
+    name = f"history-{uuid.uuid4().hex[:8]}"
+    user_id = User.create(name, f"{name}@example.com", "x")
+    book_id = Book.create(f"history book {name}", "A", "d", 5)
+    for day, status in ((1, "returned"), (2, "borrowed"), (3, "requested")):
+        BorrowRecord.create(user_id, book_id, status, borrow_date=f"2025-08-0{day} 10:00:00")
+    return user_id
+
+
+def _client():
+    app = create_app()
+    with app.app_context():
+        token = create_access_token(identity="4")
+    return app.test_client(), {"Authorization": f"Bearer {token}"}
+
+
+def test_user_history_pages_with_a_cursor_and_full_summary():
+    user_id = _history_fixture()
+    client, headers = _client()
+
+    first = client.get(f"/api/borrows/user/{user_id}?limit=2", headers=headers).get_json()
+    assert [r["borrow_status"] for r in first["data"]] == ["requested", "borrowed"]
+    assert first["has_more"] is True
+    assert first["summary"]["total"] == 3
+
+    second = client.get(f"/api/borrows/user/{user_id}?limit=2&cursor={first['next_cursor']}",
+                        headers=headers).get_json()
+    assert [r["borrow_status"] for r in second["data"]] == ["returned"]
+    assert second["has_more"] is False
+
+    returned = client.get(f"/api/borrows/user/{user_id}?borrow_status=returned", headers=headers).get_json()
+    assert len(returned["data"]) == 1
+    assert returned["summary"]["total"] == 3
+
+
+def test_history_of_unknown_user_is_404():
+    client, headers = _client()
+    assert client.get("/api/borrows/user/999999", headers=headers).status_code == 404
+
+
+def test_admin_listing_pages_and_streams():
+    user_id = _history_fixture()
+    client, headers = _client()
+
+    page = client.get(f"/api/borrows?user_id={user_id}&limit=2", headers=headers).get_json()
+    assert len(page["data"]) == 2 and page["has_more"] is True
+    rest = client.get(f"/api/borrows?user_id={user_id}&limit=2&cursor={page['next_cursor']}",
+                      headers=headers).get_json()
+    assert len(rest["data"]) == 1 and rest["next_cursor"] is None
+
+    export = client.get(f"/api/borrows?user_id={user_id}&format=ndjson", headers=headers)
+    rows = [json.loads(line) for line in export.get_data(as_text=True).splitlines()]
+    assert export.mimetype == "application/x-ndjson"
+    assert len(rows) == 3 and {row["user_id"] for row in rows} == {user_id}
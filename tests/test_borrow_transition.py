@@ -0,0 +1,74 @@
+import pymysql
+
+from models import Book, BorrowRecord, TransitionOutcome
+from utils.backends.mysql import MySQLBackend
+
+
+def _request(stock):
+    book_id = Book.create("transition probe", "A", "d", stock, None, 1.0)
+    return book_id, BorrowRecord.create(3, book_id)
+
+
+def test_missing_book_is_not_reported_as_sold_out():
+    book_id, record_id = _request(stock=1)
+
+    outcome = BorrowRecord.transition(record_id, "requested", "borrowed", book_id=999999, stock_delta=-1)
+    assert outcome == TransitionOutcome.BOOK_NOT_FOUND
+    assert BorrowRecord.find_by_id(record_id)["borrow_status"] == "requested"
+
+
+def test_out_of_stock_rolls_back_the_record():
+    book_id, record_id = _request(stock=0)
+
+    outcome = BorrowRecord.transition(record_id, "requested", "borrowed", book_id=book_id, stock_delta=-1)
+    assert outcome == TransitionOutcome.SOLD_OUT
+    assert BorrowRecord.find_by_id(record_id)["borrow_status"] == "requested"
+
+
+def test_mysql_connections_count_matched_rows(monkeypatch):
+    captured = {}
+    monkeypatch.setattr(pymysql, "connect", lambda **kwargs: captured.update(kwargs))
+
+    MySQLBackend(host="db", user="u", password="p", database="d").connect()
+    assert captured["client_flag"] & pymysql.constants.CLIENT.FOUND_ROWS
+
+
+def _move(record_id, book_id, from_status, to_status):
+    return BorrowRecord.transition(record_id, from_status, to_status, book_id=book_id,
+                                   stock_delta=BorrowRecord.stock_change(from_status, to_status))
+
+
+def _stock(book_id):
+    Book.cache.clear()
+    return Book.find_by_id(book_id)["stock"]
+
+
+def test_approval_reserves_the_last_copy():
+    book_id, first = _request(stock=1)
+    second = BorrowRecord.create(3, book_id)
+
+    assert _move(first, book_id, "requested", "approved") == TransitionOutcome.OK
+    assert _move(second, book_id, "requested", "approved") == TransitionOutcome.SOLD_OUT
+    assert _stock(book_id) == 0
+    # 借出沿用预留，不再扣减
+    assert _move(first, book_id, "approved", "borrowed") == TransitionOutcome.OK
+    assert _stock(book_id) == 0
+
+
+def test_denying_an_approval_gives_the_copy_back():
+    book_id, record_id = _request(stock=1)
+
+    assert _move(record_id, book_id, "requested", "approved") == TransitionOutcome.OK
+    assert _move(record_id, book_id, "approved", "denied") == TransitionOutcome.OK
+    assert _stock(book_id) == 1
+
+
+def test_available_excludes_reserved_copies():
+    book_id, record_id = _request(stock=2)
+
+    assert _move(record_id, book_id, "requested", "approved") == TransitionOutcome.OK
+    Book.cache.clear()
+    availability = Book.availability(Book.find_by_id(book_id))
+    assert availability["available"] == 1
+    assert availability["reserved"] == 1
+    assert availability["pending"] == 0
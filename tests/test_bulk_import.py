@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import Book
+from utils.database import db
+
+
+def _count(title_prefix):
+    rows = db.execute_query("SELECT COUNT(*) AS n FROM books WHERE title LIKE %s", (title_prefix + "%",))
+    return rows[0]["n"]
+
+
+def test_failed_batch_inserts_nothing():
+    books = [("bulk-partial-1", "A", "", 1, None, 1.0),
+             ("bulk-partial-2", "A", "", 1, None, 1.0),
+             (None, "A", "", 1, None, 1.0)]  # title NOT NULL：第三行失败
+    assert Book.bulk_create(books) is False
+    assert _count("bulk-partial-") == 0
+
+
+def test_bulk_import_retries_failed_batch_without_duplicates(monkeypatch):
+    app = create_app()
+    with app.app_context():
+        token = create_access_token(identity="3")
+
+    real_execute_many = db.execute_many
+
+    def fail_after_first_row(query, seq_of_params):
+        # 前一行已写入后整批失败（相当于 executemany 的后一个分片出错）
+        seq_of_params = list(seq_of_params)
+        db.execute_update(query, seq_of_params[0])
+        raise db.backend.OperationalError("simulated failure in a later chunk")
+
+    monkeypatch.setattr(db, "execute_many", fail_after_first_row)
+    body = "\n".join(json.dumps({"title": f"bulk-retry-{i}", "author": "A", "description": "d", "stock": 1})
+                     for i in range(3))
+    response = app.test_client().post("/api/books/bulk?format=ndjson", data=io.BytesIO(body.encode()),
+                                      headers={"Authorization": f"Bearer {token}",
+                                               "Content-Type": "application/x-ndjson"})
+    monkeypatch.setattr(db, "execute_many", real_execute_many)
+
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()["data"]["inserted"] == 3
+    assert _count("bulk-retry-") == 3
+
+
+def test_export_aborts_instead_of_truncating(monkeypatch):
+    Book.bulk_create([(f"export-abort-{i}", "A", "d", 1, None, 1.0) for i in range(3)])
+    pages = []
+    real_execute_query = db.execute_query
+
+    def fail_second_page(query, params=None):
+        pages.append(query)
+        return real_execute_query(query, params) if len(pages) == 1 else None
+
+    monkeypatch.setattr(db, "execute_query", fail_second_page)
+    exported = []
+    with pytest.raises(db.backend.OperationalError):
+        for book in Book.iter_all(batch_size=2):
+            exported.append(book)
+    assert len(exported) == 2
+
+    pages.clear()
+    pages.append("first page already failed")
+    with pytest.raises(db.backend.OperationalError):
+        create_app().test_client().get("/api/books/export").get_data()
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from models import Book
+from utils.cache import MemoryCache, ReadThroughCache
+
+
+class _BlockingCache(MemoryCache):
+    """A MemoryCache that records the threads it is called from, flagged like RedisCache"""
+    blocking = True
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value, ttl=None):
+        self.threads.add(threading.get_ident())
+        super().set(key, value, ttl)
+
+
+def test_blocking_backend_is_called_off_the_event_loop():
+    backend = _BlockingCache()
+    cache = ReadThroughCache(backend, "test")
+
+    async def load():
+        return {"id": 1}
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        first = await cache.get_or_load_async(1, load)
+        second = await cache.get_many_async([1])
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(scenario())
+    assert first == {"id": 1}
+    assert second == {1: {"id": 1}}
+    assert backend.threads and loop_thread not in backend.threads
+
+
+def test_book_update_invalidates_the_cached_row():
+    book_id = Book.create("cache probe", "A", "d", 1)
+    assert Book.find_by_id(book_id)["title"] == "cache probe"
+    hits = Book.cache.stats()["hits"]
+    Book.find_by_id(book_id)
+    assert Book.cache.stats()["hits"] == hits + 1
+
+    Book.update(book_id, "cache probe (edited)", "A", "d", 1)
+    assert Book.find_by_id(book_id)["title"] == "cache probe (edited)"
@@ -0,0 +1,44 @@
+import uuid
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import User
+from utils.database import db
+
+
+def _new_user():
+    name = f"identity-{uuid.uuid4().hex[:8]}"
+    return User.create(name, f"{name}@example.com", "x")
+
+
+def _token(app, user_id):
+    with app.app_context():
+        return create_access_token(identity=str(user_id))
+
+
+def test_password_hash_update_invalidates_identity():
+    user_id = _new_user()
+    assert User.find_identity(user_id)["id"] == user_id
+    misses = User.identity_cache.stats()["misses"]
+    User.find_identity(user_id)
+    assert User.identity_cache.stats()["misses"] == misses
+    User.update_password_hash(user_id, "y")
+    User.find_identity(user_id)
+    assert User.identity_cache.stats()["misses"] == misses + 1
+
+
+def test_current_user_is_resolved_and_deleted_users_rejected():
+    app = create_app()
+    client = app.test_client()
+    user_id = _new_user()
+    headers = {"Authorization": f"Bearer {_token(app, user_id)}"}
+
+    response = client.put("/api/borrows/999999/return", headers=headers)
+    assert response.status_code == 404
+
+    db.execute_update("DELETE FROM users WHERE id = %s", (user_id,))
+    User.invalidate_identity(user_id)
+    response = client.put("/api/borrows/999999/return", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["error_type"] == "user_not_found"
@@ -0,0 +1,23 @@
+import io
+import json
+
+from app import create_app
+from utils import log
+
+
+def test_json_lines_carry_the_request_id_and_extra_fields():
+    app = create_app()
+    stream = io.StringIO()
+    log.configure_logging(level="INFO", fmt="json", stream=stream)
+    try:
+        with app.test_request_context("/api/health", headers={"X-Request-ID": "req-123"}):
+            app.preprocess_request()
+            log.get_logger("tests").info("Book created", extra={"book_id": 7})
+    finally:
+        # 重新配置会停止监听线程，队列中的记录先写完
+        log.configure_logging()
+    entry = json.loads(stream.getvalue().splitlines()[-1])
+    assert entry["msg"] == "Book created"
+    assert entry["logger"] == "booknest.tests"
+    assert entry["book_id"] == 7
+    assert entry["request_id"] == "req-123"
@@ -0,0 +1,28 @@
+from app import create_app
+from config import Config
+from models import Book
+from utils.database import db
+
+
+def test_metrics_endpoint_is_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "")
+    client = create_app().test_client()
+    assert client.get("/api/metrics").status_code == 404
+
+
+def test_metrics_endpoint_requires_the_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape-secret")
+    client = create_app().test_client()
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert b"booknest_" in response.data
+
+
+def test_registered_statements_are_timed_per_name():
+    assert db.statement("book.find_by_id", Book.SQL_FIND_BY_ID.sql) is Book.SQL_FIND_BY_ID
+    calls = Book.SQL_FIND_BY_ID.stats()["calls"]
+    db.execute_query(Book.SQL_FIND_BY_ID, (1,))
+    stats = {row["name"]: row for row in db.statement_stats()}
+    assert stats[Book.SQL_FIND_BY_ID.name]["calls"] == calls + 1
@@ -0,0 +1,41 @@
+import threading
+
+from werkzeug.security import generate_password_hash
+
+from utils import passwords
+
+
+def test_method_without_parameters_does_not_force_rehash():
+    for method in ("scrypt", "pbkdf2:sha256"):
+        pwhash = passwords.hash_password("secret", method=method)
+        assert not passwords.needs_rehash(pwhash, method=method)
+
+
+def test_other_method_or_legacy_hash_needs_rehash():
+    pwhash = passwords.hash_password("secret", method="pbkdf2:sha256:1000")
+    assert passwords.needs_rehash(pwhash, method="scrypt")
+    assert passwords.needs_rehash("$pbkdf2-sha256$1000$c2FsdA$Y2hlY2s", method="scrypt")
+
+
+def test_rehash_is_saved_off_the_calling_thread():
+    started, release, saved = threading.Event(), threading.Event(), []
+
+    def on_done(new_hash):
+        started.set()
+        release.wait(5)
+        saved.append((threading.current_thread().name, new_hash))
+
+    passwords.rehash_in_background("secret", on_done)
+    # 写库被阻塞时调用方已经返回
+    assert started.wait(5)
+    assert not saved
+    release.set()
+    passwords._get_writer().submit(lambda: None).result(5)
+    (thread_name, new_hash), = saved
+    assert thread_name.startswith("password-rehash")
+    assert passwords.verify_password(new_hash, "secret")
+
+
+def test_default_policy_keeps_existing_werkzeug_hashes():
+    # 现有账户由 werkzeug 默认方法生成，不应在每次登录时被改写
+    assert not passwords.needs_rehash(generate_password_hash("secret"))
@@ -0,0 +1,42 @@
+import pytest
+
+from utils.pool import ConnectionPool, PoolTimeout
+
+
+class _Connection:
+    def __init__(self):
+        self.open = True
+
+    def close(self):
+        self.open = False
+
+    def ping(self, reconnect=False):
+        pass
+
+
+def test_released_connections_are_reused():
+    pool = ConnectionPool(_Connection, max_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    assert pool.stats()["created"] == 1
+
+
+def test_checkout_is_bounded_by_max_size():
+    pool = ConnectionPool(_Connection, max_size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_closed_connections_are_replaced():
+    pool = ConnectionPool(_Connection, max_size=1)
+    broken = pool.acquire()
+    broken.close()
+    pool.release(broken)
+    fresh = pool.acquire()
+    assert fresh is not broken and fresh.open
+    assert pool.stats()["discarded"] == 1
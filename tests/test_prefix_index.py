@@ -0,0 +1,38 @@
+import threading
+
+from utils.prefix_index import PrefixIndex
+
+
+def _keys(doc):
+    return [("username", doc["username"])]
+
+
+def test_prefix_matches_characters_above_bmp():
+    index = PrefixIndex()
+    index.rebuild([{"id": 1, "username": "ab\U0001f600"}, {"id": 2, "username": "abc"},
+                   {"id": 3, "username": "b"}], _keys)
+    assert sorted(doc["id"] for doc in index.search("ab")) == [1, 2]
+    assert [doc["id"] for doc in index.search("ab\U0001f600")] == [1]
+
+
+def test_background_rebuild_is_single_flight():
+    index = PrefixIndex()
+    index.rebuild([{"id": 1, "username": "old"}], _keys)
+    release, calls = threading.Event(), []
+
+    def build():
+        calls.append(1)
+        release.wait(5)
+        index.rebuild([{"id": 2, "username": "new"}], _keys)
+
+    assert index.rebuild_in_background(build)
+    assert not index.rebuild_in_background(build)
+    # 重建期间继续用旧索引作答
+    assert [doc["id"] for doc in index.search("old")] == [1]
+    release.set()
+    for _ in range(500):
+        if index.search("new"):
+            break
+        threading.Event().wait(0.01)
+    assert [doc["id"] for doc in index.search("new")] == [2]
+    assert calls == [1]
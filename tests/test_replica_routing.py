@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from utils import backends
+from utils.async_database import AsyncDatabase
+from utils.database import Database, db
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """A Database on the test primary with one read-only snapshot replica"""
+    assert db.execute_query("SELECT id FROM books WHERE id = 1")
+    replica_path = str(tmp_path / "replica.sqlite3")
+    source, target = sqlite3.connect(db.backend.path), sqlite3.connect(replica_path)
+    source.backup(target)
+    target.close()
+    source.close()
+    database = Database(backends.create("sqlite"),
+                        replicas=[backends.from_dsn(f"sqlite:///{replica_path}", read_only=True)])
+    database.replica_path = replica_path
+    return database
+
+
+def test_reads_go_to_replica(routed):
+    assert routed.execute_query("SELECT id FROM books WHERE id = 1") == [{"id": 1}]
+    assert routed.replica_stats()["replica1"]["checkouts"] >= 1
+
+
+def test_sql_error_leaves_replica_healthy(routed):
+    assert routed.execute_query("SELECT no_such_column FROM books") is None
+    stats = routed.replica_stats()["replica1"]
+    assert stats["healthy"] == 1
+    assert stats["failures"] == 0
+    assert routed.execute_query("SELECT id FROM books WHERE id = 1") == [{"id": 1}]
+
+
+def test_lost_connection_fails_over_to_primary(routed):
+    routed.execute_query("SELECT 1 AS one")
+    replica = routed.replicas[0]
+    os.rename(routed.replica_path, routed.replica_path + ".down")
+    replica.pool.reset()
+    assert routed.execute_query("SELECT id FROM books WHERE id = 1") == [{"id": 1}]
+    assert replica.stats()["healthy"] == 0
+
+
+def test_async_reads_go_to_replica(routed):
+    adb = AsyncDatabase(routed)
+
+    async def read():
+        await adb.start()
+        try:
+            return await adb.execute_query("SELECT id FROM books WHERE id = 1")
+        finally:
+            await adb.close()
+
+    assert asyncio.run(read()) == [{"id": 1}]
+    assert routed.replica_stats()["replica1"]["checkouts"] >= 1
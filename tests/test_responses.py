@@ -0,0 +1,25 @@
+import decimal
+import gzip
+import json
+
+from app import create_app
+from config import Config
+
+
+def test_decimal_prices_are_encoded_as_numbers():
+    app = create_app()
+    encoded = app.json.dumps({"price": decimal.Decimal("12.50")})
+    assert json.loads(encoded) == {"price": 12.5}
+
+
+def test_large_json_responses_are_gzipped(monkeypatch):
+    monkeypatch.setattr(Config, "COMPRESS_MIN_SIZE", 10)
+    client = create_app().test_client()
+    response = client.get("/api/books", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.data))["success"] is True
+
+    plain = client.get("/api/books")
+    assert "Content-Encoding" not in plain.headers
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# 数据库路径不可打开：导入或构建应用时只要连一次库就会报错
+_SCRIPT = """
+import app, asgi
+flask_app = app.create_app()
+assert asgi._app is None
+print("built", len(list(flask_app.url_map.iter_rules())))
+"""
+
+
+def test_importing_and_building_the_app_needs_no_database(tmp_path):
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "missing" / "db.sqlite3"),
+               METRICS_TOKEN="", LOG_LEVEL="INFO")
+    result = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "built" in result.stdout
+    assert "Database connection failed" not in result.stdout + result.stderr
+    assert not (tmp_path / "missing").exists()
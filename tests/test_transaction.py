@@ -0,0 +1,28 @@
+import pytest
+
+from models import Book
+from utils.database import db
+
+
+def _titles(prefix):
+    rows = db.execute_query("SELECT title FROM books WHERE title LIKE %s ORDER BY title", (prefix + "%",))
+    return [row["title"] for row in rows]
+
+
+def test_exception_rolls_back_the_whole_block():
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            Book.create("tx-rollback-1", "A", "d", 1)
+            Book.create("tx-rollback-2", "A", "d", 1)
+            raise RuntimeError("abort")
+    assert _titles("tx-rollback-") == []
+
+
+def test_nested_block_rolls_back_to_its_savepoint():
+    with db.transaction():
+        Book.create("tx-nested-outer", "A", "d", 1)
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                Book.create("tx-nested-inner", "A", "d", 1)
+                raise RuntimeError("abort inner")
+    assert _titles("tx-nested-") == ["tx-nested-outer"]
@@ -0,0 +1,257 @@
+# ASGI adapter: native async handlers for selected routes, the Flask (WSGI) app for the rest
+#
+# An async handler runs inside a real Flask request context, so before/after_request
+# hooks (request ids, metrics, CORS, compression), error handlers and flask.request
+# behave exactly as on the WSGI path; only the handler body awaits its I/O. Every
+# request without an async handler is passed to the Flask app on a worker thread.
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from config import Config
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+_END = object()
+
+
+class AsyncRoutes:
+    """A set of async view functions, declared like Blueprint.route"""
+
+    def __init__(self):
+        self.rules = []
+        self.views = {}
+
+    def route(self, rule, methods=("GET",)):
+        def decorator(view):
+            endpoint = view.__name__
+            if endpoint in self.views:
+                raise ValueError(f"Async endpoint {endpoint!r} registered twice")
+            self.rules.append(Rule(rule, endpoint=endpoint, methods=list(methods)))
+            self.views[endpoint] = view
+            return view
+        return decorator
+
+
+def _environ(scope):
+    """WSGI environ for an ASGI http scope (PEP 3333 encoding rules), without wsgi.input"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", ()):
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-length":
+            environ["CONTENT_LENGTH"] = value
+            continue
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+            continue
+        key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class _ReceiveStream(io.RawIOBase):
+    """
+    wsgi.input for a request handed to Flask on a worker thread: each read pulls the
+    next ASGI http.request message from the event loop, so a streamed upload (e.g.
+    POST /api/books/bulk) is processed while it arrives instead of being buffered.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = b""
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._more = False
+                break
+            self._chunk = message.get("body", b"")
+            self._more = message.get("more_body", False)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _header_list(headers):
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+
+class ASGIApp:
+    """
+    ASGI application wrapping a Flask app. ``routes`` are served by their async
+    handlers; ``database`` (utils.async_database.AsyncDatabase) is started and
+    closed with the ASGI lifespan, and ``startup`` (a blocking callable) runs on
+    the WSGI thread pool at lifespan startup.
+    """
+
+    def __init__(self, app, routes, database=None, startup=None):
+        self.app = app
+        self.views = dict(routes.views)
+        self.url_map = Map([rule.empty() for rule in routes.rules])
+        self.database = database
+        self.startup = startup
+        # 未改写为异步的路由：整个请求（含流式响应的迭代）在同一个线程中完成
+        self.executor = ThreadPoolExecutor(max_workers=Config.ASGI_WSGI_THREADS, thread_name_prefix="asgi-wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        environ = _environ(scope)
+        try:
+            endpoint, args = self.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 未匹配（含同一路径的其他方法，如 POST /api/books、OPTIONS 预检）交给 Flask
+            endpoint = None
+        if endpoint is None:
+            # 交给 Flask 的请求边读边处理（批量导入不会整体读入内存）
+            environ["wsgi.input"] = io.BufferedReader(_ReceiveStream(receive, asyncio.get_running_loop()))
+            if "CONTENT_LENGTH" not in environ:
+                # 分块上传：没有长度，读到最后一条消息为止
+                environ["wsgi.input_terminated"] = True
+            await self._call_wsgi(environ, send)
+        else:
+            # 异步处理函数的请求体（JSON）较小，整体读入后再分发
+            body = await _read_body(receive)
+            environ["wsgi.input"] = io.BytesIO(body)
+            environ["CONTENT_LENGTH"] = str(len(body))
+            await self._call_async(self.views[endpoint], args, environ, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    if self.database is not None:
+                        await self.database.start()
+                    if self.startup is not None:
+                        await asyncio.get_running_loop().run_in_executor(self.executor, self.startup)
+                except Exception as e:
+                    logger.exception("ASGI startup failed: %s", e)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.database is not None:
+                    await self.database.close()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _call_async(self, view, args, environ, send):
+        app = self.app
+        # Flask 的请求上下文基于 contextvars，每个 ASGI 请求（asyncio 任务）各自独立
+        with app.request_context(environ):
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(**args)
+                response = app.make_response(rv)
+            except Exception as e:
+                response = self._handle_exception(e)
+            response = app.process_response(response)
+            body = b"" if environ["REQUEST_METHOD"] == "HEAD" else response.get_data()
+            status, headers = response.status_code, response.headers.to_wsgi_list()
+        await send({"type": "http.response.start", "status": status, "headers": _header_list(headers)})
+        await send({"type": "http.response.body", "body": body})
+
+    def _handle_exception(self, e):
+        try:
+            return self.app.make_response(self.app.handle_user_exception(e))
+        except Exception as unhandled:
+            return self.app.make_response(self.app.handle_exception(unhandled))
+
+    async def _call_wsgi(self, environ, send):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=8)
+
+        def put(item):
+            # 有界队列：客户端读得慢时 WSGI 线程在这里等待（背压）
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                started[:] = [int(status.split(" ", 1)[0]), headers]
+
+            try:
+                # Flask（werkzeug Response）在返回可迭代对象之前就已调用 start_response
+                iterable = self.app(environ, start_response)
+                try:
+                    put(("start", *started))
+                    for chunk in iterable:
+                        if chunk:
+                            put(("body", chunk))
+                finally:
+                    if hasattr(iterable, "close"):
+                        iterable.close()
+            except BaseException as e:
+                put(("error", e))
+            finally:
+                put(_END)
+
+        future = loop.run_in_executor(self.executor, run)
+        response_started = False
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if item[0] == "start":
+                await send({"type": "http.response.start", "status": item[1], "headers": _header_list(item[2])})
+                response_started = True
+            elif item[0] == "body":
+                await send({"type": "http.response.body", "body": item[1], "more_body": True})
+            elif item[0] == "error":
+                logger.error("WSGI application failed", exc_info=item[1])
+                if not response_started:
+                    await send({"type": "http.response.start", "status": 500,
+                                "headers": [(b"content-type", b"text/plain")]})
+                    response_started = True
+        await future
+        await send({"type": "http.response.body", "body": b""})
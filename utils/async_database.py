@@ -0,0 +1,377 @@
+# Asyncio database access for the ASGI serving mode (asgi.py)
+#
+# Two drivers behind one interface:
+#   aiomysql  native asyncio MySQL protocol: one event loop keeps many queries in flight
+#   threaded  a utils.backends connection (SQLite, or PyMySQL when aiomysql is not
+#             installed) pinned to its own thread, so a query never blocks the event loop
+# Statements, metrics and the slow-query log are shared with the synchronous utils.database.
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from config import Config
+from utils import metrics
+from utils.database import Statement, _sql_of, db
+from utils.log import get_logger
+
+try:
+    import aiomysql
+    from pymysql.constants import CLIENT
+except ImportError:  # aiomysql 是可选依赖，未安装时 MySQL 也走 threaded 驱动
+    aiomysql = None
+
+logger = get_logger(__name__)
+
+DRIVERS = ("auto", "aiomysql", "threaded")
+
+# _read_replica 的返回值：没有可用副本（或副本连接已断开），改读主库
+_NO_REPLICA = object()
+
+
+# -------------------------
+# aiomysql
+# -------------------------
+class _AioMySQLConnection:
+    def __init__(self, raw):
+        self.raw = raw
+
+    @property
+    def open(self):
+        return not self.raw.closed
+
+    async def execute(self, sql, params, fetch):
+        async with self.raw.cursor() as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall() if fetch else None
+            return rows, cursor.rowcount, cursor.lastrowid
+
+    async def begin(self):
+        await self.raw.begin()
+
+    async def commit(self):
+        await self.raw.commit()
+
+    async def rollback(self):
+        await self.raw.rollback()
+
+
+class _AioMySQLPool:
+    def __init__(self, backend):
+        self.backend = backend
+        self._pool = None
+
+    async def open(self):
+        self._pool = await aiomysql.create_pool(
+            host=self.backend.host,
+            port=self.backend.port,
+            user=self.backend.user,
+            password=self.backend.password,
+            db=self.backend.database,
+            charset='utf8mb4',
+            cursorclass=aiomysql.DictCursor,
+            autocommit=True,
+            # 影响行数按匹配行计算，见 MySQLBackend.connect
+            client_flag=CLIENT.FOUND_ROWS,
+            minsize=Config.ASYNC_DB_POOL_MIN_SIZE,
+            maxsize=Config.ASYNC_DB_POOL_MAX_SIZE,
+            # 空闲超过该时间的连接在下次借出前重连，避免被服务器 wait_timeout 断开
+            pool_recycle=int(Config.DB_POOL_IDLE_TIMEOUT),
+        )
+
+    async def acquire(self):
+        return _AioMySQLConnection(await self._pool.acquire())
+
+    async def release(self, connection, discard=False):
+        if discard:
+            connection.raw.close()
+        self._pool.release(connection.raw)
+
+    async def close(self):
+        self._pool.close()
+        await self._pool.wait_closed()
+
+    def stats(self):
+        return {"size": self._pool.size, "idle": self._pool.freesize, "max_size": self._pool.maxsize}
+
+
+# -------------------------
+# threaded
+# -------------------------
+class _ThreadedConnection:
+    """A blocking backend connection that is only ever used from its own thread"""
+
+    def __init__(self, executor, raw):
+        self.executor = executor
+        self.raw = raw
+
+    @classmethod
+    async def connect(cls, factory):
+        # SQLite 连接只能在创建它的线程中使用，所以连接也在该线程中建立
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-db")
+        try:
+            raw = await asyncio.get_running_loop().run_in_executor(executor, factory)
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(executor, raw)
+
+    @property
+    def open(self):
+        return self.raw.open
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _execute(self, sql, params, fetch):
+        with self.raw.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if fetch else None
+            return rows, cursor.rowcount, cursor.lastrowid
+
+    async def execute(self, sql, params, fetch):
+        return await self._run(self._execute, sql, params, fetch)
+
+    async def begin(self):
+        await self._run(self.raw.begin)
+
+    async def commit(self):
+        await self._run(self.raw.commit)
+
+    async def rollback(self):
+        await self._run(self.raw.rollback)
+
+    def close(self):
+        self.executor.submit(self.raw.close)
+        self.executor.shutdown(wait=False)
+
+
+class _ThreadedPool:
+    def __init__(self, factory, max_size):
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = []
+        self._size = 0
+        self._slots = None
+
+    async def open(self):
+        # 信号量在事件循环内创建
+        self._slots = asyncio.Semaphore(self.max_size)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            if self._idle:
+                return self._idle.pop()
+            connection = await _ThreadedConnection.connect(self.factory)
+            self._size += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, connection, discard=False):
+        if discard:
+            connection.close()
+            self._size -= 1
+        else:
+            self._idle.append(connection)
+        self._slots.release()
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+            self._size -= 1
+
+    def stats(self):
+        return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+
+# -------------------------
+# AsyncDatabase
+# -------------------------
+class AsyncDatabase:
+    """
+    The async counterpart of utils.database.Database: execute_query / execute_update /
+    transaction() with the same return conventions (None / False when the database is
+    unavailable, exceptions raised inside a transaction). The pool is bound to the event
+    loop it was started on, so start() and close() run in the ASGI lifespan.
+    """
+
+    def __init__(self, database=db):
+        self.sync = database
+        self.pool = None
+        self.driver = None
+        # 当前任务正在进行的事务连接（每个 asyncio 任务各自独立）
+        self._tx = contextvars.ContextVar("async_db_tx", default=None)
+
+    async def start(self):
+        if self.pool is not None:
+            return
+        backend = self.sync.backend
+        driver = Config.ASYNC_DB_DRIVER.lower()
+        if driver == "auto":
+            driver = "aiomysql" if backend.name == "mysql" and aiomysql is not None else "threaded"
+            if backend.name == "mysql" and aiomysql is None:
+                logger.warning("aiomysql is not installed: async MySQL queries fall back to the threaded "
+                               "driver, one blocked thread per connection (pip install -r requirements-asgi.txt)")
+        if driver == "aiomysql":
+            if aiomysql is None:
+                raise RuntimeError("ASYNC_DB_DRIVER=aiomysql requires the 'aiomysql' package")
+            if backend.name != "mysql":
+                raise RuntimeError(f"ASYNC_DB_DRIVER=aiomysql cannot serve DB_BACKEND={backend.name}")
+            pool = _AioMySQLPool(backend)
+        elif driver == "threaded":
+            pool = _ThreadedPool(backend.connect, Config.ASYNC_DB_POOL_MAX_SIZE)
+        else:
+            raise ValueError(f"Unknown ASYNC_DB_DRIVER {driver!r} (expected one of {', '.join(DRIVERS)})")
+        await pool.open()
+        self.pool, self.driver = pool, driver
+        logger.info("Async database pool started", extra={"driver": driver, **backend.describe()})
+
+    async def close(self):
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await pool.close()
+
+    def pool_stats(self):
+        return self.pool.stats() if self.pool is not None else {}
+
+    async def acquire(self):
+        """Check out a pooled connection (None if the database is unreachable)"""
+        if self.pool is None:
+            await self.start()
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(self.pool.acquire(), Config.DB_POOL_TIMEOUT)
+        except Exception as e:
+            logger.warning("Database connection failed: %s", e, extra={"driver": self.driver})
+            return None
+        finally:
+            metrics.db_acquire.observe(time.perf_counter() - started)
+
+    async def release(self, connection):
+        await self.pool.release(connection, discard=not connection.open)
+
+    @asynccontextmanager
+    async def connection(self):
+        """The open transaction's connection, else a pooled one for a single statement"""
+        connection = self._tx.get()
+        if connection is not None:
+            yield connection
+            return
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            if connection:
+                await self.release(connection)
+
+    def in_transaction(self):
+        return self._tx.get() is not None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Run every statement in the block on one connection and commit once; any exception
+        rolls the block back. A nested block joins the outer transaction.
+        """
+        if self._tx.get() is not None:
+            yield self._tx.get()
+            return
+        connection = await self.acquire()
+        if not connection:
+            raise self.sync.backend.OperationalError("Database connection failed")
+        token = self._tx.set(connection)
+        # 读写分离：本请求（及该客户端的后续请求）改读主库，见 Database.execute_query
+        self.sync._wrote()
+        try:
+            await connection.begin()
+            yield connection
+            await connection.commit()
+        except BaseException:
+            try:
+                await connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._tx.reset(token)
+            await self.release(connection)
+
+    def _read_replica(self, statement, query, params):
+        """
+        One read on the sync database's replicas (same rotation and health checks as
+        Database.execute_query), run on a worker thread; _NO_REPLICA when the read
+        has to go to the primary instead.
+        """
+        with self.sync.replica_connection() as (replica, connection):
+            if not connection:
+                return _NO_REPLICA
+            try:
+                return self.sync._fetch(statement, query, params, connection)
+            except Exception as e:
+                if connection.open and not replica.backend.connection_lost(e):
+                    return None
+                self.sync._replica_failed(replica, connection, e)
+                return _NO_REPLICA
+
+    async def execute_query(self, query, params=None):
+        """
+        Execute a SELECT query (SQL text or a registered Statement). Outside a transaction
+        it is routed to a replica exactly like Database.execute_query; replica drivers are
+        synchronous, so that read runs in the default executor.
+        """
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        if not self.in_transaction() and self.sync.reads_from_replicas():
+            rows = await asyncio.get_running_loop().run_in_executor(
+                None, self._read_replica, statement, query, params)
+            if rows is not _NO_REPLICA:
+                return rows
+        async with self.connection() as connection:
+            if not connection:
+                return None
+
+            started = time.perf_counter()
+            try:
+                rows, _, _ = await connection.execute(query, params, fetch=True)
+                rows = list(rows)
+                self.sync._observe(statement, query, started, len(rows))
+                return rows
+            except Exception as e:
+                self.sync._observe(statement, query, started, error=True)
+                logger.error("Query execution failed: %s", e, exc_info=True,
+                             extra={"sql": query, "statement": statement and statement.name})
+                if self.in_transaction():
+                    raise
+                return None
+
+    async def execute_update(self, query, params=None):
+        """Execute an INSERT, UPDATE, or DELETE statement (SQL text or a registered Statement)"""
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        async with self.connection() as connection:
+            if not connection:
+                logger.error("Database connection failed, statement not executed", extra={"sql": query})
+                return False
+
+            self.sync._wrote()
+            started = time.perf_counter()
+            try:
+                _, rowcount, lastrowid = await connection.execute(query, params, fetch=False)
+                self.sync._observe(statement, query, started, max(rowcount, 0))
+                return lastrowid if lastrowid else rowcount
+            except Exception as e:
+                self.sync._observe(statement, query, started, error=True)
+                logger.error("Statement execution failed: %s", e, exc_info=True,
+                             extra={"sql": " ".join(query.split()), "statement": statement and statement.name})
+                if self.in_transaction():
+                    raise
+                return False
+
+
+# Global async database instance (shares the backend and statement registry of utils.database.db)
+adb = AsyncDatabase()
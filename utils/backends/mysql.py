@@ -0,0 +1,82 @@
+# MySQL backend (PyMySQL, pooled connections)
+
+import pymysql
+from pymysql.constants import CLIENT
+
+from config import Config
+from utils.pool import ConnectionPool
+
+
+class MySQLBackend:
+    name = "mysql"
+    supports_fulltext = True
+    explain_prefix = "EXPLAIN "
+    OperationalError = pymysql.err.OperationalError
+    # 连接不可用：2003 无法连接、2006 server has gone away、2013 查询中途断开
+    CONNECTION_LOST_ERRORS = (2003, 2006, 2013)
+
+    def __init__(self, host=None, port=None, user=None, password=None, database=None):
+        # 未指定的部分（如副本 DSN 省略的用户名 / 库名）沿用 MYSQL_* 配置
+        self.host = host or Config.MYSQL_HOST
+        self.port = port or Config.MYSQL_PORT
+        self.user = user or Config.MYSQL_USER
+        self.password = Config.MYSQL_PASSWORD if password is None else password
+        self.database = database or Config.MYSQL_DATABASE
+
+    def describe(self):
+        return {"db_backend": self.name, "db_host": self.host, "db_port": self.port}
+
+    def connect(self):
+        return pymysql.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            # 池化连接使用 autocommit，避免空闲连接持有旧的读视图
+            autocommit=True,
+            # UPDATE 的影响行数按“匹配”而非“实际改变”计算（与 SQLite 一致）：
+            # 条件 UPDATE 以行数判断成败，值恰好不变时也不能当作失败
+            client_flag=CLIENT.FOUND_ROWS,
+        )
+
+    def create_pool(self, factory):
+        # 连接池在首次借出时才建立连接，导入本模块不会产生网络 I/O
+        return ConnectionPool(
+            factory,
+            min_size=Config.DB_POOL_MIN_SIZE,
+            max_size=Config.DB_POOL_MAX_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+            ping_interval=Config.DB_POOL_PING_INTERVAL,
+        )
+
+    def connection_lost(self, error):
+        """Whether error means the server or connection is gone (not an error in the SQL itself)"""
+        if isinstance(error, pymysql.err.InterfaceError):
+            return True
+        return (isinstance(error, pymysql.err.OperationalError) and bool(error.args)
+                and error.args[0] in self.CONNECTION_LOST_ERRORS)
+
+    def stream_cursor(self, connection):
+        """Unbuffered cursor: rows are read from the socket as they are iterated"""
+        return connection.cursor(pymysql.cursors.SSDictCursor)
+
+    def replication_lag(self, connection):
+        """
+        Seconds this server is behind its replication source: None when it is not a
+        replica, inf when replication is stopped. Needs the REPLICATION CLIENT privilege.
+        """
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except pymysql.err.ProgrammingError:
+                # MySQL 8.0.22 之前 / MariaDB 只有旧语法
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+        if not row:
+            return None
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return float("inf") if lag is None else float(lag)
@@ -0,0 +1,361 @@
+# Embedded SQLite backend for local development, CI and small single-host deployments
+#
+# - one connection per thread (utils.pool.ThreadLocalPool), WAL journal so readers
+#   never block the writer
+# - models.py SQL runs unchanged: %s placeholders become ?, CURRENT_TIMESTAMP is local
+#   time as on MySQL, rows come back as dicts,
+#   TIMESTAMP / DECIMAL columns come back as datetime / Decimal like PyMySQL's
+# - the schema is built from the MySQL script (Config.SQLITE_SCHEMA_PATH) on first use
+
+import decimal
+import functools
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from config import Config
+from utils.log import get_logger
+from utils.pool import ThreadLocalPool
+
+logger = get_logger(__name__)
+
+
+# -------------------------
+# Type adapters (module-wide, like the sqlite3 defaults they replace)
+# -------------------------
+def _adapt_datetime(value):
+    # TIMESTAMP 列精度为秒，与 MySQL 的存储结果一致
+    return value.isoformat(" ", timespec="seconds")
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+def _convert_date(value):
+    return date.fromisoformat(value.decode())
+
+
+def _convert_decimal(value):
+    return decimal.Decimal(value.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(decimal.Decimal, str)
+for _name in ("TIMESTAMP", "DATETIME"):
+    sqlite3.register_converter(_name, _convert_timestamp)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+_PLACEHOLDER = re.compile(r"%([s%])")
+_CURRENT_TIMESTAMP = re.compile(r"\bCURRENT_TIMESTAMP\b", re.I)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate_query(query, with_params=True):
+    """
+    MySQL statement text to SQLite: format-style parameters (%s, %%) become qmark
+    style (?, %), and CURRENT_TIMESTAMP becomes local time like the column defaults
+    (SQLite's own CURRENT_TIMESTAMP is UTC).
+    """
+    query = _CURRENT_TIMESTAMP.sub("datetime('now', 'localtime')", query)
+    if not with_params:
+        # 与 PyMySQL 一样：没有参数时不做 % 转义处理
+        return query
+    return _PLACEHOLDER.sub(lambda m: "?" if m.group(1) == "s" else "%", query)
+
+
+def _is_insert(query):
+    head = query.lstrip().split(None, 1)[0].upper() if query.strip() else ""
+    return head in ("INSERT", "REPLACE")
+
+
+# -------------------------
+# DB-API wrappers with PyMySQL's DictCursor behaviour
+# -------------------------
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=None):
+        if params is None:
+            self._cursor.execute(translate_query(query, False))
+        else:
+            self._cursor.execute(translate_query(query), tuple(params))
+        self.rowcount = self._cursor.rowcount
+        # sqlite3 的 lastrowid 对 UPDATE/DELETE 也会返回连接上最后一次插入的 id；
+        # PyMySQL 此时为 0，调用方依赖这一点判断 UPDATE 是否命中
+        self.lastrowid = self._cursor.lastrowid if _is_insert(query) else 0
+        return self.rowcount
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(translate_query(query), [tuple(p) for p in seq_of_params])
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = 0
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, raw):
+        self._conn = raw
+        self.open = True
+
+    def cursor(self, cursorclass=None):
+        # 游标本身就是按需逐行读取的，流式查询无需特殊游标类型
+        return SQLiteCursor(self._conn.cursor())
+
+    def begin(self):
+        # IMMEDIATE：事务开始即取得写锁，避免两个读事务同时升级为写时死锁
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+
+# -------------------------
+# MySQL DDL -> SQLite
+# -------------------------
+_SKIP_STATEMENTS = re.compile(
+    r"^(SET|USE|CREATE\s+DATABASE|DROP\s+TABLE|LOCK\s+TABLES|UNLOCK\s+TABLES|ALTER\s+TABLE"
+    r"|SHOW|DESCRIBE|SELECT)\b", re.I)
+_CREATE_TABLE = re.compile(
+    r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"]?(\w+)[`\"]?\s*\((.*)\)[^()]*$", re.I | re.S)
+_CREATE_INDEX = re.compile(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+(?!IF\s+NOT\s+EXISTS)", re.I)
+_COLUMN_NOISE = re.compile(
+    r"\s+(CHARACTER\s+SET\s+\w+|COLLATE\s+\w+|COMMENT\s+'(?:[^']|'')*'|ON\s+UPDATE\s+CURRENT_TIMESTAMP"
+    r"|USING\s+BTREE)", re.I)
+_KEY_DEF = re.compile(r"^(UNIQUE\s+)?(?:KEY|INDEX)\s+[`\"]?(\w+)[`\"]?\s*\((.*)\)", re.I | re.S)
+
+
+def _split_top_level(text, separator):
+    """Split on separator outside quotes and parentheses"""
+    parts, depth, quote, current = [], 0, None, []
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == separator and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _strip_comments(script):
+    return "\n".join(line for line in script.splitlines() if not line.lstrip().startswith("--"))
+
+
+def _translate_column(definition):
+    definition = _COLUMN_NOISE.sub("", definition)
+    name = definition.split(None, 1)[0]
+    if re.search(r"\bAUTO_INCREMENT\b", definition, re.I):
+        return f"{name} INTEGER PRIMARY KEY AUTOINCREMENT", name.strip("`\"")
+    definition = re.sub(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", "DEFAULT (datetime('now', 'localtime'))",
+                        definition, flags=re.I)
+    enum = re.search(r"\bENUM\s*\(([^)]*)\)", definition, re.I)
+    if enum:
+        definition = definition.replace(enum.group(0), "TEXT") + f" CHECK ({name} IN ({enum.group(1)}))"
+    if re.search(r"\b(VARCHAR|CHAR|TEXT)\b", definition, re.I):
+        # MySQL 的 *_ci 排序规则不区分大小写（如按邮箱查找用户）
+        definition += " COLLATE NOCASE"
+    return definition, None
+
+
+def _translate_create_table(table, body):
+    columns, constraints, indexes, primary = [], [], [], None
+    for definition in _split_top_level(body, ","):
+        head = definition.split(None, 1)[0].upper()
+        if head in ("FULLTEXT", "SPATIAL"):
+            continue
+        if head == "PRIMARY":
+            constraints.append(_COLUMN_NOISE.sub("", definition))
+            continue
+        if head in ("CONSTRAINT", "FOREIGN", "CHECK"):
+            constraints.append(definition)
+            continue
+        key = _KEY_DEF.match(definition)
+        if key:
+            unique, name, cols = key.group(1), key.group(2), re.sub(r"\(\d+\)", "", key.group(3))
+            if unique:
+                constraints.append(f"UNIQUE ({cols})")
+            else:
+                # SQLite 的索引名在整个库内唯一，加表名前缀
+                indexes.append(f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({cols})")
+            continue
+        if head == "UNIQUE":
+            constraints.append(definition)
+            continue
+        column, pk = _translate_column(definition)
+        primary = pk or primary
+        columns.append(column)
+    if primary:
+        constraints = [c for c in constraints
+                       if not re.fullmatch(rf"PRIMARY\s+KEY\s*\(\s*[`\"]?{primary}[`\"]?\s*\)", c, re.I)]
+    ddl = f"CREATE TABLE IF NOT EXISTS {table} (\n  " + ",\n  ".join(columns + constraints) + "\n)"
+    return [ddl] + indexes
+
+
+def mysql_schema_to_sqlite(script):
+    """
+    Translate a MySQL schema/seed script (db/seed_current_schema.sql, create_database.sql)
+    into idempotent SQLite statements: AUTO_INCREMENT, ENUM, table options, FULLTEXT and
+    secondary KEYs are rewritten or dropped, DROP TABLE is never emitted, and seed rows
+    are inserted with INSERT OR IGNORE.
+    """
+    statements = []
+    for statement in _split_top_level(_strip_comments(script), ";"):
+        if _SKIP_STATEMENTS.match(statement):
+            continue
+        create = _CREATE_TABLE.match(statement)
+        if create:
+            statements.extend(_translate_create_table(create.group(1), create.group(2)))
+        elif re.match(r"^INSERT\s+INTO\b", statement, re.I):
+            statements.append(re.sub(r"^INSERT\s+INTO\b", "INSERT OR IGNORE INTO", statement, flags=re.I))
+        elif _CREATE_INDEX.match(statement):
+            statement = _COLUMN_NOISE.sub("", statement)
+            statements.append(re.sub(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+", r"CREATE \1INDEX IF NOT EXISTS ",
+                                     statement, flags=re.I))
+        elif re.match(r"^CREATE\s+FULLTEXT\b", statement, re.I):
+            continue
+        else:
+            statements.append(statement)
+    return statements
+
+
+# -------------------------
+# Backend
+# -------------------------
+class SQLiteBackend:
+    name = "sqlite"
+    # 没有 MATCH ... AGAINST，Book.search 直接走 LIKE
+    supports_fulltext = False
+    explain_prefix = "EXPLAIN QUERY PLAN "
+    OperationalError = sqlite3.OperationalError
+    # 库文件不可用：无法打开、I/O 错误、损坏或不是数据库文件（扩展错误码取低 8 位）
+    CONNECTION_LOST_ERRORS = (sqlite3.SQLITE_CANTOPEN, sqlite3.SQLITE_IOERR,
+                              sqlite3.SQLITE_CORRUPT, sqlite3.SQLITE_NOTADB)
+
+    def __init__(self, path=None, schema_path=None, read_only=False):
+        self.path = path or Config.SQLITE_PATH
+        self.schema_path = Config.SQLITE_SCHEMA_PATH if schema_path is None else schema_path
+        self.busy_timeout = Config.SQLITE_BUSY_TIMEOUT
+        # 只读（副本）：文件不存在时连接失败，而不是新建一个空库
+        self.read_only = read_only
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def describe(self):
+        return {"db_backend": self.name, "db_path": self.path}
+
+    def connect(self):
+        if self.read_only:
+            target, uri = Path(self.path).absolute().as_uri() + "?mode=ro", True
+        else:
+            target, uri = self.path, False
+        raw = sqlite3.connect(target, uri=uri, timeout=self.busy_timeout,
+                              detect_types=sqlite3.PARSE_DECLTYPES,
+                              cached_statements=Config.SQLITE_CACHED_STATEMENTS,
+                              isolation_level=None)  # autocommit，事务由 begin()/commit() 显式控制
+        raw.row_factory = _dict_row
+        if not self.read_only:
+            raw.execute("PRAGMA journal_mode=WAL")
+            raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        raw.create_function("NOW", 0, lambda: _adapt_datetime(datetime.now()))
+        if not self._schema_ready:
+            self._ensure_schema(raw)
+        return SQLiteConnection(raw)
+
+    def _ensure_schema(self, raw):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            exists = raw.execute(
+                "SELECT 1 AS found FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+            if not exists and self.schema_path:
+                with open(self.schema_path, encoding="utf-8") as f:
+                    statements = mysql_schema_to_sqlite(f.read())
+                # 多个进程同时启动时，IMMEDIATE 事务 + IF NOT EXISTS / OR IGNORE 保证只建一次
+                raw.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in statements:
+                        raw.execute(statement)
+                    raw.execute("COMMIT")
+                except Exception:
+                    raw.execute("ROLLBACK")
+                    raise
+                logger.info("SQLite schema created", extra={"db_path": self.path, "schema": self.schema_path})
+            self._schema_ready = True
+
+    def create_pool(self, factory):
+        return ThreadLocalPool(factory)
+
+    def replication_lag(self, connection):
+        """SQLite has no replication: a reachable file is never behind"""
+        connection.ping()
+        return None
+
+    def connection_lost(self, error):
+        """Whether error means the database file is unusable (not an error in the SQL itself)"""
+        if isinstance(error, sqlite3.ProgrammingError):  # 连接已关闭
+            return True
+        code = getattr(error, "sqlite_errorcode", None)
+        return code is not None and code & 0xFF in self.CONNECTION_LOST_ERRORS
+
+    def stream_cursor(self, connection):
+        return connection.cursor()
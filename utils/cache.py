@@ -0,0 +1,202 @@
+# Read-through cache backends (in-process LRU and Redis-compatible)
+
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+
+class MemoryCache:
+    """Thread-safe, size-bounded LRU cache with per-entry TTL"""
+
+    blocking = False  # 纯内存操作，可在事件循环中直接调用
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None when missing/expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Backend for any client exposing the redis-py ``get`` / ``set(ex=)`` / ``delete`` calls.
+    Values are pickled; eviction is left to the server's maxmemory policy.
+    """
+
+    blocking = True  # 每次调用都是一次网络往返：异步代码经线程池调用（见 ReadThroughCache._offload）
+
+    def __init__(self, client, ttl=60.0, prefix="booknest:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+        return 0
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class ReadThroughCache:
+    """
+    Namespaced read-through cache with hit/miss counters.
+    Backend errors are swallowed so a cache outage only costs a database query.
+    """
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0,
+                          "evictions": 0, "errors": 0}
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() and caching its result on a miss"""
+        value = self._lookup(key)
+        if value is not None:
+            return value
+        return self._store(key, loader())
+
+    async def _offload(self, fn, *args):
+        """Call fn from async code: on the default executor when the backend does network I/O"""
+        if not self.backend.blocking:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def get_or_load_async(self, key, loader):
+        """get_or_load for the ASGI serving mode: loader is a coroutine function"""
+        value = await self._offload(self._lookup, key)
+        if value is not None:
+            return value
+        return await self._offload(self._store, key, await loader())
+
+    async def get_many_async(self, keys):
+        return await self._offload(self.get_many, keys)
+
+    async def set_many_async(self, items):
+        await self._offload(self.set_many, items)
+
+    async def invalidate_async(self, key):
+        await self._offload(self.invalidate, key)
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached (misses are left out)"""
+        found = {}
+        for key in keys:
+            value = self._lookup(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items):
+        for key, value in items.items():
+            self._store(key, value)
+
+    def _lookup(self, key):
+        try:
+            value = self.backend.get(self._key(key))
+        except Exception:
+            self._count("errors")
+            value = None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def _store(self, key, value):
+        if value is not None:
+            try:
+                self._count("evictions", self.backend.set(self._key(key), value) or 0)
+                self._count("sets")
+            except Exception:
+                self._count("errors")
+        return value
+
+    def invalidate(self, key):
+        try:
+            self.backend.delete(self._key(key))
+            self._count("invalidations")
+        except Exception:
+            self._count("errors")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def create_backend(ttl=None, max_size=None):
+    """Build the backend selected by Config.CACHE_BACKEND ("memory" or "redis")"""
+    ttl = Config.CACHE_TTL if ttl is None else ttl
+    max_size = Config.CACHE_MAX_SIZE if max_size is None else max_size
+    if Config.CACHE_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        return RedisCache(redis.Redis.from_url(Config.CACHE_REDIS_URL), ttl=ttl)
+    return MemoryCache(max_size=max_size, ttl=ttl)
@@ -1,89 +1,673 @@
-# MySQL Database Connection Utility
+# Database Connection Utility (MySQL, or embedded SQLite via DB_BACKEND)
 
-import pymysql
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, current_app, request
 from config import Config
+from utils import backends, metrics
+from utils.pool import PoolTimeout
+from utils.log import get_logger
 
-class Database:
+logger = get_logger(__name__)
+slow_query_logger = get_logger("slow_query")
+
+
+# -------------------------
+# Statement registry
+# -------------------------
+class Statement:
+    """
+    A model query declared once under a stable name (e.g. "book.find_by_id").
+    Pass it to execute_query/execute_update in place of the SQL string; every
+    execution is counted and timed under that name.
+    """
+
+    __slots__ = ("name", "sql", "calls", "errors", "rows", "total_time", "max_time", "_lock")
+
+    def __init__(self, name, sql):
+        self.name = name
+        # 折叠空白：日志里是一行，同一语句的文本也总是完全相同
+        self.sql = " ".join(sql.split())
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f"<Statement {self.name}>"
+
+    def record(self, elapsed, rows=0, error=False):
+        with self._lock:
+            self.calls += 1
+            self.rows += rows
+            self.total_time += elapsed
+            if elapsed > self.max_time:
+                self.max_time = elapsed
+            if error:
+                self.errors += 1
+
+    def reset(self):
+        self.calls = self.errors = self.rows = 0
+        self.total_time = self.max_time = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "rows": self.rows,
+                "total_ms": round(self.total_time * 1000, 3),
+                "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+                "max_ms": round(self.max_time * 1000, 3),
+                "sql": self.sql,
+            }
+
+
+class StatementRegistry:
     def __init__(self):
-        self.host = Config.MYSQL_HOST
-        self.port = Config.MYSQL_PORT
-        self.user = Config.MYSQL_USER
-        self.password = Config.MYSQL_PASSWORD
-        self.database = Config.MYSQL_DATABASE
-        
-    def get_connection(self):
-        """Establish and return a database connection"""
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, sql):
+        """Declare a statement; re-registering the same name and SQL returns the existing one"""
+        statement = Statement(name, sql)
+        with self._lock:
+            existing = self._statements.get(name)
+            if existing is None:
+                self._statements[name] = statement
+                return statement
+        if existing.sql != statement.sql:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        return existing
+
+    def get(self, name):
+        return self._statements[name]
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._statements.values()))
+
+    def stats(self):
+        """Per-statement counters, most total time first"""
+        return sorted((s.stats() for s in self), key=lambda row: row["total_ms"], reverse=True)
+
+    def reset(self):
+        for statement in self:
+            with statement._lock:
+                statement.reset()
+
+
+def _sql_of(query):
+    return query.sql if isinstance(query, Statement) else query
+
+
+# -------------------------
+# Read replicas
+# -------------------------
+class Replica:
+    """
+    A read replica with its own pool. It leaves the rotation when a connection or a
+    health check fails, or when it is more than DB_REPLICA_MAX_LAG seconds behind,
+    and is probed again every DB_REPLICA_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, name, backend):
+        self.name = name
+        self.backend = backend
+        self.pool = backend.create_pool(self.connect)
+        self.healthy = True
+        self.lag = None
+        self.checkouts = 0
+        self.failures = 0
+        self._next_check = 0.0  # 首次使用前先检查一次
+        self._lock = threading.Lock()
+
+    def connect(self):
         try:
-            connection = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            return connection
+            return self.backend.connect()
         except Exception as e:
-            print(f"Database connection failed: {e}")
+            logger.warning("Replica connection failed: %s", e, extra={"replica": self.name, **self.backend.describe()})
             return None
-    
-    def execute_query(self, query, params=None):
-        """Execute a SELECT query"""
-        connection = self.get_connection()
+
+    def check_due(self, now):
+        """Claim the next health check: True for one caller per interval"""
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + Config.DB_REPLICA_CHECK_INTERVAL
+            return True
+
+    def check(self):
+        """Probe the replica (and its replication lag); returns whether it is in rotation"""
+        connection = self.acquire()
         if not connection:
+            return self.healthy
+        try:
+            if Config.DB_REPLICA_MAX_LAG > 0:
+                lag = self.backend.replication_lag(connection)
+            else:
+                connection.ping()
+                lag = None
+        except Exception as e:
+            self.release(connection, discard=True)
+            self.mark_down(f"health check failed: {e}")
+            return False
+        self.release(connection)
+        self.lag = lag
+        if lag is not None and lag > Config.DB_REPLICA_MAX_LAG:
+            self.mark_down("replication stopped" if math.isinf(lag) else f"replication lag {lag:.0f}s")
+            return False
+        self.mark_up()
+        return True
+
+    def acquire(self):
+        """A pooled connection, or None (a failed connect also takes the replica out of rotation)"""
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout:
+            # 副本繁忙不代表不可用：本次读回落主库，不影响健康状态
             return None
-            
+        if connection is None:
+            self.mark_down("connection failed")
+            return None
+        with self._lock:
+            self.checkouts += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        self.pool.release(connection, discard=discard or not connection.open)
+
+    def mark_down(self, reason):
+        with self._lock:
+            was_healthy, self.healthy = self.healthy, False
+            self.failures += 1
+            self._next_check = time.monotonic() + Config.DB_REPLICA_CHECK_INTERVAL
+        if was_healthy:
+            logger.warning("Replica out of rotation: %s", reason, extra={"replica": self.name, **self.backend.describe()})
+
+    def mark_up(self):
+        with self._lock:
+            was_healthy, self.healthy = self.healthy, True
+        if not was_healthy:
+            logger.info("Replica back in rotation", extra={"replica": self.name, **self.backend.describe()})
+
+    def stats(self):
+        with self._lock:
+            stats = {"healthy": int(self.healthy), "checkouts": self.checkouts, "failures": self.failures}
+        if self.lag is not None and not math.isinf(self.lag):
+            stats["lag_seconds"] = self.lag
+        return stats
+
+
+class Database:
+    def __init__(self, backend=None, replicas=None):
+        # 驱动：连接方式、连接池类型、支持的 SQL 特性（见 utils/backends）
+        self.backend = backend or backends.create()
+        self.pool = self.backend.create_pool(self.get_connection)
+        # 只读副本（Config.DB_REPLICA_DSNS）：事务外的读轮询分发，全部不可用时回落主库
+        if replicas is None:
+            replicas = [backends.from_dsn(dsn, read_only=True) for dsn in Config.DB_REPLICA_DSNS]
+        self.replicas = [Replica(f"replica{i}", backend) for i, backend in enumerate(replicas, 1)]
+        self._round_robin = itertools.count()
+        # models.py 中登记的语句（名称 -> Statement）
+        self.statements = StatementRegistry()
+        # 慢查询 EXPLAIN 的限频：语句名 -> 上次 EXPLAIN 的时间
+        self._explained = {}
+        # 当前线程正在进行的事务：{"connection": ..., "depth": ..., "after_commit": [...]}
+        self._local = threading.local()
+
+    def init_app(self, app):
+        """Bind one pooled connection per request (released on app-context teardown)"""
+        app.extensions["booknest_db"] = self
+        app.teardown_appcontext(self._teardown_request_connection)
+        app.after_request(self._pin_client_to_primary)
+
+    def get_connection(self):
+        """Establish and return a new (unpooled) database connection"""
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(query, params)
-                result = cursor.fetchall()
-                return result
+            return self.backend.connect()
         except Exception as e:
-            print(f"Query execution failed: {e}")
+            logger.error("Database connection failed: %s", e, extra=self.backend.describe())
+            return None
+
+    def acquire(self):
+        """Check out a pooled connection (None if the database is unreachable)"""
+        started = time.perf_counter()
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as e:
+            logger.warning("Database connection failed: %s", e)
             return None
         finally:
-            connection.close()
-    
-    def execute_update(self, query, params=None):
-        """Execute an INSERT, UPDATE, or DELETE statement"""
-        print(f"\n--- Database.execute_update 调试日志 ---")
-        print(f"连接参数: host={self.host}, port={self.port}, user={self.user}, database={self.database}")
-        
-        connection = self.get_connection()
-        if not connection:
-            print("❌ 数据库连接失败")
+            metrics.db_acquire.observe(time.perf_counter() - started)
+
+    def release(self, connection):
+        """Return a pooled connection, discarding it if it has been closed"""
+        self.pool.release(connection, discard=not connection.open)
+
+    def warm(self):
+        """
+        Connect ahead of the first request (gunicorn post_fork): opens the pool's
+        min_size connections, at least one, and health-checks every replica.
+        Returns False if the primary is unreachable.
+        """
+        self.pool.warm()
+        connection = self.acquire()
+        if connection is None:
             return False
-        
-        print("✅ 数据库连接成功")
-        print(f"执行的SQL: {query}")
-        print(f"SQL参数: {params}")
-        print(f"参数类型: {[type(p) for p in params] if params else 'None'}")
-            
+        self.release(connection)
+        now = time.monotonic()
+        for replica in self.replicas:
+            if replica.check_due(now):
+                replica.check()
+        return True
+
+    def close(self):
+        """Close the idle pooled connections, primary and replicas (process shutdown)"""
+        self.pool.close()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    @property
+    def supports_fulltext(self):
+        return self.backend.supports_fulltext
+
+    def pool_stats(self):
+        """Connection pool usage counters"""
+        return self.pool.stats()
+
+    def replica_stats(self):
+        """Per-replica health and usage counters"""
+        return {replica.name: replica.stats() for replica in self.replicas}
+
+    def statement(self, name, sql):
+        """Register (or look up) a named statement, see Statement"""
+        return self.statements.register(name, sql)
+
+    def statement_stats(self):
+        return self.statements.stats()
+
+    # -------------------------
+    # Request scope / unit of work
+    # -------------------------
+    def _request_scoped(self):
+        return has_app_context() and current_app.extensions.get("booknest_db") is self
+
+    def _request_connection(self):
+        """The connection bound to the current Flask request, checked out lazily"""
+        connection = g.get("db_connection")
+        if connection is None:
+            connection = self.acquire()
+            g.db_connection = connection
+        return connection
+
+    def _teardown_request_connection(self, exc=None):
+        replica, connection = g.pop("db_replica", (None, None))
+        if connection is not None:
+            replica.release(connection)
+        connection = g.pop("db_connection", None)
+        if connection is None:
+            return
+        tx = getattr(self._local, "tx", None)
+        if tx is not None and tx["connection"] is connection:
+            # 请求结束时事务仍未结束（异常中断），回滚后再归还
+            self._local.tx = None
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+        self.release(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Yield the connection the next statement should run on:
+        the open transaction's, else the request-bound one, else a pooled one.
+        """
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            yield tx["connection"]
+            return
+        if self._request_scoped():
+            yield self._request_connection()
+            return
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            if connection:
+                self.release(connection)
+
+    def in_transaction(self):
+        return getattr(self._local, "tx", None) is not None
+
+    # -------------------------
+    # Read routing (replicas, read-your-writes)
+    # -------------------------
+    def _wrote(self):
+        """Pin this request (and, for DB_READ_YOUR_WRITES_WINDOW seconds, this client) to the primary"""
+        if not self.replicas:
+            return
+        if self._request_scoped():
+            g.db_wrote = True
+        else:
+            self._local.primary_until = time.monotonic() + Config.DB_READ_YOUR_WRITES_WINDOW
+
+    def _pinned(self):
+        if self._request_scoped():
+            if g.get("db_wrote"):
+                return True
+            return has_request_context() and Config.DB_PRIMARY_COOKIE in request.cookies
+        return time.monotonic() < getattr(self._local, "primary_until", 0.0)
+
+    def _pin_client_to_primary(self, response):
+        # 复制有延迟：写入后的短时间内，同一客户端的后续请求也读主库
+        if g.get("db_wrote") and Config.DB_READ_YOUR_WRITES_WINDOW > 0:
+            response.set_cookie(Config.DB_PRIMARY_COOKIE, "1", httponly=True, samesite="Lax",
+                                max_age=math.ceil(Config.DB_READ_YOUR_WRITES_WINDOW))
+        return response
+
+    def reads_from_replicas(self):
+        """Whether the next execute_query / stream_query may run on a replica"""
+        return bool(self.replicas) and not self.in_transaction() and not self._pinned()
+
+    def _checkout_replica(self):
+        """(replica, connection) from the next healthy replica in round-robin order, else (None, None)"""
+        count = len(self.replicas)
+        start = next(self._round_robin)
+        now = time.monotonic()
+        for i in range(count):
+            replica = self.replicas[(start + i) % count]
+            if replica.check_due(now):
+                replica.check()
+            if not replica.healthy:
+                continue
+            connection = replica.acquire()
+            if connection:
+                return replica, connection
+        return None, None
+
+    @contextmanager
+    def replica_connection(self):
+        """
+        Yield (replica, connection) for a read: the request-bound replica connection,
+        else one checked out for this statement; (None, None) when no replica is usable.
+        """
+        if self._request_scoped():
+            bound = g.get("db_replica")
+            if bound is None:
+                bound = g.db_replica = self._checkout_replica()
+            yield bound
+            return
+        replica, connection = self._checkout_replica()
+        try:
+            yield replica, connection
+        finally:
+            if connection:
+                replica.release(connection)
+
+    def _replica_failed(self, replica, connection, error):
+        """Take a replica out of rotation after a connection error; the read is retried on the primary"""
+        replica.mark_down(str(error))
+        if self._request_scoped() and g.get("db_replica", (None, None))[1] is connection:
+            # 本请求余下的读都走主库
+            g.db_replica = (None, None)
+            replica.release(connection, discard=True)
+
+    def after_commit(self, callback):
+        """Run callback once the current transaction commits (immediately outside one)"""
+        tx = getattr(self._local, "tx", None)
+        if tx is None:
+            callback()
+        else:
+            tx["after_commit"].append(callback)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every model call in the block on one connection and commit once.
+        Any exception rolls the whole block back; nested blocks run under a SAVEPOINT.
+        """
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            # 嵌套事务用 SAVEPOINT：内层失败只回滚内层，外层仍可继续提交
+            connection = tx["connection"]
+            tx["depth"] += 1
+            savepoint = f"sp_{tx['depth']}"
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SAVEPOINT {savepoint}")
+                yield connection
+                with connection.cursor() as cursor:
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except BaseException:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                except Exception:
+                    pass
+                raise
+            finally:
+                tx["depth"] -= 1
+            return
+
+        owned = not self._request_scoped()
+        connection = self.acquire() if owned else self._request_connection()
+        if not connection:
+            raise self.backend.OperationalError("Database connection failed")
+
+        tx = {"connection": connection, "depth": 1, "after_commit": []}
+        self._local.tx = tx
+        self._wrote()
+        try:
+            connection.begin()
+            yield connection
+            connection.commit()
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._local.tx = None
+            if owned:
+                self.release(connection)
+
+        for callback in tx["after_commit"]:
+            callback()
+
+    # -------------------------
+    # Instrumentation
+    # -------------------------
+    def _observe(self, statement, query, started, rows=0, connection=None, params=None, error=False):
+        """Record one execution: statement counters, latency histogram, slow-query log"""
+        elapsed = time.perf_counter() - started
+        name = statement.name if statement is not None else "unregistered"
+        if statement is not None:
+            statement.record(elapsed, rows, error)
+        metrics.db_latency.observe(elapsed, name)
+        if error:
+            metrics.db_errors.inc(name)
+            return
+        if rows:
+            metrics.db_rows.inc(name, amount=rows)
+        if elapsed * 1000 >= Config.SLOW_QUERY_MS:
+            metrics.db_slow.inc(name)
+            self._log_slow_query(name, query, params, elapsed, rows, connection)
+
+    def _log_slow_query(self, name, query, params, elapsed, rows, connection):
+        extra = {"statement": name, "elapsed_ms": round(elapsed * 1000, 3), "rows": rows,
+                 "sql": " ".join(query.split())}
+        # 参数可能含个人信息 / 密码哈希，不写入日志
+        if Config.SLOW_QUERY_EXPLAIN and connection is not None and query.lstrip()[:6].upper() == "SELECT":
+            now = time.monotonic()
+            last = self._explained.get(name)
+            # 同一语句每个间隔内只 EXPLAIN 一次，避免慢查询高峰时再加一倍负载
+            if last is None or now - last >= Config.SLOW_QUERY_EXPLAIN_INTERVAL:
+                self._explained[name] = now
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(self.backend.explain_prefix + query, params)
+                        extra["plan"] = cursor.fetchall()
+                except Exception as e:
+                    extra["plan_error"] = str(e)
+        slow_query_logger.warning("Slow query", extra=extra)
+
+    def _fetch(self, statement, query, params, connection):
+        started = time.perf_counter()
         try:
             with connection.cursor() as cursor:
-                print("准备执行SQL...")
                 cursor.execute(query, params)
-                print("SQL执行成功，准备提交事务...")
-                connection.commit()
-                rowcount = cursor.rowcount
-                lastrowid = cursor.lastrowid
-                print(f"✅ 事务提交成功")
-                print(f"影响行数: {rowcount}")
-                print(f"插入ID: {lastrowid}")
-                return lastrowid if lastrowid else rowcount
+                result = cursor.fetchall()
+            self._observe(statement, query, started, len(result), connection, params)
+            return result
         except Exception as e:
-            print(f"❌ SQL执行失败: {str(e)}")
-            print(f"错误类型: {type(e).__name__}")
-            import traceback
-            print("完整错误堆栈:")
-            traceback.print_exc()
-            connection.rollback()
-            print("已回滚事务")
-            return False
+            self._observe(statement, query, started, error=True)
+            logger.error("Query execution failed: %s", e, exc_info=True,
+                         extra={"sql": query, "statement": statement and statement.name})
+            raise
+
+    def execute_query(self, query, params=None):
+        """
+        Execute a SELECT query (SQL text or a registered Statement). Outside a transaction
+        it runs on a replica when any are configured, unless this request or client has
+        just written; a replica whose connection is lost (backend.connection_lost) leaves
+        the rotation and the query is retried on the primary.
+        """
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        if self.reads_from_replicas():
+            with self.replica_connection() as (replica, connection):
+                if connection:
+                    try:
+                        return self._fetch(statement, query, params, connection)
+                    except Exception as e:
+                        if connection.open and not replica.backend.connection_lost(e):
+                            # SQL 本身的错误（未知列、缺少 FULLTEXT 索引、锁等待超时…）与副本健康无关，
+                            # 换到主库也一样失败
+                            return None
+                        self._replica_failed(replica, connection, e)
+
+        with self.connection() as connection:
+            if not connection:
+                return None
+            try:
+                return self._fetch(statement, query, params, connection)
+            except Exception:
+                if self.in_transaction():
+                    raise
+                return None
+
+    def execute_update(self, query, params=None):
+        """Execute an INSERT, UPDATE, or DELETE statement (SQL text or a registered Statement)"""
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        with self.connection() as connection:
+            if not connection:
+                logger.error("Database connection failed, statement not executed", extra={"sql": query})
+                return False
+
+            self._wrote()
+            started = time.perf_counter()
+            try:
+                with connection.cursor() as cursor:
+                    # autocommit 连接：语句执行即提交，无需额外的 COMMIT 往返；
+                    # 事务中则由 transaction() 统一提交
+                    cursor.execute(query, params)
+                    rowcount = cursor.rowcount
+                    lastrowid = cursor.lastrowid
+                    self._observe(statement, query, started, max(rowcount, 0))
+                    # 关闭 DEBUG 时连参数都不会格式化
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("execute_update", extra={
+                            "sql": " ".join(query.split()),
+                            "params": repr(params),
+                            "rowcount": rowcount,
+                            "lastrowid": lastrowid,
+                            "in_transaction": self.in_transaction(),
+                        })
+                    return lastrowid if lastrowid else rowcount
+            except Exception as e:
+                self._observe(statement, query, started, error=True)
+                logger.error("Statement execution failed: %s", e, exc_info=True,
+                             extra={"sql": " ".join(query.split()), "statement": statement and statement.name})
+                if self.in_transaction():
+                    # 交给 transaction() 回滚整个工作单元
+                    raise
+                return False
+
+    def stream_query(self, query, params=None):
+        """
+        Yield the rows of a SELECT one at a time through an unbuffered SSDictCursor,
+        so memory stays constant however large the result is. The stream holds its own
+        pooled connection (never the request-bound one, on a replica when one is usable)
+        until it is exhausted or closed.
+        """
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        replica, connection = self._checkout_replica() if self.reads_from_replicas() else (None, None)
+        source = replica or self
+        if not connection:
+            connection = self.acquire()
+        if not connection:
+            raise self.backend.OperationalError("Database connection failed")
+        finished = False
+        started, rows = time.perf_counter(), 0
+        try:
+            cursor = source.backend.stream_cursor(connection)
+            cursor.execute(query, params)
+            for row in cursor:
+                rows += 1
+                yield row
+            cursor.close()
+            finished = True
         finally:
-            connection.close()
-            print("数据库连接已关闭")
+            # 包含调用方逐行处理的时间，即整个导出的持续时间
+            self._observe(statement, query, started, rows, error=not finished)
+            # 未读完就被关闭的流式结果会占住连接：直接丢弃连接，而不是 cursor.close() 逐行读完
+            source.pool.release(connection, discard=not finished or not connection.open)
+
+    def execute_many(self, query, seq_of_params):
+        """
+        Execute one INSERT/UPDATE for every parameter tuple in a single call.
+        PyMySQL rewrites ``INSERT ... VALUES (...)`` into one multi-row statement,
+        so a whole batch costs one round trip and one commit. Returns the affected row count.
+        """
+        statement = query if isinstance(query, Statement) else None
+        query = _sql_of(query)
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return 0
+        with self.connection() as connection:
+            if not connection:
+                logger.error("Database connection failed, batch not executed", extra={"sql": query})
+                return False
+
+            self._wrote()
+            started = time.perf_counter()
+            try:
+                with connection.cursor() as cursor:
+                    rowcount = cursor.executemany(query, seq_of_params)
+                    self._observe(statement, query, started, max(rowcount or 0, 0))
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("execute_many", extra={
+                            "sql": " ".join(query.split()),
+                            "batch_size": len(seq_of_params),
+                            "rowcount": rowcount,
+                        })
+                    return rowcount
+            except Exception as e:
+                self._observe(statement, query, started, error=True)
+                logger.error("Batch execution failed: %s", e, exc_info=True,
+                             extra={"sql": " ".join(query.split()), "batch_size": len(seq_of_params)})
+                if self.in_transaction():
+                    raise
+                return False
 
 # Global database instance
 db = Database()
@@ -0,0 +1,194 @@
+# HTTP caching: ETag / Last-Modified validators, Cache-Control policy,
+# gzip / brotli response compression and precompressed static files
+
+import functools
+import gzip
+import hashlib
+import inspect
+import mimetypes
+import os
+import re
+from datetime import timezone
+
+from flask import make_response, request, send_from_directory
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只协商 gzip
+    brotli = None
+
+
+def make_etag(*parts):
+    """Strong ETag from the values that fully determine a response body"""
+    digest = hashlib.sha1("\x1f".join("" if p is None else str(p) for p in parts).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _http_datetime(value):
+    # 数据库中的 TIMESTAMP 为不带时区的本地时间，按 UTC 对待，只要前后一致即可用作校验器
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Conditional GET check: If-None-Match wins when present (RFC 9110 13.2.2),
+    otherwise If-Modified-Since is compared with last_modified.
+    """
+    if request.if_none_match:
+        # 弱比较：压缩后的响应带的是 W/"..."（见 compress_response），同样可以换来 304
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    last_modified = _http_datetime(last_modified)
+    return since is not None and last_modified is not None and last_modified <= since
+
+
+def not_modified(etag, last_modified=None):
+    """An empty 304 carrying the same validators"""
+    response = set_validators(make_response("", 304), etag, last_modified)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_datetime(last_modified)
+    return response
+
+
+# -------------------------
+# Cache-Control
+# -------------------------
+def public(view):
+    """
+    Cache-Control for public read endpoints (Config.PUBLIC_CACHE_CONTROL);
+    applied to 200 and 304 responses that did not set their own policy
+    """
+    def apply(rv):
+        response = make_response(rv)
+        if Config.PUBLIC_CACHE_CONTROL and response.status_code in (200, 304) \
+                and "Cache-Control" not in response.headers:
+            response.headers["Cache-Control"] = Config.PUBLIC_CACHE_CONTROL
+        return response
+
+    if inspect.iscoroutinefunction(view):
+        # ASGI 模式下的异步视图（routes/async_routes.py）
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            return apply(await view(*args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        return apply(view(*args, **kwargs))
+    return wrapper
+
+
+# -------------------------
+# Compression
+# -------------------------
+def _negotiate(available):
+    """Best coding the client accepts among ``available`` (in server preference order)"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for coding in available:
+        quality = accepted[coding]
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _codings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _compressible(mimetype):
+    return mimetype is not None and (mimetype.startswith("text/") or mimetype in Config.COMPRESS_MIMETYPES)
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip / brotli encode buffered responses of at least
+    Config.COMPRESS_MIN_SIZE bytes. Streamed responses (exports), files sent with
+    send_file and responses that already carry a Content-Encoding are left alone.
+    """
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough \
+            or "Content-Encoding" in response.headers or not _compressible(response.mimetype):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESS_MIN_SIZE:
+        return response
+    coding = _negotiate(_codings())
+    if coding is None:
+        return response
+
+    if coding == "br":
+        body = brotli.compress(data, quality=Config.COMPRESS_BROTLI_QUALITY)
+    else:
+        # mtime=0：相同内容压缩结果一致
+        body = gzip.compress(data, compresslevel=Config.COMPRESS_GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = coding
+
+    # 编码后的字节与原响应不同，强 ETag 降为弱 ETag（与 nginx gzip 的处理一致）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register response compression and route static files through send_static"""
+    if Config.COMPRESS_ENABLED:
+        app.after_request(compress_response)
+    if app.static_folder:
+        app.view_functions["static"] = lambda filename: send_static(app.static_folder, filename)
+
+
+# -------------------------
+# Static files
+# -------------------------
+# 构建工具生成的带内容哈希的文件名，如 app.3f9c2b1a.js、main-4b1e0c9d7a.css
+_FINGERPRINTED = re.compile(r"[.-][0-9a-fA-F]{8,}\.[A-Za-z0-9]+$")
+_SIDECARS = {"br": ".br", "gzip": ".gz"}
+
+
+def is_fingerprinted(filename):
+    return _FINGERPRINTED.search(filename) is not None
+
+
+def send_static(directory, filename):
+    """
+    send_from_directory with a precompressed ``.br`` / ``.gz`` sidecar when one exists
+    and the client accepts it, and a Cache-Control policy by file name: fingerprinted
+    assets are immutable for a year, everything else follows Config.STATIC_CACHE_CONTROL.
+    """
+    response = None
+    mimetype = mimetypes.guess_type(filename)[0]
+    if Config.COMPRESS_ENABLED and _compressible(mimetype):
+        available = [c for c in ("br", "gzip")
+                     if os.path.isfile(os.path.join(directory, filename + _SIDECARS[c]))]
+        coding = _negotiate(available) if available else None
+        if coding is not None:
+            # send_from_directory 会做路径安全检查；Content-Type 取原文件的类型
+            response = send_from_directory(directory, filename + _SIDECARS[coding], mimetype=mimetype)
+            response.headers["Content-Encoding"] = coding
+        if available:
+            response = response or send_from_directory(directory, filename)
+            response.vary.add("Accept-Encoding")
+    if response is None:
+        response = send_from_directory(directory, filename)
+
+    if is_fingerprinted(filename):
+        response.headers["Cache-Control"] = f"public, max-age={Config.STATIC_IMMUTABLE_MAX_AGE}, immutable"
+    elif Config.STATIC_CACHE_CONTROL:
+        response.headers["Cache-Control"] = Config.STATIC_CACHE_CONTROL
+    return response
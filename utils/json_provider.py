@@ -0,0 +1,44 @@
+# Flask JSON provider: single-pass encoding of Decimal / datetime rows, orjson when available
+
+import decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖
+    orjson = None
+
+
+def _default(o):
+    """Encode types the stdlib encoder does not know about"""
+    # DECIMAL 列（price）按 float 输出，与原先 convert_decimal_to_float 的结果一致
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    # datetime/date（HTTP 日期格式）、UUID、dataclass 等沿用 Flask 默认行为
+    return DefaultJSONProvider.default(o)
+
+
+class BookNestJSONProvider(DefaultJSONProvider):
+    """
+    Encodes PyMySQL result rows (dicts holding Decimal and datetime values) directly,
+    so model methods can hand rows to jsonify without copying them first.
+    Uses orjson when it is installed and Config.JSON_USE_ORJSON is on.
+    """
+
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and Config.JSON_USE_ORJSON
+
+    def dumps(self, obj, **kwargs):
+        # 调试模式下的缩进输出等自定义参数交给标准库处理
+        if self.use_orjson and not kwargs.get("indent"):
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if kwargs.get("sort_keys", self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+        return super().dumps(obj, **kwargs)
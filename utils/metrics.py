@@ -0,0 +1,180 @@
+# In-process metrics: latency histograms and counters, rendered as Prometheus text
+
+import bisect
+import threading
+import time
+
+from flask import g, request
+
+from config import Config
+
+# 秒；覆盖从内存命中（亚毫秒）到慢查询（秒级）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 字节
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram for one label set"""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricFamily:
+    """A named histogram or counter with any number of label sets"""
+
+    def __init__(self, name, kind, help_text, labels=(), buckets=None):
+        self.name = name
+        self.kind = kind  # histogram | counter
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get(self, label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(label_values)
+                if series is None:
+                    series = Histogram(self.buckets) if self.kind == "histogram" else [0]
+                    self._series[label_values] = series
+        return series
+
+    def observe(self, value, *label_values):
+        self._get(label_values).observe(value)
+
+    def inc(self, *label_values, amount=1):
+        series = self._get(label_values)
+        with self._lock:
+            series[0] += amount
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, series in items:
+            labels = _labels(zip(self.labels, label_values))
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_braces(labels)} {series[0]}")
+                continue
+            counts, total, count = series.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = labels + ['le="%s"' % le]
+                lines.append(f"{self.name}_bucket{_braces(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_braces(labels)} {total}")
+            lines.append(f"{self.name}_count{_braces(labels)} {count}")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return [f'{key}="{_escape(value)}"' for key, value in pairs]
+
+
+def _braces(labels):
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+# -------------------------
+# Registry
+# -------------------------
+http_latency = MetricFamily(
+    "booknest_http_request_duration_seconds", "histogram",
+    "Request latency by route template and status code", ("method", "route", "status"), LATENCY_BUCKETS)
+http_response_bytes = MetricFamily(
+    "booknest_http_response_bytes", "histogram",
+    "Response body size (streamed responses are not counted)", ("method", "route"), SIZE_BUCKETS)
+db_latency = MetricFamily(
+    "booknest_db_query_duration_seconds", "histogram",
+    "Statement execution time (including fetch) by registered statement name", ("statement",),
+    LATENCY_BUCKETS)
+db_rows = MetricFamily(
+    "booknest_db_rows_total", "counter", "Rows returned or affected by statement", ("statement",))
+db_errors = MetricFamily(
+    "booknest_db_query_errors_total", "counter", "Failed statements", ("statement",))
+db_slow = MetricFamily(
+    "booknest_db_slow_queries_total", "counter",
+    "Statements slower than SLOW_QUERY_MS", ("statement",))
+db_acquire = MetricFamily(
+    "booknest_db_connection_acquire_seconds", "histogram",
+    "Time spent checking a connection out of the pool", (), LATENCY_BUCKETS)
+
+FAMILIES = [http_latency, http_response_bytes, db_latency, db_rows, db_errors, db_slow, db_acquire]
+
+# 由其他模块提供的即时数值（连接池、缓存等）：name -> (help, callable 返回 {labels_tuple: value})
+_gauges = {}
+
+
+def register_gauges(name, help_text, labels, collect):
+    """collect() returns {label_values_tuple: number}; called on every scrape"""
+    _gauges[name] = (help_text, labels, collect)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for family in FAMILIES:
+        family.render(lines)
+    for name, (help_text, labels, collect) in sorted(_gauges.items()):
+        try:
+            values = collect()
+        except Exception:
+            continue  # 单个数据源出错不影响其余指标
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for label_values, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            lines.append(f"{name}{_braces(_labels(zip(labels, label_values)))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Flask hooks
+# -------------------------
+def init_app(app):
+    """Time every request and record its response size under the route template"""
+    if not Config.METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        # 用路由模板而不是实际路径作标签，避免 /api/books/1、/api/books/2 ... 各占一个序列
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        http_latency.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+        if not response.is_streamed:
+            http_response_bytes.observe(response.calculate_content_length() or 0, request.method, route)
+        return response
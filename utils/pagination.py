@@ -0,0 +1,67 @@
+# Keyset (cursor) pagination helpers
+
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed pagination cursor"""
+
+
+def encode_cursor(*values):
+    """Encode the sort-key values of the last row into an opaque URL-safe token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, types):
+    """
+    Decode a token produced by encode_cursor.
+    ``types`` gives the expected type of each value (datetime, int, str ...).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        )
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+
+
+def parse_limit(value, default, maximum):
+    """Parse a ?limit= query parameter, clamped to [1, maximum]"""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid limit: {value}")
+    return max(1, min(limit, maximum))
+
+
+def parse_ids(value, maximum):
+    """Parse an ?ids=1,2,3 query parameter: positive ints, duplicates dropped, order kept"""
+    ids = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            item = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid id: {part}")
+        if item < 1:
+            raise ValueError(f"Invalid id: {part}")
+        if item not in ids:
+            ids.append(item)
+    if not ids:
+        raise ValueError("ids must list at least one id")
+    if len(ids) > maximum:
+        raise ValueError(f"At most {maximum} ids per request")
+    return ids
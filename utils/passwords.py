@@ -0,0 +1,219 @@
+# Password hashing off the request thread: bounded process pool + versioned hash policy
+
+import base64
+import functools
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# passlib 的 pbkdf2_sha256 格式（旧数据）：$pbkdf2-sha256$<rounds>$<salt>$<checksum>
+LEGACY_PBKDF2_PREFIX = "$pbkdf2-sha256$"
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool already has the maximum number of pending jobs"""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+
+# -------------------------
+# Hash formats (run inside the worker processes)
+# -------------------------
+def _ab64_decode(data):
+    """passlib's "adapted base64": '.' instead of '+', no padding"""
+    data = data.replace(".", "+")
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _verify_legacy_pbkdf2(pwhash, password):
+    try:
+        _, _, rounds, salt, checksum = pwhash.split("$")
+        expected = _ab64_decode(checksum)
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _ab64_decode(salt),
+                                      int(rounds), len(expected))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(derived, expected)
+
+
+def verify_password(pwhash, password):
+    """Check a password against a werkzeug or legacy passlib pbkdf2-sha256 hash"""
+    if not pwhash:
+        return False
+    if pwhash.startswith(LEGACY_PBKDF2_PREFIX):
+        return _verify_legacy_pbkdf2(pwhash, password)
+    return check_password_hash(pwhash, password)
+
+
+def hash_password(password, method=None):
+    """Hash with the configured policy (Config.PASSWORD_HASH_METHOD)"""
+    return generate_password_hash(password, method=method or Config.PASSWORD_HASH_METHOD)
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_method(method):
+    """
+    The method as werkzeug writes it into the hash, with its default parameters
+    filled in ("scrypt" -> "scrypt:32768:8:1"). Computed once per method and process.
+    """
+    return generate_password_hash("x", method=method).split("$", 1)[0]
+
+
+def needs_rehash(pwhash, method=None):
+    """True if the hash was made with anything other than the current policy"""
+    method = method or Config.PASSWORD_HASH_METHOD
+    if not pwhash or pwhash.startswith(LEGACY_PBKDF2_PREFIX):
+        return True
+    return pwhash.split("$", 1)[0] != _hash_method(method)
+
+
+# -------------------------
+# Bounded worker pool
+# -------------------------
+class HashingPool:
+    """
+    Runs PBKDF2/scrypt in a small process pool so CPU-bound hashing neither holds the
+    GIL of the request-serving process nor ties up all of its threads.
+    At most ``max_pending`` jobs may be queued or running; beyond that submit() raises
+    HashingBusy so the caller can answer 503 instead of queueing without bound.
+    ``workers=0`` runs everything inline (development / single-threaded tools).
+    """
+
+    def __init__(self, workers, max_pending, timeout, retry_after):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            # 在 gunicorn 预加载后 fork 出的 worker 中按需重新创建
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args) on the pool and return a Future; raises HashingBusy when full"""
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy(self.retry_after)
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for the result"""
+        if not self.workers:
+            return fn(*args)
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HashingBusy(self.retry_after)
+        except BrokenProcessPool:
+            # 工作进程异常退出：丢弃整个池，下次调用时重建
+            with self._lock:
+                self._executor = None
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pool = HashingPool(
+    workers=Config.PASSWORD_HASH_WORKERS,
+    max_pending=Config.PASSWORD_HASH_MAX_PENDING,
+    timeout=Config.PASSWORD_HASH_TIMEOUT,
+    retry_after=Config.PASSWORD_HASH_RETRY_AFTER,
+)
+
+
+def check_password(pwhash, password):
+    """verify_password on the hashing pool"""
+    return pool.run(verify_password, pwhash, password)
+
+
+def make_password_hash(password):
+    """hash_password on the hashing pool"""
+    return pool.run(hash_password, password, Config.PASSWORD_HASH_METHOD)
+
+
+# 升级后的哈希由单独的线程写库：哈希池的结果回调线程只负责转交，
+# 慢的或失败的写入不会拖住池中其他哈希结果的交付
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-rehash")
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def _save_rehash(on_done, new_hash):
+    try:
+        on_done(new_hash)
+    except Exception:
+        logger.warning("Saving the upgraded password hash failed", exc_info=True)
+
+
+def rehash_in_background(password, on_done):
+    """
+    Compute a hash under the current policy without making the caller wait;
+    on_done(new_hash) runs on a dedicated writer thread (outside any request).
+    Skipped when the pool is busy.
+    """
+    if not pool.workers:
+        _get_writer().submit(_save_rehash, on_done, hash_password(password))
+        return
+    try:
+        future = pool.submit(hash_password, password, Config.PASSWORD_HASH_METHOD)
+    except HashingBusy:
+        return  # 下次登录再升级
+
+    def done(f):
+        try:
+            new_hash = f.result()
+        except Exception:
+            logger.warning("Background password rehash failed", exc_info=True)
+            return
+        _get_writer().submit(_save_rehash, on_done, new_hash)
+
+    future.add_done_callback(done)
@@ -0,0 +1,373 @@
+# Bounded, thread-safe connection pool for PyMySQL (and a per-thread pool for SQLite)
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+class ConnectionPool:
+    """
+    Keeps up to ``max_size`` open connections and hands them out to threads.
+
+    - ``min_size`` connections are kept open even when idle
+    - checkout blocks for at most ``timeout`` seconds once the pool is exhausted
+    - connections idle for longer than ``idle_timeout`` are closed (down to ``min_size``)
+    - connections idle for longer than ``ping_interval`` are pinged before being handed out
+    - the pool is fork-safe: a child process never reuses sockets inherited from its parent
+    """
+
+    def __init__(self, factory, min_size=0, max_size=10, timeout=5.0,
+                 idle_timeout=300.0, ping_interval=30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self._factory = factory
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (connection, last_used)，右端为最近归还的连接
+        self._size = 0        # 已打开的连接数（空闲 + 借出）
+        self._pid = os.getpid()
+        self._closed = False
+        self._reset_counters()
+
+        _register_fork_handler(self)
+
+    # -------------------------
+    # Checkout / return
+    # -------------------------
+    def acquire(self, timeout=None):
+        """Check out a live connection, opening a new one if the pool has room"""
+        self._check_pid()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._reap_idle_locked()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {timeout}s waiting for a database connection "
+                        f"(pool size {self.max_size})"
+                    )
+                self._waits += 1
+                self._cond.wait(remaining)
+
+        # 网络 I/O（建连 / ping）放在锁外进行
+        if conn is not None and not self._is_alive(conn, last_used):
+            self._discard(conn)
+            with self._cond:
+                self._size += 1
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                conn = None
+            if conn is None:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return None
+            with self._cond:
+                self._created += 1
+
+        with self._cond:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_time += time.monotonic() - started
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool; broken connections should be discarded"""
+        if conn is None:
+            return
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+        if self._pid != os.getpid():
+            # 连接属于父进程，子进程中直接丢弃
+            return
+        if discard or self._closed or not getattr(conn, "open", True):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager wrapper around acquire/release"""
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = conn is not None and not getattr(conn, "open", True)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+    def warm(self):
+        """Open connections until at least ``min_size`` are available"""
+        self._check_pid()
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._factory()
+            except Exception:
+                conn = None
+            with self._cond:
+                if conn is None:
+                    self._size -= 1
+                    return
+                self._created += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def reset(self):
+        """Forget every connection without closing it (used after fork)"""
+        # fork 时父进程中的其他线程可能正持有锁，因此不获取旧锁，直接换一把新锁。
+        # 也不发送 COM_QUIT：这些 socket 仍被父进程使用，交给 GC 关闭本进程的 fd 即可
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._size = 0
+        self._pid = os.getpid()
+        self._closed = False
+        self._reset_counters()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": checkouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "reaped": self._reaped,
+                "ping_failures": self._ping_failures,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._wait_time * 1000 / checkouts, 3) if checkouts else 0.0,
+            }
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _reset_counters(self):
+        self._in_use = 0
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._reaped = 0
+        self._ping_failures = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self.reset()
+
+    def _reap_idle_locked(self):
+        if not self.idle_timeout or not self._idle:
+            return
+        now = time.monotonic()
+        # 最旧的连接在左端
+        while self._idle and self._size > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._reaped += 1
+            self._close_quietly(conn)
+
+    def _is_alive(self, conn, last_used):
+        if not getattr(conn, "open", True):
+            return False
+        if self.ping_interval is None or time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._ping_failures += 1
+            return False
+
+    def _discard(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class ThreadLocalPool:
+    """
+    One connection per thread, for embedded engines (SQLite) where opening a
+    connection is cheap and a connection must not be shared between threads.
+    Same interface as ConnectionPool. Nested acquire() calls on one thread get the
+    same connection, which stays open until the thread's last release().
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._closed = False
+        self._reset_counters()
+
+        _register_fork_handler(self)
+
+    def acquire(self, timeout=None):
+        self._check_pid()
+        if self._closed:
+            raise PoolTimeout("Connection pool is closed")
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not getattr(conn, "open", True):
+            self._forget()
+            conn = None
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                conn = None
+            if conn is None:
+                return None
+            self._local.conn, self._local.depth = conn, 0
+            with self._lock:
+                self._created += 1
+                self._size += 1
+        self._local.depth += 1
+        with self._lock:
+            self._checkouts += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        if conn is None or getattr(self._local, "conn", None) is not conn:
+            return
+        self._local.depth -= 1
+        # 同一线程上还有外层在使用这个连接时不能关闭
+        if self._local.depth <= 0 and (discard or self._closed or not getattr(conn, "open", True)):
+            self._forget()
+            with self._lock:
+                self._discarded += 1
+            ConnectionPool._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm(self):
+        pass
+
+    def close(self):
+        """Refuse further checkouts; each thread's connection closes on its last release"""
+        self._closed = True
+
+    def reset(self):
+        """Forget the parent's connections after fork (never reuse them in the child)"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._closed = False
+        self._reset_counters()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self._size,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "per_thread": True,
+            }
+
+    def _reset_counters(self):
+        self._size = 0
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self.reset()
+
+    def _forget(self):
+        self._local.conn, self._local.depth = None, 0
+        with self._lock:
+            self._size = max(0, self._size - 1)
+
+
+# gunicorn 等 pre-fork 服务器：fork 后在子进程中重置所有连接池
+_pools = weakref.WeakSet()
+
+
+def _register_fork_handler(pool):
+    _pools.add(pool)
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
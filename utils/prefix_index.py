@@ -0,0 +1,96 @@
+# In-memory sorted-array prefix index for typeahead lookups
+
+import bisect
+import heapq
+import itertools
+import threading
+import time
+
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class PrefixIndex:
+    """
+    Maps lower-cased keys to document ids in one sorted list, so a prefix lookup is
+    two binary searches plus a slice. Each document can be indexed under several keys
+    (e.g. username and email local-part); ``field`` records which one matched so
+    results can be ranked.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []  # sorted [(key, field, doc_id)]
+        self._docs = {}     # doc_id -> projected document
+        self.built_at = None
+        # 后台重建的单飞锁：在发起线程获取、在重建线程释放，所以不能用 RLock
+        self._rebuilding = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def rebuild(self, docs, keys_for):
+        """Replace the whole index; keys_for(doc) yields (field, key) pairs"""
+        entries, by_id = [], {}
+        for doc in docs:
+            by_id[doc["id"]] = doc
+            entries.extend((key.lower(), field, doc["id"]) for field, key in keys_for(doc) if key)
+        entries.sort()
+        with self._lock:
+            self._entries, self._docs = entries, by_id
+            self.built_at = time.monotonic()
+
+    def rebuild_in_background(self, build):
+        """
+        Run build() (which calls rebuild) on a daemon thread, unless a rebuild is
+        already running; lookups keep using the current entries meanwhile.
+        Returns whether a rebuild was started.
+        """
+        if not self._rebuilding.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                build()
+            except Exception as e:
+                logger.exception("Prefix index rebuild failed: %s", e)
+            finally:
+                self._rebuilding.release()
+
+        threading.Thread(target=run, name="prefix-index-rebuild", daemon=True).start()
+        return True
+
+    def add(self, doc, keys_for):
+        with self._lock:
+            self._docs[doc["id"]] = doc
+            for field, key in keys_for(doc):
+                if key:
+                    bisect.insort(self._entries, (key.lower(), field, doc["id"]))
+
+    def search(self, prefix, limit=10, field_rank=None, max_scan=1000):
+        """
+        Documents with any key starting with prefix, best first:
+        exact key match, then by field_rank (lower is better), shorter key, key order.
+        At most ``max_scan`` matching keys are ranked, which bounds the cost of
+        one- or two-letter prefixes on a large index.
+        """
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        field_rank = field_rank or {}
+        with self._lock:
+            entries, docs = self._entries, self._docs
+            lo = bisect.bisect_left(entries, (prefix,))
+            # 匹配的键在 lo 之后连续排列：取到第一个不以 prefix 开头的键为止
+            # （不用 prefix + 哨兵字符作上界，U+FFFF 以上的字符也能匹配）
+            matches = list(itertools.takewhile(lambda entry: entry[0].startswith(prefix),
+                                               entries[lo:lo + max_scan]))
+
+        best = {}
+        for key, field, doc_id in matches:
+            rank = (key != prefix, field_rank.get(field, len(field_rank)), len(key), key)
+            if doc_id not in best or rank < best[doc_id]:
+                best[doc_id] = rank
+        ranked = heapq.nsmallest(limit, best, key=best.get)
+        return [docs[doc_id] for doc_id in ranked if doc_id in docs]